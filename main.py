@@ -1,27 +1,36 @@
 '''Main entry point of the application'''
 
 from mgxhub.db import SQLite3Factory
+from mgxhub.translator import Translator
 from mgxhub.watcher import RecordWatcher
 from webapi import app
 from webapi.admin_api import admin_api
 # pylint: disable=unused-import
 from webapi.routers import (auth_logoutall, auth_onlineusers, backup_sqlite,
-                            download_current_config, download_default_config,
-                            game_delete, game_detail, game_latest,
-                            game_optionstats, game_random, game_reparse,
-                            game_search, game_upload, game_visibility,
-                            get_langcodes, get_options, map_static, ping,
-                            player_active, player_friends, player_latest,
-                            player_profile, player_random, player_recent_game,
-                            player_searchname, rating_player_page,
+                            counters_reconcile, download_current_config,
+                            download_default_config, game_delete, game_detail,
+                            game_latest, game_optionstats, game_random,
+                            game_reparse, game_search, game_upload,
+                            game_visibility, get_langcodes, get_options,
+                            map_static, ping, player_active, player_friends,
+                            player_latest, player_profile, player_random,
+                            player_recent_game, player_searchname,
+                            player_separation, rating_history,
+                            rating_player_page, rating_predict,
                             rating_searchname, rating_start, rating_stats,
                             rating_status, rating_table, rating_unlock,
                             shortcut_homepage, stats_total, tmpdir_list,
-                            tmpdir_purge)
+                            tmpdir_purge, translations_reload)
 
 # Initialize the SQLite3 database
 SQLite3Factory()
 
+# Load translation catalogs, `kill -USR1` a worker to reload them
+Translator().install_reload_signal()
+
+# Backfills, counter reconciliation and the rating worker start in one worker
+# process on startup, see `webapi/lifespan.py`
+
 # Start monitoring the upload directory
 watcher = RecordWatcher()
 
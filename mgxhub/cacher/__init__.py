@@ -1 +1,3 @@
-from .cache import Cacher
+from .cache import TAGS, Cacher
+from .flight import cached_call
+from .local import LocalCache
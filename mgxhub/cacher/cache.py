@@ -2,13 +2,46 @@
 
 import json
 
+from sqlalchemy import Integer, cast, or_
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
 from mgxhub.model.orm import Cache
 
+from .local import LocalCache
+
+# Data an entry is built from, entries are invalidated when it changes
+TAGS = ('games', 'players', 'ratings')
+
+
+def _tag_value(tags: frozenset[str]) -> str:
+    # Delimited on both sides, so each tag matches with one LIKE
+    return f",{','.join(sorted(tags))}," if tags else ''
+
+
+def _version_key(tag: str) -> str:
+    # Untagged rows, kept by invalidations and purges
+    return f'#tag:{tag}'
+
 
 class Cacher:
-    '''Cache assistant'''
+    '''Cache assistant
+
+    Entries are kept in the `cache` table and in a process-local LRU in
+    front of it, see `LocalCache`. A hit in the LRU doesn't touch the
+    database.
+
+    Entries carry tags naming the data they are built from, see `TAGS`.
+    Writers of that data invalidate the matching tags. Every invalidation
+    changes the versions of its tags, a value computed meanwhile is not
+    stored, see `versions()`.
+
+    Example:
+    ```python
+    Cacher(db).set('rating_stats', result, tags=['ratings'])
+    Cacher(db).invalidate('ratings')  # then commit
+    ```
+    '''
 
     def __init__(self, db: Session):
         self.db = db
@@ -16,27 +49,75 @@ class Cacher:
     def get(self, k: str) -> str | None:
         '''Get value from cache'''
 
-        result = self.db.query(Cache.value).filter(Cache.key == k).first()
+        local = LocalCache()
+        value = local.get(k)
+        if value is not None:
+            return value
+
+        result = self.db.query(Cache.value, Cache.tag).filter(Cache.key == k).first()
         if result:
+            local.set(k, result[0], frozenset(filter(None, (result[1] or '').split(','))))
             return result[0]
         return None
 
-    def set(self, k: str, v: str | dict) -> None:
-        '''Set value to cache'''
+    def versions(self, tags: list[str] | tuple[str, ...]) -> dict[str, str]:
+        '''Versions of `tags`, read before computing a value to store.'''
+
+        keys = {_version_key(tag): tag for tag in tags}
+        return {keys[k]: v for k, v in self.db.query(Cache.key, Cache.value).filter(Cache.key.in_(keys))}
+
+    def set(
+            self,
+            k: str,
+            v: str | dict,
+            tags: list[str] | tuple[str, ...] = (),
+            versions: dict[str, str] | None = None
+    ) -> bool:
+        '''Set value to cache, tagged with `tags`
+
+        With `versions`, as returned by `versions()` before `v` was
+        computed, `v` is not stored if any of its tags was invalidated since.
+
+        Returns:
+            False if not stored.
+        '''
 
         # If v is a dict, serialize it to a JSON string
         serialized_v = json.dumps(v) if isinstance(v, dict) else v
+        tags = frozenset(tags)
 
-        cache = self.db.query(Cache).filter(Cache.key == k).first()
-        if cache:
-            cache.value = serialized_v
-        else:
-            cache = Cache(key=k, value=serialized_v)
-            self.db.add(cache)
+        stmt = insert(Cache).values(key=k, value=serialized_v, tag=_tag_value(tags))
+        self.db.execute(stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'value': stmt.excluded.value, 'tag': stmt.excluded.tag, 'updated': stmt.excluded.updated}
+        ))
+        # Checked after the write, no invalidation commits in between
+        if versions is not None and self.versions(tuple(tags)) != versions:
+            self.db.rollback()
+            return False
         self.db.commit()
+        LocalCache().set(k, serialized_v, tags)
+        return True
+
+    def invalidate(self, *tags: str) -> None:
+        '''Delete entries carrying any of `tags` and change their versions. Doesn't commit.'''
+
+        if not tags:
+            return
+        LocalCache().invalidate(*tags)
+        self.db.query(Cache).filter(
+            or_(*[Cache.tag.like(f'%,{tag},%') for tag in tags])
+        ).delete(synchronize_session=False)
+        for tag in tags:
+            stmt = insert(Cache).values(key=_version_key(tag), value='1', tag='')
+            self.db.execute(stmt.on_conflict_do_update(
+                index_elements=['key'],
+                set_={'value': cast(Cache.value, Integer) + 1}
+            ))
 
     def purge(self) -> None:
         '''Purge all cache'''
 
-        self.db.query(Cache).delete()
+        LocalCache().clear()
+        self.db.query(Cache).filter(Cache.key.not_like(_version_key('%'))).delete(synchronize_session=False)
         self.db.commit()
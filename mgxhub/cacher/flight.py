@@ -0,0 +1,96 @@
+'''Cached computations, one at a time per key, stale values served while refreshing'''
+
+import asyncio
+from typing import Awaitable, Callable
+
+from mgxhub.config import cfg
+from mgxhub.db import db_run
+from mgxhub.logger import logger
+
+from .cache import Cacher
+from .local import LocalCache
+
+# Loads running in this process, by cache key
+_FLIGHTS: dict[str, asyncio.Future] = {}
+
+
+async def _load(key: str, compute: Callable[[], Awaitable[str]], tags: tuple[str, ...]) -> tuple[str, bool]:
+    '''The entry in the cache table, or computed and stored if missing.
+
+    A value whose tags were invalidated while it was computed is returned
+    but not stored.
+    '''
+
+    def lookup(session):
+        cacher = Cacher(session)
+        return cacher.get(key), cacher.versions(tags)
+
+    value, versions = await db_run(lookup)
+    if value is not None:
+        return value, True
+    value = await compute()
+    await db_run(lambda session: Cacher(session).set(key, value, tags, versions))
+    return value, False
+
+
+def _flight(key: str, compute: Callable[[], Awaitable[str]], tags: tuple[str, ...]) -> asyncio.Future:
+    '''The load of `key` running in this process, started if none.'''
+
+    future = _FLIGHTS.get(key)
+    if future is not None:
+        return future
+
+    future = asyncio.ensure_future(_load(key, compute, tags))
+    _FLIGHTS[key] = future
+
+    def done(f: asyncio.Future) -> None:
+        if _FLIGHTS.get(key) is f:
+            del _FLIGHTS[key]
+        # Also retrieves it, when nobody waits for a background refresh
+        if not f.cancelled() and f.exception() is not None:
+            logger.error(f"Cache load error [{key}]: {f.exception()}")
+
+    future.add_done_callback(done)
+    return future
+
+
+async def cached_call(
+        key: str,
+        compute: Callable[[], Awaitable[str]],
+        tags: list[str] | tuple[str, ...] = (),
+        max_stale: float | None = None
+) -> tuple[str, bool]:
+    '''Get a cached value, computing it once for all concurrent callers.
+
+    A value fresh in the process cache is returned at once. One expired or
+    invalidated no more than `max_stale` seconds ago
+    (`database.cachemaxstale` if None) is returned too, while one
+    background load refreshes it. Otherwise the caller waits for the load,
+    shared with every other caller of the same key in this process.
+
+    A load reads the cache table first, and only calls `compute()` if the
+    entry is missing there, then stores it tagged with `tags`, see
+    `Cacher`. Every call for a key should pass the same tags.
+
+    Example:
+    ```python
+    value, cached = await cached_call('rating_stats', compute_stats, tags=['ratings'])
+    ```
+
+    Returns:
+        The value, and False if it was computed for this call.
+    '''
+
+    local = LocalCache()
+    value = local.get(key)
+    if value is not None:
+        return value, True
+
+    max_stale = cfg.getfloat('database', 'cachemaxstale') if max_stale is None else max_stale
+    stale = local.peek(key)
+    future = _flight(key, compute, tuple(tags))
+    if stale is not None and stale[1] <= max_stale:
+        return stale[0], True
+
+    # A caller going away doesn't cancel the load of the others
+    return await asyncio.shield(future)
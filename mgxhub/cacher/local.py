@@ -0,0 +1,80 @@
+'''Process-local cache in front of the cache table'''
+
+import threading
+import time
+from collections import OrderedDict
+
+from mgxhub.config import cfg
+from mgxhub.singleton import Singleton
+
+
+class LocalCache(metaclass=Singleton):
+    '''LRU of cache entries with a TTL and tags, shared by the threads of a process.
+
+    Holds at most `database.cachesize` entries, each fresh for
+    `database.cachettl` seconds. Other processes don't see invalidations
+    made here, the TTL bounds how long they keep a stale entry.
+
+    Expired and invalidated entries are not returned by `get()`, but kept
+    until evicted, for callers that may serve them while refreshing, see
+    `peek()`.
+    '''
+
+    def __init__(self, size: int | None = None, ttl: float | None = None):
+        self._size = cfg.getint('database', 'cachesize') if size is None else size
+        self._ttl = cfg.getfloat('database', 'cachettl') if ttl is None else ttl
+        self._lock = threading.Lock()
+        # key -> (value, expiry, tags), least recently used first
+        self._entries: OrderedDict[str, tuple[str, float, frozenset[str]]] = OrderedDict()
+
+    def get(self, k: str) -> str | None:
+        '''Value of `k`, None if missing, expired or invalidated.'''
+
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self._entries.move_to_end(k)
+            return entry[0]
+
+    def peek(self, k: str) -> tuple[str, float] | None:
+        '''Value of `k`, even if expired or invalidated, and for how long.
+
+        Returns:
+            The value and the seconds since it expired or was invalidated,
+            0 if still fresh. None if missing.
+        '''
+
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry is None:
+                return None
+            return entry[0], max(time.monotonic() - entry[1], 0.0)
+
+    def set(self, k: str, v: str, tags: frozenset[str] = frozenset(), ttl: float | None = None) -> None:
+        '''Store `v` under `k`, evicting the least recently used entries if full.'''
+
+        if self._size <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries[k] = (v, now + (self._ttl if ttl is None else ttl), tags)
+            self._entries.move_to_end(k)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tags: str) -> None:
+        '''Expire entries carrying any of `tags` now, if not expired yet.'''
+
+        tags = frozenset(tags)
+        now = time.monotonic()
+        with self._lock:
+            for k in [k for k, entry in self._entries.items() if entry[2] & tags]:
+                value, expiry, entry_tags = self._entries[k]
+                self._entries[k] = (value, min(expiry, now), entry_tags)
+
+    def clear(self) -> None:
+        '''Drop all entries.'''
+
+        with self._lock:
+            self._entries.clear()
@@ -33,6 +33,8 @@ class DefaultConfig:
         self.config['system']['logdest'] = 'console'  # if not 'console', will try to use log file
         self.config['system']['authtype'] = 'none'  # currently only 'none' is used
         self.config['system']['echosql'] = 'off'  # 'on' or 'off'
+        # held by the one web worker running background tasks
+        self.config['system']['startuplock'] = os.path.join(self.config['system']['workdir'], 'startup.lock')
 
         # Map configuration
         self.config['system']['mapdest'] = 'local'
@@ -42,6 +44,13 @@ class DefaultConfig:
         # Database configuration
         self.config['database'] = {}
         self.config['database']['sqlite'] = os.path.join(self.config['system']['workdir'], 'db.sqlite3')
+        # written by the rating engine only, attached read-only by the web app
+        self.config['database']['ratingdb'] = os.path.join(self.config['system']['workdir'], 'rating.sqlite3')
+        self.config['database']['threads'] = '8'  # threads running blocking queries for async routers
+        self.config['database']['cachesize'] = '256'  # entries of the in-process cache in front of the cache table
+        self.config['database']['cachettl'] = '60'  # seconds an entry stays in the in-process cache
+        self.config['database']['cachemaxstale'] = '600'  # seconds after expiry an entry may be served while refreshed
+        self.config['database']['generationcheck'] = '5'  # seconds between reads of data generations for ETags
 
         # S3 configuration
         # - Default values are Minio playground credentials
@@ -59,6 +68,14 @@ class DefaultConfig:
         self.config['rating'] = {
             'durationthreshold': 15 * 60 * 1000,  # 15 minutes
             'batchsize': 150000,
+            'snapshotinterval': 50000,  # games between snapshots of the rating state
+            'snapshotkeep': 20,  # snapshots kept, older back-dated games need a full run
+            'workers': 1,  # processes rating partitions in parallel, 1 for none, 0 for CPU count
+            'partitions': 0,  # max parallel tasks partitions are grouped into, 0 for one per partition
+            'debounce': 10,  # seconds, triggers within this window after the first one make one run
+            'mininterval': 60,  # seconds between the end of a run and the start of the next
+            'indexcheck': 30,  # seconds between checks of the published generation by the API process
+            'activitydays': 90,  # days of daily activity kept, the longest leaderboard window
             'lockfile': os.path.join(self.config['system']['workdir'], 'elo_calc_process.lock')
         }
 
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 
-from .sqlite3 import SQLite3Factory
+from .executor import DBExecutor
+from .sqlite3 import SQLite3Factory, create_sqlite_engine, prepare_rating_db
 
 
 def db_raw() -> Session:
@@ -17,3 +18,9 @@ def db_dep():
         yield db
     finally:
         db.close()
+
+
+async def db_run(func, *args, **kwargs):
+    '''Run `func(session, *args, **kwargs)` off the event loop with its own session.'''
+
+    return await DBExecutor().run(func, *args, **kwargs)
@@ -0,0 +1,55 @@
+'''Run blocking database work off the event loop.'''
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from mgxhub import cfg
+from mgxhub.singleton import Singleton
+
+from .sqlite3 import SQLite3Factory
+
+
+class DBExecutor(metaclass=Singleton):
+    '''Run blocking database work in a bounded thread pool.
+
+    SQLAlchemy sessions are synchronous, calling them from `async def`
+    routers blocks the event loop of the whole worker. Every task submitted
+    here runs in a pool thread with its own session, so independent queries
+    of a request overlap and a slow one doesn't freeze the others.
+
+    Pool size is `database.threads`, keep it below the connection pool size.
+
+    Example:
+    ```python
+    from mgxhub.db import db_run
+
+    totals, ratings = await asyncio.gather(
+        db_run(get_player_totals, name_hash),
+        db_run(get_player_rating_stats, name_hash)
+    )
+    ```
+    '''
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(
+            max_workers=cfg.getint('database', 'threads'),
+            thread_name_prefix='mgxhub_db'
+        )
+
+    @staticmethod
+    def _with_session(func: Callable[..., Any], *args, **kwargs) -> Any:
+        session: Session = SQLite3Factory()()
+        try:
+            return func(session, *args, **kwargs)
+        finally:
+            session.close()
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        '''Run `func(session, *args, **kwargs)` in the pool and await its result.'''
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(self._with_session, func, *args, **kwargs))
@@ -1,9 +1,14 @@
 '''Some big database-related operations'''
 
 from .add_game import add_game
-from .find_player_friends import async_get_close_friends, get_close_friends
-from .get_games_latest import fetch_latest_games_async
-from .get_player_active import get_active_players_async
+from .backfill_tables import backfill_tables
+from .find_player_friends import (async_get_close_friends, get_close_friends,
+                                  get_coplay_path)
+from .game_document import (build_game_document, get_game_document,
+                            invalidate_game_document, purge_game_documents)
+from .get_games_latest import fetch_latest_games, fetch_latest_games_async
+from .get_player_active import (get_active_players,
+                                get_active_players_async)
 from .get_player_counts import async_get_player_totals, get_player_totals
 from .get_player_latest import get_latest_players
 from .get_player_rating import get_player_rating_table
@@ -11,8 +16,23 @@ from .get_player_rating_stats import (async_get_player_rating_stats,
                                       get_player_rating_stats)
 from .get_player_recent_games import (async_get_player_recent_games,
                                       get_player_recent_games)
+from .get_rating_generation import get_rating_generation
+from .get_rating_history import get_rating_history
+from .get_rating_size import get_rating_size
 from .get_rating_stats import get_rating_stats
 from .get_rating_table import get_rating_table
 from .get_total_stats import get_total_stats_raw, get_total_stats_raw_async
+from .mark_rating_dirty import mark_rating_dirty, rating_eligible
 from .search_games import search_games
 from .search_player_name import search_players_by_name
+from .update_coplay import (add_coplay_edges, coplay_edges_missing,
+                            coplay_members, rebuild_coplay_edges,
+                            remove_coplay_edges, replace_coplay_edges)
+from .update_counters import (FACETS, GENERATIONS, bump_generation,
+                              count_game_facets, count_game_total,
+                              get_counters, get_generations,
+                              reconcile_counters, reconcile_counters_if_due,
+                              uncount_gone_players)
+from .update_rating_ledger import (rating_ledger_missing,
+                                   rebuild_rating_ledger,
+                                   update_rating_ledger)
@@ -1,6 +1,6 @@
 '''Add a game to the database'''
 
-from datetime import datetime
+from datetime import datetime, timezone
 from hashlib import md5
 
 from sqlalchemy import and_
@@ -8,9 +8,19 @@ from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
 from mgxhub import logger
+from mgxhub.cacher import Cacher
+from mgxhub.graph import CoPlayGraph
 from mgxhub.model.orm import Chat, File, Game, Player
 from mgxhub.util import sanitize_playername
 
+from .game_document import invalidate_game_document
+from .mark_rating_dirty import mark_rating_dirty, rating_eligible
+from .update_coplay import (add_coplay_edges, coplay_members,
+                            replace_coplay_edges)
+from .update_counters import (FACETS, bump_generation, count_game_facets,
+                              count_game_total, count_new_players)
+from .update_rating_ledger import update_rating_ledger
+
 
 def _update_gametime(session: Session, game: Game, game_time: datetime) -> bool:
     '''Update the game time of a game.
@@ -27,6 +37,12 @@ def _update_gametime(session: Session, game: Game, game_time: datetime) -> bool:
 
     if game:
         game.game_time = game_time
+        invalidate_game_document(session, game.game_guid)
+        update_rating_ledger(session, game.game_guid)
+        if rating_eligible(game):
+            mark_rating_dirty(session, game_time)
+        Cacher(session).invalidate('games', 'players')
+        bump_generation(session, 'games', 'players')
         session.commit()
         logger.info(f'[DB] game_time updated: {game.game_guid}')
         return True
@@ -86,6 +102,12 @@ def add_game(session: Session, d: dict, t: str | None = None, source: str = "")
                     _update_gametime(session, game, game_time)
                 return "duplicated", game.game_guid
 
+    # Merging updates the existing instance in place, keep the old values
+    old_facets = {column: getattr(game, column) for column in FACETS} if game else None
+    old_rated = (game.game_time, rating_eligible(game)) if game else None
+    old_players = session.query(Player).filter(Player.game_guid == game.game_guid).all() if game else []
+    old_members = coplay_members(old_players)
+
     merged_game = session.merge(Game(
         id=game.id if game else None,
         game_guid=d.get('guid'),
@@ -107,6 +129,7 @@ def add_game(session: Session, d: dict, t: str | None = None, source: str = "")
         game_time=game_time
     ))
 
+    game_players = []
     players = d.get('players')
     if players:
         for p in players:
@@ -142,6 +165,7 @@ def add_game(session: Session, d: dict, t: str | None = None, source: str = "")
             player.resigned_time = p.get('resigned')
 
             session.add(player)
+            game_players.append(player)
 
     record_file = File(
         game_guid=d.get('guid'),
@@ -170,8 +194,33 @@ def add_game(session: Session, d: dict, t: str | None = None, source: str = "")
                 index_elements=['game_guid', 'chat_time', 'chat_content'])
             session.execute(stmt)
 
+    # Totals are only counted once, when the game is first found. Players of
+    # slots missing from a re-parse are kept, so are their edges.
+    members = coplay_members(game_players + [p for p in old_players if p not in game_players])
+    if game:
+        replace_coplay_edges(session, old_members, members, merged_game.game_time)
+        count_game_facets(session, old_facets, -1)
+        invalidate_game_document(session, game.game_guid)
+        if old_rated[1] or rating_eligible(merged_game):
+            mark_rating_dirty(session, min(old_rated[0] or game_time, game_time))
+    else:
+        add_coplay_edges(session, members, game_time)
+        count_game_total(session, datetime.now(timezone.utc), 1)  # Same as games.created
+        with session.no_autoflush:
+            count_new_players(session, {h for h, _, _ in members})
+        if rating_eligible(merged_game):
+            mark_rating_dirty(session, game_time)
+    count_game_facets(session, {column: getattr(merged_game, column) for column in FACETS}, 1)
+    update_rating_ledger(session, merged_game.game_guid)
+    Cacher(session).invalidate('games', 'players')
+    bump_generation(session, 'games', 'players')
+
     session.commit()
 
+    graph = CoPlayGraph()
+    if graph.loaded:
+        graph.refresh(session, force=True)
+
     if game:
         return "updated", merged_game.game_guid
     return "success", merged_game.game_guid
@@ -0,0 +1,24 @@
+'''Fill derived tables of databases created before they existed'''
+
+from sqlalchemy.orm import Session
+
+from mgxhub import logger
+
+from .update_coplay import coplay_edges_missing, rebuild_coplay_edges
+from .update_rating_ledger import rating_ledger_missing, rebuild_rating_ledger
+
+
+def backfill_tables(session: Session) -> None:
+    '''Fill tables derived from games and players if they are still empty.
+
+    Run once at startup, before requests are served and ratings are run.
+    Each fill is a full scan holding the write lock of the main database,
+    don't call it on request paths or in rating runs.
+
+    Defined in: `mgxhub/db/operation/backfill_tables.py`
+    '''
+
+    if coplay_edges_missing(session):
+        logger.info(f"[DB] Co-play edges filled: {rebuild_coplay_edges(session)}")
+    if rating_ledger_missing(session):
+        logger.info(f"[DB] Rating ledger filled: {rebuild_rating_ledger(session)} rows")
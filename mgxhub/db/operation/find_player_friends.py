@@ -1,11 +1,21 @@
 '''Find players who played with the given player most.'''
 
-from sqlalchemy import alias, desc, func
 from sqlalchemy.orm import Session
 
-from mgxhub.model.orm import Player
+from mgxhub.db import db_run
+from mgxhub.graph import CoPlayGraph
 
-# pylint: disable=not-callable
+
+def _coplay_graph(session: Session) -> CoPlayGraph:
+    '''Get the co-play graph, load it if needed.
+
+    Edges of databases created by an older version are filled at startup,
+    see `coplay_edges_missing()`.
+    '''
+
+    graph = CoPlayGraph()
+    graph.refresh(session)
+    return graph
 
 
 def get_close_friends(session: Session, name_hash: str, limit: int = 100) -> list:
@@ -18,31 +28,31 @@ def get_close_friends(session: Session, name_hash: str, limit: int = 100) -> lis
     Defined in: `mgxhub/db/operation/find_player_friends.py`
     '''
 
-    Friend = alias(Player, name='p2')
-
-    query = (
-        session.query(
-            Friend.c.name,
-            func.count('*').label('common_games_count')
-        )
-        .select_from(Player)
-        .join(
-            Friend, Player.game_guid == Friend.c.game_guid
-        )
-        .filter(
-            Player.name_hash == name_hash,
-            Player.name != Friend.c.name
-        )
-        .group_by(Friend.c.name)
-        .order_by(desc('common_games_count'))
-        .limit(limit)
-    )
-
-    result = query.all()
-    return [[row.name, row.common_games_count] for row in result]
-
-
-async def async_get_close_friends(session: Session, name_hash: str, limit: int = 100) -> list:
-    '''Async version of find_close_friends()'''
-
-    return get_close_friends(session, name_hash, limit)
+    return _coplay_graph(session).partners(name_hash, limit)
+
+
+def get_coplay_path(session: Session, source: str, target: str, max_depth: int = 6) -> list:
+    '''Shortest co-play path between two players.
+
+    Args:
+        source: the name_hash of the first player.
+        target: the name_hash of the second player.
+        max_depth: maximum degrees of separation to search.
+
+    Returns:
+        [[name, name_hash], ...] from source to target, empty if not connected.
+
+    Defined in: `mgxhub/db/operation/find_player_friends.py`
+    '''
+
+    graph = _coplay_graph(session)
+    path = graph.path(source, target, max_depth)
+    if not path:
+        return []
+    return [[graph.name(h), h] for h in path]
+
+
+async def async_get_close_friends(name_hash: str, limit: int = 100) -> list:
+    '''Async version of get_close_friends(), runs off the event loop with its own session'''
+
+    return await db_run(get_close_friends, name_hash, limit)
@@ -0,0 +1,121 @@
+'''Materialized game detail documents'''
+
+from sqlalchemy import asc, exists, func, literal, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from mgxhub import logger
+from mgxhub.model.orm import Chat, File, Game, GameDocument, Player
+from mgxhub.model.webapi import GameDetail
+from mgxhub.translator import Translator
+
+from .update_counters import bump_generation
+
+
+def _doc_lang(lang: str) -> str:
+    '''Language of the document to serve.
+
+    Codes without a catalog are served the untranslated `en` document, so
+    arbitrary input doesn't create documents.
+    '''
+
+    return lang if Translator().has(lang) else 'en'
+
+
+def build_game_document(session: Session, guid: str, lang: str = 'en') -> str | None:
+    '''Build the detail document of a game.
+
+    Returns:
+        Serialized `GameDetail`, or None if the game doesn't exist.
+
+    Defined in: `mgxhub/db/operation/game_document.py`
+    '''
+
+    game_basic = session.query(Game).filter(Game.game_guid == guid).first()
+    if game_basic is None:
+        return None
+
+    player_data = session.query(Player).filter(Player.game_guid == guid).all()
+    file_data = session.query(File).filter(File.game_guid == guid).limit(20).all()
+    chat_data = session.query(Chat.chat_time, Chat.chat_content)\
+        .filter(Chat.game_guid == guid)\
+        .group_by(Chat.chat_time, Chat.chat_content)\
+        .order_by(asc(Chat.chat_time))\
+        .all()
+
+    return GameDetail(game_basic, player_data, file_data, chat_data, lang).model_dump_json()
+
+
+def get_game_document(session: Session, guid: str, lang: str = 'en') -> str | None:
+    '''Get the detail document of a game, build and store it if missing.
+
+    The document is stored only if the revision of the game is unchanged
+    since before it was built. Storing is skipped if the database is busy,
+    the next request tries again.
+
+    Returns:
+        Serialized `GameDetail`, or None if the game doesn't exist.
+
+    Defined in: `mgxhub/db/operation/game_document.py`
+    '''
+
+    lang = _doc_lang(lang)
+    body = session.query(GameDocument.body).filter(
+        GameDocument.game_guid == guid,
+        GameDocument.lang == lang
+    ).scalar()
+    if body is not None:
+        return body
+
+    # Rows of older versions have no revision yet
+    revision = func.coalesce(Game.revision, 0)
+    built_from = session.query(revision).filter(Game.game_guid == guid).scalar()
+    body = build_game_document(session, guid, lang)
+    if body is None or built_from is None:
+        return body
+
+    # Only store it if the game was not changed or deleted while building
+    unchanged = select(literal(guid), literal(lang), literal(body)).where(
+        exists().where(Game.game_guid == guid, revision == built_from))
+    stmt = insert(GameDocument).from_select(['game_guid', 'lang', 'body'], unchanged)
+    try:
+        session.execute(stmt.on_conflict_do_update(index_elements=['game_guid', 'lang'], set_={'body': body}))
+        session.commit()
+    except OperationalError as e:
+        session.rollback()
+        logger.debug(f"[DB] Game document not stored: {e}")
+
+    return body
+
+
+def invalidate_game_document(session: Session, guid: str) -> None:
+    '''Remove stored documents of a game in all languages.
+
+    Bumps the revision of the game, documents being built from the data
+    before the change are not stored. Call it in the same transaction that
+    changes the game. Doesn't commit.
+
+    Defined in: `mgxhub/db/operation/game_document.py`
+    '''
+
+    session.query(GameDocument).filter(GameDocument.game_guid == guid).delete(synchronize_session=False)
+    session.query(Game).filter(Game.game_guid == guid).update(
+        {Game.revision: func.coalesce(Game.revision, 0) + 1}, synchronize_session=False)
+
+
+def purge_game_documents(session: Session) -> int:
+    '''Remove all stored documents, e.g. after translations are reloaded.
+
+    Bumps the games generation, validators of served documents change too.
+
+    Returns:
+        Number of documents removed.
+
+    Defined in: `mgxhub/db/operation/game_document.py`
+    '''
+
+    count = session.query(GameDocument).delete(synchronize_session=False)
+    bump_generation(session, 'games')
+    session.commit()
+    return count
@@ -3,10 +3,11 @@ from datetime import datetime
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from mgxhub.db import db_run
 from mgxhub.model.orm import File, Game, Player
 
 
-async def fetch_latest_games_async(session: Session, limit: int) -> dict:
+def fetch_latest_games(session: Session, limit: int) -> dict:
     '''Fetch recently uploaded games
 
     - **limit**: The number of games to fetch. Default is 100.
@@ -14,7 +15,7 @@ async def fetch_latest_games_async(session: Session, limit: int) -> dict:
     Returned data format:
         [game_guid, version_code, created_time, game_time, map_name, matchup, duration, speed, uploader]
 
-    Defined in: `webapi/routers/game_latest.py`
+    Defined in: `mgxhub/db/operation/get_games_latest.py`
     '''
 
     latest_game_query = select(
@@ -53,3 +54,9 @@ async def fetch_latest_games_async(session: Session, limit: int) -> dict:
     current_time = datetime.now().isoformat()
 
     return {'games': games, 'generated_at': current_time}
+
+
+async def fetch_latest_games_async(limit: int) -> dict:
+    '''Async version of fetch_latest_games(), runs off the event loop with its own session'''
+
+    return await db_run(fetch_latest_games, limit)
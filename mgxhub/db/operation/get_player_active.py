@@ -3,15 +3,16 @@ from datetime import datetime, timedelta
 from sqlalchemy import desc, func
 from sqlalchemy.orm import Session
 
+from mgxhub.db import db_run
 from mgxhub.model.orm import Player
 
 # pylint: disable=E1102
 
 
-async def get_active_players_async(session: Session, limit: int, days: int) -> dict:
+def get_active_players(session: Session, limit: int, days: int) -> dict:
     '''Newly found players.
 
-    Defined in: `webapi/routers/player_active.py`
+    Defined in: `mgxhub/db/operation/get_player_active.py`
     '''
 
     x_days_ago = datetime.now() - timedelta(days=days)
@@ -29,3 +30,9 @@ async def get_active_players_async(session: Session, limit: int, days: int) -> d
     players = [(row[0], row[1], row[2]) for row in result]
 
     return {"players": players, "threshold_date": x_days_ago.isoformat()}
+
+
+async def get_active_players_async(limit: int, days: int) -> dict:
+    '''Async version of get_active_players(), runs off the event loop with its own session'''
+
+    return await db_run(get_active_players, limit, days)
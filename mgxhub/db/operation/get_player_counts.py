@@ -5,6 +5,7 @@
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from mgxhub.db import db_run
 from mgxhub.model.orm import Game, Player
 
 
@@ -30,7 +31,7 @@ def get_player_totals(session: Session, name_hash: str) -> dict:
     return {"total_games": total_games, "total_wins": total_wins, "total_1v1_games": total_1v1}
 
 
-async def async_get_player_totals(session: Session, name_hash: str) -> dict:
-    '''Async version of fetch_player_totals()'''
+async def async_get_player_totals(name_hash: str) -> dict:
+    '''Async version of get_player_totals(), runs off the event loop with its own session'''
 
-    return get_player_totals(session, name_hash)
+    return await db_run(get_player_totals, name_hash)
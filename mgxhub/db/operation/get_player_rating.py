@@ -1,11 +1,11 @@
 '''Get rating page of where a player is located'''
 
-from sqlalchemy import asc, desc, func, select
 from sqlalchemy.orm import Session
 
 from mgxhub.model.orm import Rating
 
-# pylint: disable=not-callable
+from .get_rating_size import get_rating_size
+from .get_rating_table import fetch_rating_rows
 
 
 def get_player_rating_table(
@@ -29,51 +29,22 @@ def get_player_rating_table(
     '''
 
     matchup_value = '1v1' if matchup.lower() == '1v1' else 'team'
-    order_method = desc if order.lower() == 'desc' else asc
+    descending = order.lower() == 'desc'
 
     if page_size < 1:
         return []
 
-    rating_table = select(
-        func.row_number().over(order_by=[order_method(Rating.rating), desc(Rating.total)]).label('rownum'),
-        Rating.name,
-        Rating.name_hash,
-        Rating.rating,
-        Rating.total,
-        Rating.wins,
-        Rating.streak,
-        Rating.streak_max,
-        Rating.highest,
-        Rating.lowest,
-        Rating.first_played,
-        Rating.last_played
-    ).filter(
+    ratings_count = get_rating_size(session, version_code, matchup_value)
+    rank = session.query(Rating.rank).filter(
+        Rating.name_hash == (name_hash.lower() if name_hash else None),
         Rating.version_code == version_code,
         Rating.matchup == matchup_value
-    ).cte('rating_table')
+    ).limit(1).scalar()
+    if rank is None:
+        return [], ratings_count
 
-    name_hash_index = select(
-        rating_table.c.rownum
-    ).where(
-        rating_table.c.name_hash == (name_hash.lower() if name_hash else None)
-    ).cte('name_hash_index')
+    position = rank if descending else ratings_count + 1 - rank
+    first = (position - 1) // page_size * page_size + 1
+    ratings = fetch_rating_rows(session, version_code, matchup_value, descending, first, page_size, ratings_count)
 
-    name_hash_rownum = select(name_hash_index.c.rownum).limit(1).as_scalar()
-
-    ratings = session.query(
-        rating_table
-    ).filter(
-        rating_table.c.rownum > (name_hash_rownum // page_size) * page_size,
-        rating_table.c.rownum <= ((name_hash_rownum // page_size) + 1) * page_size
-    ).order_by(
-        rating_table.c.rownum
-    ).limit(page_size).correlate(rating_table, name_hash_index).all()
-
-    ratings_count = session.query(
-        func.count(Rating.rating)
-    ).filter(
-        Rating.version_code == version_code,
-        Rating.matchup == matchup_value
-    ).scalar()
-
-    return [list(row) for row in ratings], ratings_count
+    return ratings, ratings_count
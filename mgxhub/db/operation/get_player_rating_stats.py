@@ -2,6 +2,7 @@
 
 from sqlalchemy.orm import Session
 
+from mgxhub.db import db_run
 from mgxhub.model.orm import Rating
 
 # pylint: disable=not-callable
@@ -29,7 +30,7 @@ def get_player_rating_stats(session: Session, name_hash: str) -> list:
     return [tuple(row) for row in result]
 
 
-async def async_get_player_rating_stats(session: Session, name_hash: str) -> list:
-    '''Async version of fetch_player_rating_stats()'''
+async def async_get_player_rating_stats(name_hash: str) -> list:
+    '''Async version of get_player_rating_stats(), runs off the event loop with its own session'''
 
-    return get_player_rating_stats(session, name_hash)
+    return await db_run(get_player_rating_stats, name_hash)
@@ -1,11 +1,11 @@
 '''Get recent games of a player.'''
 
-import gettext
-
 from sqlalchemy import desc
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
-from mgxhub.model.orm import Game, Player
+from mgxhub.db import db_run
+from mgxhub.model.orm import Game, Player, RatingHistory
+from mgxhub.translator import Translator
 
 
 def get_player_recent_games(db: Session, name_hash: str, limit: int = 50, offset: int = 0, lang: str = 'en') -> list:
@@ -18,8 +18,10 @@ def get_player_recent_games(db: Session, name_hash: str, limit: int = 50, offset
     Defined in: `mgxhub/db/operation/get_player_recent_games.py`
     '''
 
-    recent_games = db.query(Game, Player.rating_change)\
+    recent_games = db.query(Game, RatingHistory.rating_change)\
+        .options(selectinload(Game.players))\
         .join(Player, Game.game_guid == Player.game_guid)\
+        .outerjoin(RatingHistory, RatingHistory.player_id == Player.id)\
         .filter(Player.name_hash == name_hash)\
         .group_by(Game.game_guid)\
         .order_by(desc(Game.game_time))\
@@ -27,13 +29,16 @@ def get_player_recent_games(db: Session, name_hash: str, limit: int = 50, offset
         .limit(limit)\
         .all()
 
-    t = gettext.translation(lang, localedir='translations', languages=["en"], fallback=True)
-    _ = t.gettext
+    map_names = Translator().translate_column(lang, 'map_name', [g.map_name for g, _ in recent_games])
 
-    return [(g.game_guid, g.version_code, _(g.map_name), g.matchup, g.duration, g.game_time, p, [[_.name, _.name_hash] for _ in g.players]) for g, p in recent_games]
+    return [
+        (g.game_guid, g.version_code, m, g.matchup, g.duration, g.game_time, p,
+         [[_.name, _.name_hash] for _ in g.players])
+        for (g, p), m in zip(recent_games, map_names)
+    ]
 
 
-async def async_get_player_recent_games(db: Session, name_hash: str, limit: int = 50, offset: int = 0, lang: str = 'en') -> list:
-    '''Async version of fetch_player_recent_games()'''
+async def async_get_player_recent_games(name_hash: str, limit: int = 50, offset: int = 0, lang: str = 'en') -> list:
+    '''Async version of get_player_recent_games(), runs off the event loop with its own session'''
 
-    return get_player_recent_games(db, name_hash, limit, offset, lang)
+    return await db_run(get_player_recent_games, name_hash, limit, offset, lang)
@@ -0,0 +1,18 @@
+'''Get the generation of published ratings'''
+
+from sqlalchemy.orm import Session
+
+from mgxhub.model.orm import RatingMeta
+
+
+def get_rating_generation(session: Session) -> int:
+    '''Get the generation of published ratings.
+
+    Bumped by every rating run that changed the ratings table, use it in
+    cache keys of rating data. 0 if ratings were never published.
+
+    Defined in: `mgxhub/db/operation/get_rating_generation.py`
+    '''
+
+    value = session.query(RatingMeta.value).filter(RatingMeta.key == 'generation').scalar()
+    return int(value) if value else 0
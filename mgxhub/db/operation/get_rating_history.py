@@ -0,0 +1,49 @@
+'''Get the rating curve of a player'''
+
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from mgxhub.model.orm import RatingHistory
+from mgxhub.util import lttb
+
+
+def get_rating_history(
+    session: Session,
+    name_hash: str,
+    version_code: str = 'AOC10',
+    matchup: str = 'team',
+    points: int = 300
+) -> list[tuple[str, int]]:
+    '''Get the rating curve of a player, downsampled for drawing.
+
+    Only the last rating of each day is used, and if there are still more
+    than `points` days they are reduced by LTTB. Only the covering index of
+    the history table is read.
+
+    Args:
+        name_hash: the name_hash of the player.
+        version_code: version code of the games.
+        matchup: '1v1' or 'team'.
+        points: maximum number of points returned.
+
+    Returns:
+        (date, rating) pairs in time order, date like `2024-02-29`.
+
+    Defined in: `mgxhub/db/operation/get_rating_history.py`
+    '''
+
+    matchup_value = '1v1' if matchup.lower() == '1v1' else 'team'
+    rows = session.query(RatingHistory.game_time, RatingHistory.rating).filter(
+        RatingHistory.name_hash == name_hash,
+        RatingHistory.version_code == version_code,
+        RatingHistory.matchup == matchup_value
+    ).order_by(RatingHistory.game_time, RatingHistory.player_id)
+
+    daily: dict[str, tuple[datetime, int]] = {}
+    for game_time, rating in rows:
+        daily[game_time.date().isoformat()] = (game_time, rating)
+
+    curve = list(daily.items())
+    kept = lttb([(t.timestamp(), rating) for _, (t, rating) in curve], max(points, 2))
+    return [(curve[i][0], curve[i][1][1]) for i in kept]
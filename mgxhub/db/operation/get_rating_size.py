@@ -0,0 +1,30 @@
+'''Get the number of players in a rating partition'''
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from mgxhub.model.orm import Rating, RatingMeta
+
+# pylint: disable=not-callable
+
+
+def get_rating_size(session: Session, version_code: str, matchup: str) -> int:
+    '''Get the number of players in a rating partition.
+
+    Stored when ratings are published, counted if not stored yet.
+
+    Args:
+        version_code: Version code of the game.
+        matchup: '1v1' or 'team'.
+
+    Defined in: `mgxhub/db/operation/get_rating_size.py`
+    '''
+
+    value = session.query(RatingMeta.value).filter(RatingMeta.key == f'size:{version_code}:{matchup}').scalar()
+    if value:
+        return int(value)
+
+    return session.query(func.count(Rating.id)).filter(
+        Rating.version_code == version_code,
+        Rating.matchup == matchup
+    ).scalar()
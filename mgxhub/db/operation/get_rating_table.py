@@ -1,12 +1,121 @@
 '''Get rating table'''
 
-from sqlalchemy import asc, desc, func
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from mgxhub.model.orm import Rating
+from mgxhub.config import cfg
+from mgxhub.model.orm import Rating, RatingActivity
+
+from .get_rating_size import get_rating_size
 
 # pylint: disable=not-callable
 
+_ROW_COLUMNS = (Rating.name, Rating.name_hash, Rating.rating, Rating.total, Rating.wins, Rating.streak,
+                Rating.streak_max, Rating.highest, Rating.lowest, Rating.first_played, Rating.last_played)
+
+
+def fetch_rating_rows(
+    db: Session,
+    version_code: str,
+    matchup: str,
+    descending: bool,
+    first: int,
+    count: int,
+    size: int
+) -> list[list]:
+    '''Get `count` rows of a rating partition from position `first` on.
+
+    Positions start from 1 and follow the stored ranks, reversed if not
+    `descending`, so only a range of the rank index is read.
+
+    Args:
+        matchup: '1v1' or 'team'.
+        size: number of players in the partition.
+
+    Defined in: `mgxhub/db/operation/get_rating_table.py`
+    '''
+
+    last = first + count - 1
+    if descending:
+        rownum, low, high, order = Rating.rank, first, last, Rating.rank
+    else:
+        rownum, low, high, order = size + 1 - Rating.rank, size + 1 - last, size + 1 - first, Rating.rank.desc()
+
+    ratings = db.query(
+        rownum.label('rownum'),
+        *_ROW_COLUMNS
+    ).filter(
+        Rating.version_code == version_code,
+        Rating.matchup == matchup,
+        Rating.rank.between(low, high)
+    ).order_by(order).all()
+
+    return [list(row) for row in ratings]
+
+
+def fetch_window_rows(
+    db: Session,
+    version_code: str,
+    matchup: str,
+    descending: bool,
+    first: int,
+    count: int,
+    window: int
+) -> tuple[list[list], int]:
+    '''Get `count` rows of the players active in the last `window` days.
+
+    Players who played rated games in the last `window` days, today
+    included, ordered by their stored ranks. Their games and wins of these
+    days are appended to each row. Positions start from 1 among them.
+
+    Args:
+        matchup: '1v1' or 'team'.
+
+    Returns:
+        The rows and the number of active players.
+
+    Raises:
+        ValueError: if `window` is longer than `rating.activitydays`.
+
+    Defined in: `mgxhub/db/operation/get_rating_table.py`
+    '''
+
+    days = cfg.getint('rating', 'activitydays')
+    if not 0 < window <= days:
+        raise ValueError(f"Window must be 1 to {days} days")
+
+    active = select(
+        RatingActivity.name_hash,
+        func.sum(RatingActivity.games).label('games'),
+        func.sum(RatingActivity.wins).label('wins')
+    ).where(
+        RatingActivity.version_code == version_code,
+        RatingActivity.matchup == matchup,
+        RatingActivity.day >= date.today() - timedelta(days=window - 1)
+    ).group_by(RatingActivity.name_hash).subquery()
+    size = db.query(func.count()).select_from(active).scalar()
+
+    ratings = db.query(
+        *_ROW_COLUMNS,
+        active.c.games,
+        active.c.wins
+    ).join(
+        active, active.c.name_hash == Rating.name_hash
+    ).filter(
+        Rating.version_code == version_code,
+        Rating.matchup == matchup
+    ).order_by(
+        Rating.rank if descending else Rating.rank.desc()
+    ).offset(first - 1).limit(count).all()
+
+    if descending:
+        rownums = range(first, first + len(ratings))
+    else:
+        rownums = range(size + 1 - first, size + 1 - first - len(ratings), -1)
+    return [[n, *row] for n, row in zip(rownums, ratings)], size
+
 
 def get_rating_table(
     db: Session,
@@ -15,6 +124,7 @@ def get_rating_table(
     order: str = 'desc',
     page: int = 0,
     page_size: int = 100,
+    window: int | None = None
 ) -> tuple[list[list], int]:
     '''Get ratings information.
 
@@ -22,44 +132,22 @@ def get_rating_table(
         version_code: Version code of the game.
         matchup: Matchup of the game.
         page_size: page size of the result.
+        window: only players active in the last `window` days, see
+            `fetch_window_rows()`.
 
     Defined in: `mgxhub/db/operation/get_rating_table.py`
     '''
 
     matchup_value = '1v1' if matchup.lower() == '1v1' else 'team'
-    order_method = desc if order.lower() == 'desc' else asc
     if page < 0 or page_size < 1:
         return []
 
-    ratings = db.query(
-        func.row_number().over(order_by=order_method(Rating.rating)).label('rownum'),
-        Rating.name,
-        Rating.name_hash,
-        Rating.rating,
-        Rating.total,
-        Rating.wins,
-        Rating.streak,
-        Rating.streak_max,
-        Rating.highest,
-        Rating.lowest,
-        Rating.first_played,
-        Rating.last_played
-    ).filter(
-        Rating.version_code == version_code,
-        Rating.matchup == matchup_value
-    ).order_by(
-        order_method(Rating.rating)
-    ).limit(
-        page_size
-    ).offset(
-        page * page_size
-    ).all()
-
-    ratings_count = db.query(
-        func.count(Rating.rating)
-    ).filter(
-        Rating.version_code == version_code,
-        Rating.matchup == matchup_value
-    ).scalar()
+    if window:
+        return fetch_window_rows(
+            db, version_code, matchup_value, order.lower() == 'desc', page * page_size + 1, page_size, window)
+
+    ratings_count = get_rating_size(db, version_code, matchup_value)
+    ratings = fetch_rating_rows(
+        db, version_code, matchup_value, order.lower() == 'desc', page * page_size + 1, page_size, ratings_count)
 
-    return [list(row) for row in ratings], ratings_count
+    return ratings, ratings_count
@@ -1,56 +1,40 @@
 '''Get stats of total games/players, etc.'''
 
-from datetime import datetime
+from datetime import datetime, timezone
 
-from sqlalchemy import func, literal_column, select, union_all
 from sqlalchemy.orm import Session
 
-from mgxhub.model.orm import Game, Player
+from mgxhub.db import db_run
 
-# pylint: disable=E1102
+from .update_counters import get_counters, month_key
 
 
 def get_total_stats_raw(db: Session) -> dict:
     '''Get unique games/players count, new games this month
 
+    Read from the live counters, see `update_counters.py`.
+
     Returns:
         A dictionary containing the stats.
 
-    Defined in: `mgxhub/db/operation/stats_index.py`
+    Defined in: `mgxhub/db/operation/get_total_stats.py`
     '''
 
-    unique_games = select(
-        literal_column("'unique_games'").label('stat'),
-        func.count(Game.game_guid.distinct()))
-    unique_players = select(
-        literal_column("'unique_players'").label('stat'),
-        func.count(Player.name_hash.distinct()))
-
-    current_time = datetime.now()
-    current_month_start = current_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    monthly_games = select(
-        literal_column("'monthly_games'").label('stat'),
-        func.count(Game.id)).filter(Game.created >= current_month_start)
-
-    query = union_all(unique_games, unique_players, monthly_games)
-
-    result = db.execute(query)
-    results = result.fetchall()
-    stats = dict(results)
+    totals = get_counters(db, 'total')
+    monthly = get_counters(db, 'monthly')
 
-    stats['generated_at'] = datetime.now().isoformat()
+    return {
+        'unique_games': totals.get('games', 0),
+        'unique_players': totals.get('players', 0),
+        'monthly_games': monthly.get(month_key(datetime.now(timezone.utc)), 0),
+        'generated_at': datetime.now().isoformat()
+    }
 
-    return stats
 
+async def get_total_stats_raw_async() -> dict:
+    '''Async version of get_total_stats_raw(), runs off the event loop with its own session
 
-async def get_total_stats_raw_async(db: Session) -> dict:
-    '''Get unique games/players count, new games this month
-
-    Returns:
-        A dictionary containing the stats.
-
-    Defined in: `mgxhub/db/operation/stats_index.py`
+    Defined in: `mgxhub/db/operation/get_total_stats.py`
     '''
 
-    return get_total_stats_raw(db)
+    return await db_run(get_total_stats_raw)
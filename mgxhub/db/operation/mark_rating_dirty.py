@@ -0,0 +1,45 @@
+'''Tell the rating engine which games changed'''
+
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from mgxhub.model.orm import Game, RatingDirty
+
+
+def rating_eligible(game: Game) -> bool:
+    '''Whether a game may be counted by the rating engine.
+
+    Duration is not checked, runs may rate with another threshold than
+    `rating.durationthreshold`. The engine filters games by the threshold
+    of each run.
+
+    Defined in: `mgxhub/db/operation/mark_rating_dirty.py`
+    '''
+
+    return bool(game.is_multiplayer) and not game.include_ai
+
+
+def mark_rating_dirty(session: Session, game_time: datetime) -> None:
+    '''Record that a game at `game_time` was added, changed or deleted.
+
+    The next rating run restores the last snapshot before the earliest
+    recorded time and rates again from there, if it is not after the last
+    rated game. Doesn't commit.
+
+    Defined in: `mgxhub/db/operation/mark_rating_dirty.py`
+    '''
+
+    stmt = insert(RatingDirty).values(id=1, game_time=game_time, seq=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['id'],
+        set_={
+            'game_time': func.min(func.coalesce(RatingDirty.game_time, stmt.excluded.game_time),
+                                  stmt.excluded.game_time),
+            'seq': RatingDirty.seq + 1,
+            'updated': func.now()
+        }
+    )
+    session.execute(stmt)
@@ -1,13 +1,13 @@
 '''Search games in the database'''
 
-import gettext
 from datetime import datetime
 
 from sqlalchemy import desc
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from mgxhub.model.orm import Game
 from mgxhub.model.searchcriteria import SearchCriteria
+from mgxhub.translator import Translator
 
 
 def search_games(session: Session, criteria: SearchCriteria, lang: str = 'en') -> dict:
@@ -26,7 +26,9 @@ def search_games(session: Session, criteria: SearchCriteria, lang: str = 'en') -
     Defined in: `mgxhub/model/searchresult.py`
     '''
 
-    query = session.query(Game)
+    # Players of all games on the page are fetched with one `IN` query
+    # instead of a lazy load per game.
+    query = session.query(Game).options(selectinload(Game.players))
 
     if criteria.game_guid and len(criteria.game_guid) == 32:
         query = query.filter(Game.game_guid == criteria.game_guid)
@@ -71,25 +73,28 @@ def search_games(session: Session, criteria: SearchCriteria, lang: str = 'en') -
 
     query = query.order_by(order_by).limit(criteria.page_size).offset((criteria.page - 1) * criteria.page_size)
 
-    t = gettext.translation(lang, localedir='translations', languages=["en"], fallback=True)
-    _ = t.gettext
-
     games = [{
         'game_guid': game.game_guid,
         'version_code': game.version_code,
-        'map_name': _(game.map_name),
+        'map_name': game.map_name,
         'matchup': game.matchup,
         'duration': game.duration,
         'game_time': game.game_time,
         'population': game.population,
         'include_ai': game.include_ai,
         'is_multiplayer': game.is_multiplayer,
-        'speed': _(game.speed),
-        'victory_type': _(game.victory_type),
-        'map_size': _(game.map_size),
+        'speed': game.speed,
+        'victory_type': game.victory_type,
+        'map_size': game.map_size,
         'instruction': game.instruction,
         'players': [(player.slot, player.name, player.civ_name, player.type, player.name_hash) for player in game.players]
     } for game in query.all()]
+
+    t = Translator()
+    for column in ['map_name', 'speed', 'victory_type', 'map_size']:
+        values = t.translate_column(lang, column, [g[column] for g in games])
+        for g, value in zip(games, values):
+            g[column] = value
     current_time = datetime.now().isoformat()
 
     return {'games': games, 'generated_at': current_time}
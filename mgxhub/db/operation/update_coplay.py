@@ -0,0 +1,171 @@
+'''Maintain the co-play edge table'''
+
+from datetime import datetime
+from itertools import permutations
+
+from sqlalchemy import and_, case, func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+
+from mgxhub.model.orm import CoPlay, Counter, Game, Player
+
+from .update_counters import bump_generation
+
+# pylint: disable=not-callable
+
+
+def _next_seq(session: Session) -> int:
+    '''Bump the `coplay` generation, changed edges are stamped with it.
+
+    Writes are serialized by SQLite, committed stamps only grow. Processes
+    catch up with edges stamped after the generation they loaded, see
+    `CoPlayGraph`.
+    '''
+
+    bump_generation(session, 'coplay')
+    return session.query(Counter.value).filter(Counter.scope == 'generation', Counter.key == 'coplay').scalar()
+
+
+def coplay_members(players: list[Player]) -> list[tuple[str, str, bool]]:
+    '''Unique (name_hash, name, is_winner) of players in a game.
+
+    Players with the same name in one game are counted only once.
+
+    Defined in: `mgxhub/db/operation/update_coplay.py`
+    '''
+
+    members = {}
+    for p in players:
+        if p.name_hash not in members:
+            members[p.name_hash] = (p.name_hash, p.name, bool(p.is_winner))
+    return list(members.values())
+
+
+def add_coplay_edges(session: Session, members: list[tuple[str, str, bool]], game_time: datetime) -> None:
+    '''Count a game into the co-play edges of its players.
+
+    Doesn't commit, the caller decides the transaction boundary.
+
+    Args:
+        members: result of `coplay_members()`.
+        game_time: time of the game.
+
+    Defined in: `mgxhub/db/operation/update_coplay.py`
+    '''
+
+    seq = _next_seq(session)
+    for (hash_a, _, win_a), (hash_b, name_b, win_b) in permutations(members, 2):
+        wins = 1 if win_a and win_b else 0
+        stmt = sqlite_insert(CoPlay).values(
+            name_hash_a=hash_a,
+            name_hash_b=hash_b,
+            name_b=name_b,
+            games=1,
+            wins_together=wins,
+            last_played=game_time,
+            seq=seq
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name_hash_a', 'name_hash_b'],
+            set_={
+                'games': CoPlay.games + 1,
+                'wins_together': CoPlay.wins_together + wins,
+                'seq': seq,
+                'last_played': func.max(func.coalesce(CoPlay.last_played, stmt.excluded.last_played),
+                                        stmt.excluded.last_played)
+            }
+        )
+        session.execute(stmt)
+
+
+def remove_coplay_edges(session: Session, members: list[tuple[str, str, bool]]) -> None:
+    '''Take a deleted game out of the co-play edges of its players.
+
+    `last_played` is left as is. Edges left without games are kept, so
+    other processes see them gone, see `CoPlayGraph`. Doesn't commit.
+
+    Defined in: `mgxhub/db/operation/update_coplay.py`
+    '''
+
+    seq = _next_seq(session)
+    for (hash_a, _, win_a), (hash_b, _, win_b) in permutations(members, 2):
+        wins = 1 if win_a and win_b else 0
+        session.query(CoPlay).filter(
+            CoPlay.name_hash_a == hash_a,
+            CoPlay.name_hash_b == hash_b
+        ).update({
+            CoPlay.games: CoPlay.games - 1,
+            CoPlay.wins_together: CoPlay.wins_together - wins,
+            CoPlay.seq: seq
+        }, synchronize_session=False)
+
+
+def replace_coplay_edges(
+        session: Session,
+        old_members: list[tuple[str, str, bool]],
+        members: list[tuple[str, str, bool]],
+        game_time: datetime
+) -> bool:
+    '''Move a re-parsed game from the edges of its old players to the new ones.
+
+    Doesn't commit.
+
+    Returns:
+        True if the players or winners changed and edges were updated.
+
+    Defined in: `mgxhub/db/operation/update_coplay.py`
+    '''
+
+    if sorted(old_members) == sorted(members):
+        return False
+    remove_coplay_edges(session, old_members)
+    add_coplay_edges(session, members, game_time)
+    return True
+
+
+def rebuild_coplay_edges(session: Session) -> int:
+    '''Rebuild the whole co-play edge table from the players table.
+
+    Used to fill the table for databases created before it existed, at
+    startup, see `coplay_edges_missing()`. Takes the write lock for the
+    whole self-join, don't call it on request paths.
+
+    Returns:
+        Number of edges created.
+
+    Defined in: `mgxhub/db/operation/update_coplay.py`
+    '''
+
+    seq = _next_seq(session)
+    Partner = aliased(Player)
+    edges = select(
+        Player.name_hash,
+        Partner.name_hash,
+        func.max(Partner.name),
+        func.count(Player.game_guid.distinct()),
+        func.count(case((and_(Player.is_winner, Partner.is_winner), Player.game_guid)).distinct()),
+        func.max(Game.game_time),
+        literal(seq)
+    ).select_from(Player).join(
+        Partner, and_(Player.game_guid == Partner.game_guid, Player.name_hash != Partner.name_hash)
+    ).join(
+        Game, Game.game_guid == Player.game_guid
+    ).group_by(
+        Player.name_hash, Partner.name_hash
+    )
+
+    session.query(CoPlay).delete()
+    result = session.execute(insert(CoPlay).from_select(
+        ['name_hash_a', 'name_hash_b', 'name_b', 'games', 'wins_together', 'last_played', 'seq'], edges))
+    session.commit()
+
+    return result.rowcount
+
+
+def coplay_edges_missing(session: Session) -> bool:
+    '''Whether the edge table is empty while the players table is not.
+
+    Defined in: `mgxhub/db/operation/update_coplay.py`
+    '''
+
+    return session.query(CoPlay.id).first() is None and session.query(Player.id).first() is not None
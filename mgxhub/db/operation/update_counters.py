@@ -0,0 +1,208 @@
+'''Maintain live counters of games and players, and generations of the data'''
+
+import time
+from datetime import datetime
+
+from sqlalchemy import desc, func, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from mgxhub import logger
+from mgxhub.model.orm import Counter, Game, Player, RatingMeta
+
+# pylint: disable=not-callable
+
+# Game columns with per-value counters
+FACETS = ('matchup', 'version_code', 'map_size', 'speed', 'victory_type')
+
+# Data with a generation, changed by every change of it. Generations of
+# ratings are kept by the rating engine in its own database, see
+# `get_rating_generation()`.
+GENERATIONS = ('games', 'players', 'ratings')
+
+
+def _bump(session: Session, scope: str, key: str, delta: int) -> None:
+    stmt = insert(Counter).values(scope=scope, key=key, value=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['scope', 'key'],
+        set_={'value': Counter.value + delta, 'updated': func.now()}
+    )
+    session.execute(stmt)
+
+
+def month_key(t: datetime) -> str:
+    '''Key of the monthly bucket of a time, like `2024-02`.
+
+    Buckets are in UTC, as `games.created` is filled by SQLite.
+    '''
+
+    return t.strftime('%Y-%m')
+
+
+def count_game_facets(session: Session, facets: dict, delta: int) -> None:
+    '''Count option values of a game into per-value counters.
+
+    Doesn't commit, the caller decides the transaction boundary.
+
+    Args:
+        facets: column name -> value, columns are those in `FACETS`.
+        delta: 1 for an added game, -1 for a removed one.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    for column in FACETS:
+        if facets.get(column):
+            _bump(session, column, facets[column], delta)
+
+
+def count_game_total(session: Session, created: datetime, delta: int) -> None:
+    '''Count a game into the total and monthly counters. Doesn't commit.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    _bump(session, 'total', 'games', delta)
+    _bump(session, 'monthly', month_key(created), delta)
+
+
+def count_new_players(session: Session, name_hashes: set[str]) -> None:
+    '''Count players not found in the players table yet.
+
+    Must be called before the new player rows are flushed. Doesn't commit.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    found = {row[0] for row in session.query(Player.name_hash).filter(
+        Player.name_hash.in_(name_hashes)).distinct()}
+    if len(name_hashes) > len(found):
+        _bump(session, 'total', 'players', len(name_hashes) - len(found))
+
+
+def uncount_gone_players(session: Session, name_hashes: set[str]) -> None:
+    '''Uncount players who have no rows left in the players table.
+
+    Must be called after the player rows are deleted. Doesn't commit.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    found = {row[0] for row in session.query(Player.name_hash).filter(
+        Player.name_hash.in_(name_hashes)).distinct()}
+    if len(name_hashes) > len(found):
+        _bump(session, 'total', 'players', len(found) - len(name_hashes))
+
+
+def bump_generation(session: Session, *names: str) -> None:
+    '''Bump the generation counters of changed games or players.
+
+    Doesn't commit, the bump is part of the change. The session is marked
+    in `session.info['generation_bumped']`, so that this process can drop
+    its copy of the generations once the change is committed.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    for name in names:
+        _bump(session, 'generation', name, 1)
+    session.info['generation_bumped'] = True
+
+
+def get_generations(session: Session) -> dict[str, tuple[int, datetime | None]]:
+    '''Generations of the data, see `GENERATIONS`.
+
+    Returns:
+        name -> (generation, time of the last change in UTC). `(0, None)` for
+        data never changed since the generation exists.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    result = {name: (0, None) for name in GENERATIONS}
+    result.update({key: (value, updated) for key, value, updated in session.query(
+        Counter.key, Counter.value, Counter.updated).filter(Counter.scope == 'generation')})
+    ratings = session.query(RatingMeta.value, RatingMeta.updated).filter(RatingMeta.key == 'generation').first()
+    if ratings and ratings[0]:
+        result['ratings'] = (int(ratings[0]), ratings[1])
+    return result
+
+
+def get_counters(session: Session, scope: str) -> dict:
+    '''Counters of a scope, biggest first. Zero counters are omitted.
+
+    Read only. Counters of a database created by an older version are empty
+    until reconciled at startup, see `reconcile_counters_if_due()`.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    result = session.query(Counter.key, Counter.value).filter(
+        Counter.scope == scope,
+        Counter.value > 0
+    ).order_by(desc(Counter.value)).all()
+
+    return dict(result)
+
+
+def reconcile_counters(session: Session) -> int:
+    '''Recount everything from the games and players tables.
+
+    Fixes any drift of the live counters. Runs in one transaction taking
+    the write lock before counting, so no game is added between the counts
+    and the write. Readers see either the old or the new counters.
+    Generations are kept, they count changes and can't be recounted.
+    Pending changes of the session are committed first.
+
+    Returns:
+        Number of counters whose value changed.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    session.commit()
+    session.execute(text('BEGIN IMMEDIATE'))
+    counts = {
+        ('total', 'games'): session.query(func.count(Game.id)).scalar(),
+        ('total', 'players'): session.query(func.count(Player.name_hash.distinct())).scalar()
+    }
+    for column in FACETS:
+        col = getattr(Game, column)
+        for value, count in session.query(col, func.count(Game.id)).filter(col.isnot(None)).group_by(col):
+            if value:
+                counts[(column, value)] = count
+    month = func.strftime('%Y-%m', Game.created)
+    for value, count in session.query(month, func.count(Game.id)).filter(Game.created.isnot(None)).group_by(month):
+        counts[('monthly', value)] = count
+    counts[('meta', 'reconciled')] = int(time.time())
+
+    kept = Counter.scope == 'generation'
+    current = {(c.scope, c.key): c.value for c in session.query(Counter).filter(~kept)}
+    drift = sum(1 for k, v in counts.items() if k[0] != 'meta' and current.get(k, 0) != v)
+    drift += sum(1 for k, v in current.items() if k[0] != 'meta' and k not in counts and v != 0)
+
+    session.query(Counter).filter(~kept).delete(synchronize_session=False)
+    session.bulk_insert_mappings(Counter, [
+        {'scope': scope, 'key': key, 'value': value} for (scope, key), value in counts.items()
+    ])
+    session.commit()
+
+    if drift:
+        logger.warning(f'[DB] Counters reconciled, {drift} drifted')
+    return drift
+
+
+def reconcile_counters_if_due(session: Session, max_age: int = 24 * 3600) -> bool:
+    '''Reconcile counters if never done or done more than `max_age` seconds ago.
+
+    Returns:
+        True if reconciled.
+
+    Defined in: `mgxhub/db/operation/update_counters.py`
+    '''
+
+    last = session.query(Counter.value).filter(Counter.scope == 'meta', Counter.key == 'reconciled').scalar()
+    if last and time.time() - last < max_age:
+        return False
+    reconcile_counters(session)
+    return True
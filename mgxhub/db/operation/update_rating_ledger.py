@@ -0,0 +1,73 @@
+'''Maintain the ledger of rows the rating engine may rate'''
+
+from sqlalchemy import case, delete, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from mgxhub.model.orm import Game, Player, RatingLedger
+
+_LEDGER_COLUMNS = ['player_id', 'game_time', 'game_guid', 'duration', 'version_code',
+                   'matchup', 'name_hash', 'name', 'is_winner']
+
+
+def _ledger_rows() -> Select:
+    '''Ledger rows built from the games and players tables.'''
+
+    return select(
+        Player.id,
+        Game.game_time,
+        Game.game_guid,
+        Game.duration,
+        Game.version_code,
+        case((Game.matchup == '1v1', '1v1'), else_='team'),
+        Player.name_hash,
+        Player.name,
+        Player.is_winner
+    ).join(
+        Game, Player.game_guid == Game.game_guid
+    ).where(
+        Game.is_multiplayer == 1, Game.include_ai == 0, Player.is_main_operator == 1
+    )
+
+
+def update_rating_ledger(session: Session, game_guid: str) -> None:
+    '''Write the ledger rows of a game again, none if it was deleted.
+
+    Pending changes are flushed first. Doesn't commit.
+
+    Defined in: `mgxhub/db/operation/update_rating_ledger.py`
+    '''
+
+    session.flush()
+    session.execute(delete(RatingLedger).where(RatingLedger.game_guid == game_guid))
+    session.execute(insert(RatingLedger).from_select(
+        _LEDGER_COLUMNS, _ledger_rows().where(Game.game_guid == game_guid)))
+
+
+def rebuild_rating_ledger(session: Session) -> int:
+    '''Rebuild the whole ledger from the games and players tables.
+
+    Used to fill the table for databases created before it existed.
+
+    Returns:
+        Number of rows written.
+
+    Defined in: `mgxhub/db/operation/update_rating_ledger.py`
+    '''
+
+    session.query(RatingLedger).delete()
+    result = session.execute(insert(RatingLedger).from_select(_LEDGER_COLUMNS, _ledger_rows()))
+    session.commit()
+
+    return result.rowcount
+
+
+def rating_ledger_missing(session: Session) -> bool:
+    '''Whether the ledger is empty while the games table has rows for it.
+
+    Defined in: `mgxhub/db/operation/update_rating_ledger.py`
+    '''
+
+    if session.execute(select(RatingLedger.player_id).limit(1)).first() is not None:
+        return False
+    return session.execute(_ledger_rows().limit(1)).first() is not None
@@ -1,15 +1,131 @@
 '''Establish a SQLite3 connection and provide a SQLAlchemy session.'''
 
 import os
+from urllib.parse import quote
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, MetaData, create_engine, event, inspect, text
 from sqlalchemy.orm import Session, sessionmaker
 
-from mgxhub import cfg
-from mgxhub.model.orm import Base
+from mgxhub import cfg, logger
+from mgxhub.model.orm import RATING_SCHEMA, Base, RatingBase
 from mgxhub.singleton import Singleton
 
 
+def create_sqlite_engine(
+        db_path: str,
+        rating_db_path: str | None = None,
+        readonly_rating: bool = False,
+        **kwargs
+) -> Engine:
+    '''Engine of the main database, with the rating database attached as `rating`.
+
+    The rating database is only written by the rating engine, which then
+    holds the write lock of that file alone. Other processes attach it
+    read-only.
+
+    Args:
+        db_path: path to the main database file.
+        rating_db_path: path to the rating database file, `database.ratingdb`
+            if None.
+        readonly_rating: attach the rating database read-only, it must exist.
+        kwargs: passed to `create_engine()`.
+    '''
+
+    rating_db_path = os.path.abspath(rating_db_path or cfg.get('database', 'ratingdb'))
+    rating_uri = f"file:{quote(rating_db_path)}?mode={'ro' if readonly_rating else 'rwc'}"
+    # URI file names in ATTACH need a connection opened with URIs enabled
+    kwargs['connect_args'] = dict(kwargs.get('connect_args', {}), uri=True)
+    engine = create_engine(f"sqlite:///{db_path}", **kwargs)
+
+    @event.listens_for(engine, 'connect')
+    def attach_rating(dbapi_connection, _):
+        dbapi_connection.execute(f"ATTACH DATABASE ? AS {RATING_SCHEMA}", (rating_uri,))
+
+    return engine
+
+
+# Ratings of versions keeping them in the main database, ranked as when published
+_RATING_COLUMNS = ('name, name_hash, version_code, matchup, rating, wins, total, streak, streak_max, '
+                   'highest, lowest, first_played, last_played')
+_RATINGS_MIGRATION = text(f'''
+    INSERT INTO {RATING_SCHEMA}.ratings ({_RATING_COLUMNS}, rank)
+    SELECT {_RATING_COLUMNS}, row_number() OVER (
+        PARTITION BY version_code, matchup ORDER BY rating DESC, total DESC, name_hash)
+    FROM main.ratings
+''')
+
+
+def prepare_rating_db(db_path: str, rating_db_path: str | None = None) -> None:
+    '''Create the rating database, its missing tables and columns.
+
+    Ratings left in the main database by older versions are moved, see
+    `migrate_main_ratings()`.
+    '''
+
+    engine = create_sqlite_engine(db_path, rating_db_path)
+    try:
+        with engine.begin() as conn:
+            # Readers don't wait for the rating engine, nor it for them
+            conn.execute(text(f'PRAGMA {RATING_SCHEMA}.journal_mode = WAL'))
+        RatingBase.metadata.create_all(engine)
+        add_missing_columns(engine, RatingBase.metadata)
+        migrate_main_ratings(engine)
+    finally:
+        engine.dispose()
+
+
+def migrate_main_ratings(engine: Engine) -> int | None:
+    '''Move ratings of older versions from the main database to the rating one.
+
+    Ratings are copied if the rating database has none yet, and served
+    until the next run rates all games again. Rating tables are then
+    dropped from the main database. Done once, in one transaction.
+
+    Returns:
+        Number of ratings copied, None if there was nothing to move.
+    '''
+
+    names = [table.name for table in RatingBase.metadata.sorted_tables]
+    with engine.begin() as conn:
+        found = conn.execute(text(
+            "SELECT name FROM main.sqlite_master WHERE type = 'table' AND name IN "
+            f"({', '.join(repr(name) for name in names)})")).scalars().all()
+        if not found:
+            return None
+        copied = 0
+        if 'ratings' in found and conn.execute(text(f'SELECT 1 FROM {RATING_SCHEMA}.ratings LIMIT 1')).first() is None:
+            copied = conn.execute(_RATINGS_MIGRATION).rowcount
+        for name in found:
+            conn.execute(text(f'DROP TABLE main."{name}"'))
+    logger.info(f"[DB] Ratings moved to the rating database: {copied}, dropped from the main one: {', '.join(found)}")
+    return copied
+
+
+def add_missing_columns(engine: Engine, metadata: MetaData) -> None:
+    '''Add columns introduced after the tables were created.
+
+    `create_all()` only creates missing tables. New columns are added as
+    nullable, their values are filled by whoever owns them. Indexes on new
+    columns are created with them.
+    '''
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name, schema=table.schema)}
+            qualified = f'"{table.schema}"."{table.name}"' if table.schema else f'"{table.name}"'
+            added = set()
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {qualified} ADD COLUMN "{column.name}" {col_type}'))
+                    logger.info(f"[DB] Column added: {table.fullname}.{column.name}")
+                    added.add(column.name)
+            for index in table.indexes:
+                if added & {c.name for c in index.columns}:
+                    index.create(conn, checkfirst=True)
+
+
 class SQLite3Factory(metaclass=Singleton):
     '''Establish a SQLite3 connection and provide a SQLAlchemy session.'''
 
@@ -42,6 +158,8 @@ class SQLite3Factory(metaclass=Singleton):
     def prepare(self, db_path: str | None = None) -> None:
         '''Prepare a database engine.
 
+        The rating database is attached read-only, see `create_sqlite_engine()`.
+
         Args:
             db_path: Path to the database file.
         '''
@@ -49,9 +167,13 @@ class SQLite3Factory(metaclass=Singleton):
         if db_path is None:
             db_path = cfg.get('database', 'sqlite')
         self._db_path = os.path.join(cfg.get('system', 'projectroot'), db_path)
+        rating_db_path = os.path.join(cfg.get('system', 'projectroot'), cfg.get('database', 'ratingdb'))
+        prepare_rating_db(self._db_path, rating_db_path)
 
-        self._db_engine = create_engine(
-            f"sqlite:///{self._db_path}",
+        self._db_engine = create_sqlite_engine(
+            self._db_path,
+            rating_db_path,
+            readonly_rating=True,
             connect_args={"check_same_thread": False, "timeout": 30},
             echo=(cfg.get('system', 'echosql').lower() == 'on'),
             max_overflow=10,
@@ -59,5 +181,6 @@ class SQLite3Factory(metaclass=Singleton):
             pool_recycle=20
         )
         Base.metadata.create_all(self._db_engine)
+        add_missing_columns(self._db_engine, Base.metadata)
         self._db_sessionlocal = sessionmaker(autocommit=False, autoflush=False, bind=self._db_engine)
-        print(f"SQLite prepared: {self._db_path}")
+        print(f"SQLite prepared: {self._db_path}, ratings: {rating_db_path}")
@@ -0,0 +1,3 @@
+'''In-memory graphs built from game data.'''
+
+from .coplay import CoPlayGraph
@@ -0,0 +1,176 @@
+'''In-memory adjacency index of the co-play edge table.'''
+
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from mgxhub.logger import logger
+from mgxhub.model.orm import CoPlay, Counter
+from mgxhub.singleton import Singleton
+
+
+class CoPlayGraph(metaclass=Singleton):
+    '''In-memory adjacency index of the co-play edge table.
+
+    Partners of every player are kept sorted by common games, so top-K
+    partners is a slice. Edges changed by any process are caught up with
+    by their `seq`, the `coplay` generation of their last change. Writers
+    catch up right after committing, other processes at most
+    `CHECK_INTERVAL` seconds later.
+
+    Example:
+    ```python
+    from mgxhub.graph import CoPlayGraph
+
+    graph = CoPlayGraph()
+    graph.refresh(session)
+    graph.partners(name_hash, 10)  # [[name, games], ...]
+    graph.path(name_hash_a, name_hash_b)  # [name_hash_a, ..., name_hash_b]
+    ```
+    '''
+
+    CHECK_INTERVAL = 5  # seconds
+
+    def __init__(self):
+        self._adjacency: dict[str, list[list]] = {}  # name_hash -> [[games, partner_hash], ...]
+        self._names: dict[str, str] = {}
+        self._generation: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        '''Whether the index has been loaded.'''
+
+        return self._generation is not None
+
+    def refresh(self, session: Session, force: bool = False) -> None:
+        '''Load the edge table, or apply edges changed since the last check.
+
+        Checks at most every `CHECK_INTERVAL` seconds, now if `force`. Only
+        the first load blocks. When a check is already in progress, the
+        current index keeps being served.
+        '''
+
+        if not force and self.loaded and time.time() - self._checked_at < self.CHECK_INTERVAL:
+            return
+        if not self._lock.acquire(blocking=not self.loaded):
+            return
+        try:
+            # Read first, edges committed meanwhile are applied again next time
+            generation = session.query(Counter.value).filter(
+                Counter.scope == 'generation', Counter.key == 'coplay').scalar() or 0
+            if not self.loaded or generation < self._generation:
+                self._load(session)
+            elif generation > self._generation:
+                self._apply(session)
+            self._generation = generation
+            self._checked_at = time.time()
+        finally:
+            self._lock.release()
+
+    def _load(self, session: Session) -> None:
+        adjacency = {}
+        names = {}
+        query = session.query(CoPlay.name_hash_a, CoPlay.name_hash_b, CoPlay.name_b, CoPlay.games)\
+            .filter(CoPlay.games > 0)
+        for hash_a, hash_b, name_b, games in query.yield_per(50000):
+            adjacency.setdefault(hash_a, []).append([games, hash_b])
+            names[hash_b] = name_b
+        for partners in adjacency.values():
+            partners.sort(key=lambda e: e[0], reverse=True)
+        self._adjacency, self._names = adjacency, names
+        logger.debug(f'Co-play graph loaded: {len(adjacency)} players')
+
+    def _apply(self, session: Session) -> None:
+        '''Set edges changed after the loaded generation to their current games.'''
+
+        changed = set()
+        query = session.query(CoPlay.name_hash_a, CoPlay.name_hash_b, CoPlay.name_b, CoPlay.games)\
+            .filter(CoPlay.seq > self._generation)
+        for hash_a, hash_b, name_b, games in query:
+            partners = self._adjacency.setdefault(hash_a, [])
+            i = next((i for i, e in enumerate(partners) if e[1] == hash_b), None)
+            if games <= 0:
+                if i is not None:
+                    partners.pop(i)
+                continue
+            if i is None:
+                partners.append([games, hash_b])
+            else:
+                partners[i][0] = games
+            self._names[hash_b] = name_b
+            changed.add(hash_a)
+        for hash_a in changed:
+            self._adjacency[hash_a].sort(key=lambda e: e[0], reverse=True)
+
+    def name(self, name_hash: str) -> str | None:
+        '''Name of a player in the index.'''
+
+        return self._names.get(name_hash)
+
+    def partners(self, name_hash: str, limit: int = 100) -> list[list]:
+        '''Players who played with the given player most.
+
+        Returns:
+            [[name, common_games], ...], most common games first.
+        '''
+
+        return [[self._names.get(h), games] for games, h in self._adjacency.get(name_hash, [])[:limit]]
+
+    def path(self, source: str, target: str, max_depth: int = 6) -> list[str] | None:
+        '''Shortest co-play path between two players.
+
+        Bidirectional breadth-first search, expanding the smaller frontier
+        first.
+
+        Returns:
+            Name hashes from `source` to `target`, or None if they are not
+            connected within `max_depth` steps.
+        '''
+
+        if source == target:
+            return [source] if source in self._adjacency else None
+        if source not in self._adjacency or target not in self._adjacency:
+            return None
+
+        adjacency = self._adjacency
+        parents = {source: None}
+        children = {target: None}
+        front, back = [source], [target]
+        depth = 0
+        while front and back and depth < max_depth:
+            depth += 1
+            forward = len(front) <= len(back)
+            frontier, seen, other = (front, parents, children) if forward else (back, children, parents)
+            next_frontier = []
+            for node in frontier:
+                for _, neighbor in adjacency.get(node, []):
+                    if neighbor in seen:
+                        continue
+                    seen[neighbor] = node
+                    if neighbor in other:
+                        return self._join_path(neighbor, parents, children)
+                    next_frontier.append(neighbor)
+            if forward:
+                front = next_frontier
+            else:
+                back = next_frontier
+        return None
+
+    @staticmethod
+    def _join_path(meet: str, parents: dict, children: dict) -> list[str]:
+        '''Join the two half paths of a bidirectional search.'''
+
+        path = []
+        node = meet
+        while node is not None:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+        node = children[meet]
+        while node is not None:
+            path.append(node)
+            node = children[node]
+        return path
@@ -4,16 +4,30 @@
 
 # pylint: disable=R0903
 
-from sqlalchemy import (DECIMAL, JSON, Boolean, Column, DateTime, Float,
-                        ForeignKey, Index, Integer, SmallInteger, String, Text,
+from sqlalchemy import (DECIMAL, JSON, Boolean, Column, Date, DateTime,
+                        Float, ForeignKey, Index, Integer, LargeBinary,
+                        MetaData, SmallInteger, String, Text,
                         UniqueConstraint, func)
 from sqlalchemy.orm import DeclarativeBase, relationship
 
+# Name of the attached rating database
+RATING_SCHEMA = 'rating'
+
 
 class Base(DeclarativeBase):  # pylint: disable=missing-class-docstring
     pass
 
 
+class RatingBase(DeclarativeBase):
+    '''Tables written by the rating engine.
+
+    They are kept in a database file of their own, attached to connections
+    of the main database as `rating`, see `mgxhub.db.sqlite3`.
+    '''
+
+    metadata = MetaData(schema=RATING_SCHEMA)
+
+
 class Game(Base):
     '''Basic game information.
 
@@ -46,6 +60,8 @@ class Game(Base):
     # first_found = Column(DateTime)  # use created instead
     # 0: public, higher number means more private
     visibility = Column(SmallInteger, default=0)
+    # Bumped by every change dropping its detail documents, see `invalidate_game_document()`
+    revision = Column(Integer, default=0)
 
     players = relationship('Player', back_populates='game')
     files = relationship('File', back_populates='game')
@@ -84,7 +100,7 @@ class Player(Base):
     castle_time = Column(Integer)
     imperial_time = Column(Integer)
     resigned_time = Column(Integer)
-    rating_change = Column(Integer)
+    rating_change = Column(Integer)  # No longer written, see RatingHistory.rating_change
 
     game = relationship('Game', back_populates='players')
     files = relationship('File', back_populates='recorder',
@@ -163,7 +179,7 @@ class Chat(Base):
     idx_chat_time_content = Index('idx_chat_time_content', 'chat_time', 'chat_content')
 
 
-class Rating(Base):
+class Rating(RatingBase):
     '''Ratings information.
 
     Ratings information for each player.
@@ -187,6 +203,202 @@ class Rating(Base):
     first_played = Column(DateTime)
     last_played = Column(DateTime)
 
+    # Position in the partition, by rating, total and name_hash, set when
+    # ratings are published
+    rank = Column(Integer)
+
+    idx_ratings_rank = Index('idx_ratings_rank', version_code, matchup, rank)
+
+
+class RatingMeta(RatingBase):
+    '''Key-value state of the rating engine.
+
+    - `mark`: last rated game, `game_time` and its guid in `value`.
+    - `threshold`: duration threshold of the last run.
+    - `since_snapshot`: games rated since the last snapshot.
+    - `generation`: bumped by every run that changed the ratings table.
+    - `size:<version_code>:<matchup>`: number of players in a partition.
+    '''
+
+    __tablename__ = 'rating_meta'
+
+    key = Column(String(50), primary_key=True)
+    updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    game_time = Column(DateTime)
+    value = Column(Text)
+    seq = Column(Integer, default=0)
+
+
+class RatingSnapshot(RatingBase):
+    '''Periodic snapshots of the rating engine state.
+
+    `state` is the zlib compressed JSON of all player states right after
+    the game `(game_time, game_guid)` was rated.
+    '''
+
+    __tablename__ = 'rating_snapshots'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created = Column(DateTime, server_default=func.now())
+
+    game_time = Column(DateTime, index=True)
+    game_guid = Column(String(64))
+    state = Column(LargeBinary)
+
+
+class RatingHistory(RatingBase):
+    '''Rating of a player right after each rated game, and its change.
+
+    One row per rated row of the players table, written by the rating
+    engine. Used to draw rating curves, the index covers them.
+    '''
+
+    __tablename__ = 'rating_history'
+
+    player_id = Column(Integer, primary_key=True, autoincrement=False)
+
+    name_hash = Column(String(32))
+    version_code = Column(String(10))
+    matchup = Column(String(20))
+    game_time = Column(DateTime)
+    rating = Column(Integer)
+    rating_change = Column(Integer)
+
+    idx_rating_history_curve = Index('idx_rating_history_curve', name_hash, version_code, matchup, game_time, rating)
+
+
+class RatingActivity(RatingBase):
+    '''Rated games and wins of a player on each day, for windowed leaderboards.
+
+    Rewritten by the rating engine for the days a run rated, days older than
+    `rating.activitydays` are deleted. A window is the sum of its days, so
+    games leave it as days pass, without a run. Clustered by the primary
+    key, a window of a partition is one range of the table.
+    '''
+
+    __tablename__ = 'rating_activity'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    version_code = Column(String(10), primary_key=True)
+    matchup = Column(String(20), primary_key=True)
+    day = Column(Date, primary_key=True)
+    name_hash = Column(String(32), primary_key=True)
+
+    games = Column(Integer)
+    wins = Column(Integer)
+
+    idx_rating_activity_day = Index('idx_rating_activity_day', day)
+
+
+class RatingDirty(Base):
+    '''Earliest game time changed by ingest or deletion since the last rating run.
+
+    A single row, `seq` is bumped by every change. It stays in the main
+    database, ingest can't write the rating database.
+    '''
+
+    __tablename__ = 'rating_dirty'
+
+    id = Column(Integer, primary_key=True)
+    updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    game_time = Column(DateTime)
+    seq = Column(Integer, default=0)
+
+
+class RatingLedger(Base):
+    '''Rows the rating engine may rate, kept by ingest and deletion.
+
+    One row per main operator of a multiplayer game without AI. The duration
+    threshold is a parameter of rating runs, so it is applied when reading.
+    `matchup` is the partition kind, `1v1` or `team`.
+
+    The indexes cover the scans of the engine in rating order, over all
+    games or over one partition.
+    '''
+
+    __tablename__ = 'rating_ledger'
+
+    player_id = Column(Integer, primary_key=True, autoincrement=False)
+
+    game_time = Column(DateTime)
+    game_guid = Column(String(64), index=True)
+    duration = Column(Integer)
+    version_code = Column(String(10))
+    matchup = Column(String(20))
+    name_hash = Column(String(32))
+    name = Column(String(255))
+    is_winner = Column(Boolean)
+
+    idx_rating_ledger_scan = Index('idx_rating_ledger_scan', game_time, game_guid, is_winner,
+                                   duration, version_code, matchup, name_hash, name)
+    idx_rating_ledger_partition = Index('idx_rating_ledger_partition', version_code, matchup, game_time,
+                                        game_guid, is_winner, duration, name_hash, name)
+
+
+class CoPlay(Base):
+    '''Co-play edges between players.
+
+    Every pair of players found in a same game is stored in both directions,
+    so partners of a player are an index range on `name_hash_a`. Edges of
+    deleted games are kept with zero games.
+    '''
+
+    __tablename__ = 'coplay'
+    __table_args__ = (UniqueConstraint('name_hash_a', 'name_hash_b', name='_unique_coplay_uc'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    name_hash_a = Column(String(32), nullable=False)
+    name_hash_b = Column(String(32), nullable=False)
+    name_b = Column(String(255))
+    games = Column(Integer, default=0)
+    wins_together = Column(Integer, default=0)
+    last_played = Column(DateTime)
+    # `coplay` generation of the last change, see `CoPlayGraph`
+    seq = Column(Integer)
+
+    idx_coplay_a_games = Index('idx_coplay_a_games', name_hash_a, games)
+    idx_coplay_seq = Index('idx_coplay_seq', seq)
+
+
+class Counter(Base):
+    '''Live counters of games and players.
+
+    Totals, monthly buckets and per-value counts of game options, kept up
+    to date by ingest and deletion.
+    '''
+
+    __tablename__ = 'counters'
+    __table_args__ = (UniqueConstraint('scope', 'key', name='_unique_counter_uc'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    scope = Column(String(20), nullable=False)
+    key = Column(String(255), nullable=False)
+    value = Column(Integer, default=0)
+
+
+class GameDocument(Base):
+    '''Pre-serialized game detail documents.
+
+    One JSON document per game and language, built on first request and
+    removed whenever the game is changed. Stored only if `games.revision`
+    didn't change while it was built.
+    '''
+
+    __tablename__ = 'game_documents'
+    __table_args__ = (UniqueConstraint('game_guid', 'lang', name='_unique_game_document_uc'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    updated = Column(DateTime, server_default=func.now())
+
+    game_guid = Column(String(64), nullable=False)
+    lang = Column(String(10), nullable=False)
+    body = Column(Text)
+
 
 class Cache(Base):
     '''Store cache'''
@@ -1,11 +1,11 @@
 '''Some models used in the API.'''
 
-import gettext
 from datetime import datetime
 
 from pydantic import BaseModel
 
 from mgxhub.model.orm import Chat, File, Game, Player
+from mgxhub.translator import Translator
 
 
 class RecordFile(BaseModel):
@@ -100,10 +100,7 @@ class GameDetail(BaseModel):
             GameDetail: Return the instance itself with data loaded.
         '''
 
-        # if translations/en/LC_MESSAGES/<lang>.mo exists, use it
-        # print(gettext.find(lang, 'translations', languages=["en"], all=True))
-        t = gettext.translation(lang, localedir='translations', languages=["en"], fallback=True)
-        _ = t.gettext
+        t = Translator()
 
         super().__init__(
             guid=g.game_guid,
@@ -114,11 +111,11 @@ class GameDetail(BaseModel):
             version_raw=g.version_raw,
             version_save=g.version_save,
             version_scenario=g.version_scenario,
-            victory_type=_(g.victory_type),
+            victory_type=t.translate(lang, 'victory_type', g.victory_type),
             instruction=g.instruction,
-            speed=_(g.speed),
-            map_name=_(g.map_name),
-            map_size=_(g.map_size),
+            speed=t.translate(lang, 'speed', g.speed),
+            map_name=t.translate(lang, 'map_name', g.map_name),
+            map_size=t.translate(lang, 'map_size', g.map_size),
             matchup=g.matchup,
             population=g.population,
             include_ai=g.include_ai,
@@ -137,7 +134,7 @@ class GameDetail(BaseModel):
                     index=player.index_player,
                     name=player.name,
                     name_hash=player.name_hash,
-                    type=_(player.type),
+                    type=t.translate(lang, 'type', player.type),
                     team=player.team,
                     color_index=player.color_index,
                     init_x=player.init_x,
@@ -146,7 +143,7 @@ class GameDetail(BaseModel):
                     is_winner=player.is_winner,
                     is_main_operator=player.is_main_operator,
                     civ_id=player.civ_id,
-                    civ_name=_(player.civ_name),
+                    civ_name=t.translate(lang, 'civ_name', player.civ_name),
                     feudal_time=player.feudal_time,
                     castle_time=player.castle_time,
                     imperial_time=player.imperial_time,
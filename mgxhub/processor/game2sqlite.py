@@ -8,7 +8,7 @@ from sqlalchemy.exc import IntegrityError
 from mgxhub import logger
 from mgxhub.db import db_raw
 from mgxhub.db.operation import add_game
-from mgxhub.rating import RatingLock
+from mgxhub.rating import RatingScheduler
 
 
 def save_game_sqlite(data: dict, retries: int = 3) -> tuple[str, str]:
@@ -32,7 +32,7 @@ def save_game_sqlite(data: dict, retries: int = 3) -> tuple[str, str]:
         logger.info(f'Game added: {result}')
         if result[0] in ['success', 'updated']:
             logger.debug(f"Triggering rating calculation for {result[1]}. Thread: {threading.get_ident()}")
-            RatingLock().start_calc(schedule=True)
+            RatingScheduler().trigger()
     except IntegrityError:
         if retries > 0:
             db.rollback()  # 回滚事务
@@ -1,4 +1,6 @@
 '''Elo rating calculator.'''
 
 from .calculator import EloCalculator
-from .lock import RatingLock
+from .index import RatingIndex
+from .scheduler import RatingScheduler
+from .sweep import RatingSweep, run_sweep
@@ -5,32 +5,197 @@ python -m mgxhub.rating
 ```
 '''
 
+import json
 import math
+import multiprocessing
+import os
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
 from numbers import Number
 from statistics import fmean
 
-from sqlalchemy import and_, text
-from sqlalchemy.exc import OperationalError
-from sqlalchemy.orm import Query, Session
+from sqlalchemy import (MetaData, Table, and_, create_engine, func, or_,
+                        select, text)
+from sqlalchemy.exc import DBAPIError, ResourceClosedError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
 
+from mgxhub.db.operation import rating_ledger_missing
 from mgxhub.logger import logger
-from mgxhub.model.orm import Game, Player, Rating
+from mgxhub.model.orm import (RATING_SCHEMA, Rating, RatingActivity,
+                              RatingDirty, RatingHistory, RatingLedger,
+                              RatingMeta, RatingSnapshot)
+
+from .state import STATE_KEYS, PartitionState, to_us
+
+# pylint: disable=not-callable
+
+# Write-back of rated rows. Rows are staged in a temporary table, which
+# doesn't lock any database, then written to the history in the rating
+# database with the ledger row of each. Rows already holding the same values
+# are not written.
+_WRITEBACK_TABLE = text('''
+    CREATE TEMP TABLE IF NOT EXISTS rating_writeback (
+        player_id INTEGER PRIMARY KEY, rating_change INTEGER, rating INTEGER
+    )
+''')
+_WRITEBACK_STAGE = 'INSERT INTO temp.rating_writeback (player_id, rating_change, rating) VALUES (?, ?, ?)'
+_WRITEBACK_HISTORY = text(f'''
+    INSERT OR REPLACE INTO {RATING_SCHEMA}.rating_history
+        (player_id, name_hash, version_code, matchup, game_time, rating, rating_change)
+    SELECT n.player_id, n.name_hash, n.version_code, n.matchup, n.game_time, n.rating, n.rating_change
+    FROM (
+        SELECT w.player_id, l.name_hash, l.version_code, l.matchup, l.game_time, w.rating, w.rating_change
+        FROM temp.rating_writeback AS w
+        CROSS JOIN main.rating_ledger AS l ON l.player_id = w.player_id
+    ) AS n
+    LEFT JOIN {RATING_SCHEMA}.rating_history AS h ON h.player_id = n.player_id
+    WHERE h.player_id IS NULL OR h.rating IS NOT n.rating OR h.rating_change IS NOT n.rating_change
+        OR h.game_time IS NOT n.game_time OR h.name_hash IS NOT n.name_hash
+        OR h.version_code IS NOT n.version_code OR h.matchup IS NOT n.matchup
+''')
+_WRITEBACK_CLEAR = text('DELETE FROM temp.rating_writeback')
+# Rows staged and committed at a time
+_WRITEBACK_CHUNK = 50000
+
+# Rank players of the partitions touched by an incremental run
+_RANK_UPDATE = text(f'''
+    UPDATE {RATING_SCHEMA}.ratings SET rank = ranked.n
+    FROM (
+        SELECT id, row_number() OVER (ORDER BY rating DESC, total DESC, name_hash) AS n
+        FROM {RATING_SCHEMA}.ratings WHERE version_code = :version_code AND matchup = :matchup
+    ) AS ranked
+    WHERE ratings.id = ranked.id AND ratings.rank IS NOT ranked.n
+''')
+
+
+# Daily activity of rated rows from `:since` on, rebuilt from the history.
+# Ledger rows are read by time from its index, history rows by their key.
+_ACTIVITY_REBUILD = text(f'''
+    INSERT INTO {RATING_SCHEMA}.rating_activity (version_code, matchup, day, name_hash, games, wins)
+    SELECT h.version_code, h.matchup, date(l.game_time), h.name_hash, count(*), sum(l.is_winner)
+    FROM main.rating_ledger AS l
+    CROSS JOIN {RATING_SCHEMA}.rating_history AS h ON h.player_id = l.player_id
+    WHERE l.game_time >= :since
+    GROUP BY h.version_code, h.matchup, date(l.game_time), h.name_hash
+''')
+
+
+def _matchup_kind(matchup: str | None) -> str:
+    return '1v1' if matchup == '1v1' else 'team'
+
+
+def _row_values(r: Rating) -> list:
+    values = [getattr(r, key) for key in STATE_KEYS]
+    return [v.isoformat() if isinstance(v, datetime) else v for v in values]
+
+
+def _rate_partitions(
+        db_url: str,
+        partitions: list[tuple[str, str]],
+        states: dict[tuple[str, str], PartitionState],
+        duration_threshold: int,
+        batch_size: int | None,
+        K: int,
+        start: tuple[datetime, str] | None,
+        boundaries: list[tuple[datetime, str]]
+) -> tuple:
+    '''Rate games of some partitions, run in a worker process.
+
+    Returns:
+        Final states, rating changes (player ids, deltas and ratings after
+        the games), number of games rated, last rated game and partition
+        states at each boundary.
+    '''
+
+    engine = create_engine(db_url, echo=False, connect_args={'timeout': 60})
+    session = Session(engine)
+    try:
+        elo = EloCalculator(session, K, snapshot_interval=0)
+        elo._collect_changes = True
+        elo._boundaries = boundaries
+        for partition in partitions:
+            elo._rating_cache[partition] = states.get(partition) or PartitionState()
+            elo._generate_rating_cache(duration_threshold, batch_size, start, partition)
+        states = {p: elo._rating_cache[p] for p in partitions}
+        return states, elo._changes, elo._processed, elo._last_key, elo._boundary_states
+    finally:
+        session.close()
+        engine.dispose()
 
 
 class EloCalculator:
-    '''Elo rating calculator.'''
+    '''Elo rating calculator.
+
+    Rows to rate are read from the ledger kept by ingest, see
+    `RatingLedger`, filled from the games table if it is empty.
+
+    Ratings are updated incrementally. Only games after the last rated game
+    (the high-water mark) are processed, starting from the player states in
+    the ratings table. If an earlier game was added, changed or deleted
+    since the last run, the state is restored from the last snapshot before
+    that game and rated again from there.
+
+    Ratings of each `(version_code, 1v1|team)` partition are independent.
+    When many games are rated from a snapshot or from scratch, partitions
+    are rated in parallel by `workers` processes, grouped into at most
+    `partitions` tasks (0 for one task per partition). Off with the default
+    of one worker: spawning the pool costs seconds, and only pays off with
+    several cores and partitions of similar sizes, see
+    `tools/bench_rating_parallel.py`.
+
+    Daily games and wins of the last `activity_days` days are kept for
+    windowed leaderboards, see `RatingActivity`.
+    '''
 
     _K = 32
-    _rating_cache = {}
-    _session = None
-    _current_game_guid: str | None = None
-    _winners_cache = []
-    _losers_cache = []
-    _change_buffer = []
-
-    def __init__(self, session: Session, K: int = 32):
+
+    # Fewer rows than this are rated in this process
+    PARALLEL_MIN_ROWS = 200000
+
+    def __init__(
+            self,
+            session: Session,
+            K: int = 32,
+            snapshot_interval: int = 50000,
+            snapshot_keep: int = 20,
+            workers: int = 1,
+            partitions: int = 0,
+            activity_days: int = 90
+    ):
         self._K = K
         self._session = session
+        self._snapshot_interval = snapshot_interval
+        self._snapshot_keep = snapshot_keep
+        self._workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._max_tasks = partitions
+        self._activity_days = activity_days
+
+        self._rating_cache: dict[tuple[str, str], PartitionState] = {}
+        self._current_game_guid: str | None = None
+        self._current_game_time: datetime | None = None
+        self._current_state: PartitionState | None = None
+        self._last_key: tuple[datetime, str] | None = None
+        # Player ids in `_current_state`
+        self._winners_cache: list[int] = []
+        self._losers_cache: list[int] = []
+        # Rated rows not written back yet: player ids, deltas and ratings after the games
+        self._changes = (array('q'), array('q'), array('q'))
+        self._sizes: dict[tuple[str, str], int] = {}
+
+        # True if `_rating_cache` holds all players, False if it only holds
+        # players loaded from the ratings table for an incremental run
+        self._complete = True
+        self._since_snapshot = 0
+        self._processed = 0
+
+        # Used by worker processes
+        self._collect_changes = False
+        self._boundaries: list[tuple[datetime, str]] = []
+        self._boundary_pos = 0
+        self._boundary_states: list[dict] = []
 
     def _calc_rating_delta(self, rating_winner: Number, rating_loser: Number):
         '''Calculate the new Elo rating delta for the winner and loser.
@@ -45,199 +210,620 @@ class EloCalculator:
 
         return round(self._K * (1 - prob_loser)), round(self._K * (0 - prob_winner))
 
-    def _calc_probability(self, rating_winner: Number, rating_loser: Number):
+    @staticmethod
+    def _calc_probability(rating_winner: Number, rating_loser: Number):
         '''Calculate the Probability of Winning.'''
 
         return 1.0 * 1.0 / (1 + 1.0 * math.pow(10, 1.0 * (rating_winner - rating_loser) / 400))
 
-    def _fetch_in_batches(self, query: Query, batch_size: int | None = None):
-        '''Fetch the query results in batches.'''
+    @staticmethod
+    def win_probability(rating: Number, rating_opponent: Number) -> float:
+        '''Probability that a side rated `rating` beats one rated `rating_opponent`.'''
 
-        if batch_size is None:
-            # If batch_size is None, fetch all results at once
-            yield from query.all()
-        else:
-            # Otherwise, fetch results in batches
-            offset = 0
-            while True:
-                batch = query.limit(batch_size).offset(offset).all()
-                if not batch:
-                    break
-                for row in batch:
-                    yield row
-                offset += batch_size
-
-    def _update_game_ratings(self, col: dict):
+        return EloCalculator._calc_probability(rating_opponent, rating)
+
+    def _rating_query(
+            self,
+            duration_threshold: int,
+            start: tuple[datetime, str] | None,
+            partition: tuple[str, str] | None
+    ) -> Select:
+        '''Rows to rate after `start`, in rating order.
+
+        Read from the ledger, in the order of its index, nothing is sorted.
+        '''
+
+        query = select(
+            RatingLedger.game_guid,
+            RatingLedger.version_code,
+            RatingLedger.matchup,
+            RatingLedger.name_hash,
+            RatingLedger.name,
+            RatingLedger.is_winner,
+            RatingLedger.game_time,
+            RatingLedger.player_id
+        ).where(
+            *self._eligible(duration_threshold, start)
+        )
+        if partition:
+            query = query.where(RatingLedger.version_code == partition[0], RatingLedger.matchup == partition[1])
+        return query.order_by(
+            RatingLedger.game_time, RatingLedger.game_guid, RatingLedger.is_winner
+        )
+
+    def _stream_games(
+            self,
+            duration_threshold: int,
+            batch_size: int | None,
+            start: tuple[datetime, str] | None,
+            partition: tuple[str, str] | None
+    ):
+        '''Stream games to rate with one forward cursor.
+
+        Yields lists of complete games, each game a list of plain row tuples,
+        about `batch_size` rows per list. If the cursor is interrupted, the
+        scan is resumed after the last game yielded.
+        '''
+
+        batch_size = batch_size or 10000
+        resume = start
+        failures = 0
+        while True:
+            try:
+                result = self._session.execute(
+                    self._rating_query(duration_threshold, resume, partition),
+                    execution_options={'yield_per': batch_size}
+                )
+                games, game, key, rows = [], [], None, 0
+                for row in result:
+                    if (row[6], row[0]) != key:
+                        if game:
+                            games.append(game)
+                        if rows >= batch_size:
+                            yield games
+                            resume = (games[-1][0][6], games[-1][0][0])
+                            failures = 0
+                            games, rows = [], 0
+                        game, key = [], (row[6], row[0])
+                    game.append(row)
+                    rows += 1
+                if game:
+                    games.append(game)
+                if games:
+                    yield games
+                return
+            except (DBAPIError, ResourceClosedError) as e:
+                failures += 1
+                if failures > 3:
+                    raise
+                logger.warning(f"Rating scan interrupted, resuming after {resume}: {e}")
+
+    def _meta(self, key: str) -> RatingMeta | None:
+        return self._session.get(RatingMeta, key)
+
+    def _set_meta(self, key: str, **values) -> None:
+        self._session.merge(RatingMeta(key=key, **values))
+
+    def _partition(self, version_code: str, matchup: str) -> PartitionState:
+        key = (version_code, _matchup_kind(matchup))
+        if key not in self._rating_cache:
+            self._rating_cache[key] = PartitionState()
+        return self._rating_cache[key]
+
+    def _eligible(self, duration_threshold: int, start: tuple[datetime, str] | None) -> list:
+        conditions = [RatingLedger.duration > duration_threshold]
+        if start:
+            conditions.append(or_(
+                RatingLedger.game_time > start[0],
+                and_(RatingLedger.game_time == start[0], RatingLedger.game_guid > start[1])
+            ))
+        return conditions
+
+    def _load_players(self, rows: list) -> None:
+        '''Load states of players in `rows` from the ratings table.
+
+        Used by incremental runs, players not found start from scratch.
+        '''
+
+        wanted = {}
+        for _, version_code, matchup, name_hash, *_ in rows:
+            if name_hash not in self._partition(version_code, matchup).index:
+                wanted.setdefault((version_code, _matchup_kind(matchup)), set()).add(name_hash)
+
+        for (version_code, matchup), name_hashes in wanted.items():
+            state = self._partition(version_code, matchup)
+            name_hashes = list(name_hashes)
+            for i in range(0, len(name_hashes), 500):
+                for r in self._session.query(Rating).filter(
+                    Rating.version_code == version_code,
+                    Rating.matchup == matchup,
+                    Rating.name_hash.in_(name_hashes[i:i + 500])
+                ):
+                    state.add_values(r.name_hash, [getattr(r, key) for key in STATE_KEYS], row_id=r.id)
+
+    def _state_partitions(self) -> dict:
+        '''States of all players, `(version_code, matchup)` -> {name_hash: values}.'''
+
+        state = {}
+        if not self._complete:
+            # Players not touched by this run are still in the ratings table
+            for r in self._session.query(Rating):
+                state.setdefault((r.version_code, r.matchup), {})[r.name_hash] = _row_values(r)
+        for partition, players in self._rating_cache.items():
+            state.setdefault(partition, {}).update(players.snapshot())
+        return state
+
+    @staticmethod
+    def _compress_state(state: dict) -> bytes:
+        data = [[version_code, matchup, players] for (version_code, matchup), players in state.items()]
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+    def _load_state(self, data: bytes) -> None:
+        '''Restore states of all players from a snapshot.'''
+
+        self._rating_cache = {
+            (version_code, matchup): PartitionState.from_snapshot(players)
+            for version_code, matchup, players in json.loads(zlib.decompress(data))
+        }
+        self._complete = True
+
+    def _save_snapshot(self) -> None:
+        '''Snapshot the state right after the current game.'''
+
+        self._session.add(RatingSnapshot(
+            game_time=self._current_game_time,
+            game_guid=self._current_game_guid,
+            state=self._compress_state(self._state_partitions())
+        ))
+        self._since_snapshot = 0
+        logger.debug(f"Rating snapshot saved at {self._current_game_time} {self._current_game_guid}")
+
+    def _pass_boundaries(self, key: tuple[datetime, str] | None, partition: tuple[str, str]) -> None:
+        '''Record the partition state at boundaries before `key`, or all left if None.'''
+
+        while self._boundary_pos < len(self._boundaries) \
+                and (key is None or key > self._boundaries[self._boundary_pos]):
+            if len(self._boundary_states) <= self._boundary_pos:
+                self._boundary_states.append({})
+            self._boundary_states[self._boundary_pos][partition] = self._partition(*partition).snapshot()
+            self._boundary_pos += 1
+
+    def _update_game_ratings(self):
         # Start calculating the ratings for the previous game
         # First check if there are duplicate names in the winners or losers, skip them
-        # nh is short for name_hash
-        winner_hash_list = [nh for nh, _ in self._winners_cache]
-        loser_hash_list = [nh for nh, _ in self._losers_cache]
-        if len(winner_hash_list) != len(set(winner_hash_list)) or len(loser_hash_list) != len(set(loser_hash_list)):
+        # Players are ids in the state of the game's partition, one per name_hash
+        state = self._current_state
+        winners, losers = self._winners_cache, self._losers_cache
+        if len(winners) != len(set(winners)) or len(losers) != len(set(losers)):
             logger.debug(f"Duplicate name_hash detected in {self._current_game_guid}")
-        elif len(self._winners_cache) == 0 or len(self._losers_cache) == 0:
+        elif len(winners) == 0 or len(losers) == 0:
             logger.debug(f"Empty winners or losers in {self._current_game_guid}")
         else:
+            rating = state.rating
+
             # Calculate average rating of previous game's winners and losers
-            rating_winner = fmean([col[nh]["rating"] for nh, _ in self._winners_cache])
-            rating_loser = fmean([col[nh]["rating"] for nh, _ in self._losers_cache])
+            rating_winner = fmean([rating[i] for i in winners])
+            rating_loser = fmean([rating[i] for i in losers])
 
             # Calculate the new Elo rating delta for the winner and loser
             delta_winner, delta_loser = self._calc_rating_delta(rating_winner, rating_loser)
 
-            # Update the ratings cache
-            for _, p in self._winners_cache:
-                p["rating"] += delta_winner
-                p["total"] += 1
-                p["wins"] += 1
-                p["highest"] = max(p["rating"], p["highest"])
-                p["streak"] += 1
-                p["streak_max"] = max(p["streak"], p["streak_max"])
-                self._change_buffer.append({"id": p["player_id"], "rating_change": delta_winner})
-
-            for _, p in self._losers_cache:
-                p["rating"] += delta_loser
-                p["total"] += 1
-                p["lowest"] = min(p["rating"], p["lowest"])
-                p["streak"] = 0
-                self._change_buffer.append({"id": p["player_id"], "rating_change": delta_loser})
+            # Update the player states
+            ids, deltas, ratings = self._changes
+            for i in winners:
+                rating[i] += delta_winner
+                state.total[i] += 1
+                state.wins[i] += 1
+                state.highest[i] = max(rating[i], state.highest[i])
+                state.streak[i] += 1
+                state.streak_max[i] = max(state.streak[i], state.streak_max[i])
+                ids.append(state.player_id[i])
+                deltas.append(delta_winner)
+                ratings.append(rating[i])
+
+            for i in losers:
+                rating[i] += delta_loser
+                state.total[i] += 1
+                state.lowest[i] = min(rating[i], state.lowest[i])
+                state.streak[i] = 0
+                ids.append(state.player_id[i])
+                deltas.append(delta_loser)
+                ratings.append(rating[i])
+
+    def _finish_game(self) -> None:
+        '''Rate the current game and reset the caches for the next one.'''
+
+        self._update_game_ratings()
+        self._processed += 1
+        self._since_snapshot += 1
+        key = (self._current_game_time, self._current_game_guid)
+        self._last_key = key if self._last_key is None else max(self._last_key, key)
+        if self._processed % 10000 == 0:
+            self._update_rating_change()
+        if self._complete and self._snapshot_interval and self._since_snapshot >= self._snapshot_interval:
+            self._save_snapshot()
+        self._winners_cache.clear()
+        self._losers_cache.clear()
 
     def _update_rating_change(self) -> None:
-        '''Update the rating change in the Player table.'''
+        '''Write the rating changes of rated rows to the rating history.'''
+
+        if self._collect_changes:
+            return  # Written by the main process
+
+        ids, deltas, ratings = self._changes
+        for i in range(0, len(ids), _WRITEBACK_CHUNK):
+            j = i + _WRITEBACK_CHUNK
+            self._session.execute(_WRITEBACK_TABLE)
+            self._session.connection().exec_driver_sql(
+                _WRITEBACK_STAGE, list(zip(ids[i:j], deltas[i:j], ratings[i:j])))
+            self._session.execute(_WRITEBACK_HISTORY)
+            self._session.execute(_WRITEBACK_CLEAR)
+            self._session.commit()
+        for column in self._changes:
+            del column[:]
+
+    def _generate_rating_cache(
+            self,
+            duration_threshold: int = 15 * 60 * 1000,
+            batch_size: int | None = None,
+            start: tuple[datetime, str] | None = None,
+            partition: tuple[str, str] | None = None
+    ) -> None:
+        '''Rate games after `start`, or all games if it's None.
+
+        Only games of `partition`, `(version_code, 1v1|team)`, if given.
+        '''
 
-        self._session.bulk_update_mappings(Player, self._change_buffer)
-        self._session.commit()
-        self._change_buffer.clear()
-
-    def _generate_rating_cache(self, duration_threshold: int = 15 * 60 * 1000, batch_size: int | None = None) -> None:
-        '''Generate the ratings cache.'''
-
-        query = self._session.query(
-            Player.game_guid,
-            Game.version_code,
-            Game.matchup,
-            Player.name_hash,
-            Player.name,
-            Player.is_winner,
-            Game.game_time,
-            Player.id
-        ).join(
-            Game, Player.game_guid == Game.game_guid
-        ).filter(
-            and_(Game.duration > duration_threshold,
-                 Game.is_multiplayer == 1, Game.include_ai == 0, Player.is_main_operator == 1)
-        ).order_by(
-            Game.game_time, Player.game_guid, Player.is_winner
-        )
+        self._boundary_pos = 0
+        for games in self._stream_games(duration_threshold, batch_size, start, partition):
+            if not self._complete:
+                self._load_players([row for game in games for row in game])
+
+            for game in games:
+                game_guid, version_code, matchup, *_, game_time, _ = game[0]
+                self._current_game_guid, self._current_game_time = game_guid, game_time
+                if partition:
+                    self._pass_boundaries((game_time, game_guid), partition)
+
+                # All players of a game are in the same partition
+                state = self._current_state = self._partition(version_code, matchup)
+                played = to_us(game_time)
+                for *_, name_hash, player_name, is_winner, _, player_id in game:
+                    i = state.index.get(name_hash)
+                    if i is None:
+                        i = state.add(name_hash, player_name, played, player_id)
+                    else:
+                        state.last_played[i] = played
+                        # Same player names of different games have different ids in
+                        # players table, so player_id needs to be updated. It will be
+                        # used in _update_game_ratings() to write back the changes
+                        state.player_id[i] = player_id
+
+                    if is_winner:
+                        self._winners_cache.append(i)
+                    else:
+                        self._losers_cache.append(i)
+
+                self._finish_game()
 
-        processed_count = 0
-        col = {}
-        # Execute the query in batches
-        for row in self._fetch_in_batches(query, batch_size):
-            game_guid, version_code, matchup, name_hash, player_name, is_winner, game_time, player_id = row
-
-            if self._current_game_guid is None:
-                self._current_game_guid = game_guid
-
-            if game_guid != self._current_game_guid:
-                # Update the ratings for the previous game
-                self._update_game_ratings(col)
-                # print(f"[{processed_count}] {self._current_game_guid}")
-                processed_count += 1
-                if processed_count % 10000 == 0:
-                    self._update_rating_change()
-
-                # Reset the winners and losers for the next game
-                self._current_game_guid = game_guid
-                self._winners_cache.clear()
-                self._losers_cache.clear()
-
-            if version_code not in self._rating_cache:
-                self._rating_cache[version_code] = {'1v1': {}, 'team': {}}
-            if matchup == '1v1':
-                col = self._rating_cache[version_code]['1v1']
-            else:
-                col = self._rating_cache[version_code]['team']
-
-            if name_hash not in col:
-                col[name_hash] = {
-                    "name": player_name,
-                    "rating": 1600,
-                    "total": 0,
-                    "wins": 0,
-                    "lowest": 1600,
-                    "highest": 1600,
-                    "streak": 0,
-                    "streak_max": 0,
-                    "first_played": game_time,
-                    "last_played": game_time,
-                    "player_id": player_id
-                }
-            else:
-                col[name_hash]["last_played"] = game_time
-                # Same player names of different games have different ids in
-                # players table, so player_id needs to be updated. It will be
-                # used in _update_game_ratings() by querying _winner_cache and
-                # _loser_cache
-                col[name_hash]["player_id"] = player_id
-
-            if is_winner:
-                self._winners_cache.append((name_hash, col[name_hash]))
-            else:
-                self._losers_cache.append((name_hash, col[name_hash]))
-
-        self._update_game_ratings(col)
-        self._update_rating_change()
         self._current_game_guid = None
-        self._winners_cache.clear()
-        self._losers_cache.clear()
+        if partition:
+            self._pass_boundaries(None, partition)
+        self._update_rating_change()
+
+    def _partition_sizes(self, duration_threshold: int, start: tuple[datetime, str] | None) -> dict:
+        '''Number of rows to rate in each partition.'''
+
+        return {
+            (version_code, matchup): count for version_code, matchup, count in self._session.query(
+                RatingLedger.version_code, RatingLedger.matchup, func.count(RatingLedger.player_id)
+            ).filter(
+                *self._eligible(duration_threshold, start)
+            ).group_by(RatingLedger.version_code, RatingLedger.matchup)
+        }
+
+    def _snapshot_points(self, duration_threshold: int, start: tuple[datetime, str] | None) -> tuple[list, int]:
+        '''Games after which to snapshot, and the number of games after the last one.'''
+
+        if not self._snapshot_interval:
+            return [], 0
+        games = select(RatingLedger.game_time, RatingLedger.game_guid).where(
+            *self._eligible(duration_threshold, start)).distinct().subquery()
+        n = func.row_number().over(order_by=(games.c.game_time, games.c.game_guid)).label('n')
+        eligible = select(games.c.game_time, games.c.game_guid, n).subquery()
+        total = self._session.query(func.count()).select_from(eligible).scalar()
+        points = self._session.query(eligible.c.game_time, eligible.c.game_guid, eligible.c.n).filter(
+            eligible.c.n % self._snapshot_interval == 0
+        ).order_by(eligible.c.n.desc()).limit(self._snapshot_keep).all()[::-1]
+        since = total - points[-1][2] if points else self._since_snapshot + total
+        return [(t, g) for t, g, _ in points], since
+
+    def _generate_in_pool(
+            self,
+            duration_threshold: int,
+            batch_size: int | None,
+            start: tuple[datetime, str] | None
+    ) -> bool:
+        '''Rate partitions in parallel.
+
+        Returns:
+            False if there is too little to gain, nothing is done then.
+        '''
+
+        sizes = self._partition_sizes(duration_threshold, start)
+        if len(sizes) < 2 or self._workers < 2 or sum(sizes.values()) < self.PARALLEL_MIN_ROWS:
+            return False
+
+        # Biggest partitions first, each to the least loaded task
+        tasks = [[0, []] for _ in range(min(self._max_tasks or len(sizes), len(sizes)))]
+        for partition, size in sorted(sizes.items(), key=lambda x: -x[1]):
+            task = min(tasks, key=lambda t: t[0])
+            task[0] += size
+            task[1].append(partition)
+
+        boundaries, since = self._snapshot_points(duration_threshold, start)
+        initial = self._state_partitions()
+        snapshots = [dict(initial) for _ in boundaries]
+        db_url = self._session.get_bind().url.render_as_string(hide_password=False)
+        logger.debug(f"Rating {len(sizes)} partitions in {len(tasks)} tasks, {self._workers} workers")
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(self._workers, len(tasks)), mp_context=context) as pool:
+            futures = [pool.submit(
+                _rate_partitions, db_url, partitions,
+                {p: self._partition(*p) for p in partitions},
+                duration_threshold, batch_size, self._K, start, boundaries
+            ) for _, partitions in tasks]
+
+            for future in as_completed(futures):
+                states, changes, processed, last_key, boundary_states = future.result()
+                self._rating_cache.update(states)
+                self._changes = changes
+                self._update_rating_change()
+                self._processed += processed
+                if last_key:
+                    self._last_key = last_key if self._last_key is None else max(self._last_key, last_key)
+                for snapshot, partition_states in zip(snapshots, boundary_states):
+                    snapshot.update(partition_states)
+
+        for (game_time, game_guid), state in zip(boundaries, snapshots):
+            self._session.add(RatingSnapshot(game_time=game_time, game_guid=game_guid,
+                                             state=self._compress_state(state)))
+        self._since_snapshot = since
+        return True
+
+    def _plan(self, duration_threshold: int, full: bool) -> tuple[datetime, str] | None:
+        '''Decide where to start rating and prepare the state.
+
+        Returns:
+            The game after which to start, or None to rate all games.
+        '''
 
-    def update_ratings(self, duration_threshold: int = 15 * 60 * 1000, batch_size: int | None = None):
-        '''Update the ratings table.'''
-
-        self._generate_rating_cache(duration_threshold, batch_size)
-
-        # Clear the existing Ratings table
-        self._session.query(Rating).delete()
-
-        # Reset auto increment value (example for MySQL)
-        # self._session.execute(text("ALTER TABLE ratings AUTO_INCREMENT = 1"))
-
-        # For SQLite, you can use:
-        try:
-            self._session.execute(text("UPDATE sqlite_sequence SET seq = 0 WHERE name='ratings'"))
-        except OperationalError:
-            pass  # Ignore the error if sqlite_sequence table does not exist
-
-        # For PostgreSQL, you can use:
-        # self._session.execute(text("ALTER SEQUENCE ratings_id_seq RESTART WITH 1"))
-
-        mappings = []
-        for version_code, col in self._rating_cache.items():
-            for matchup, players in col.items():
-                for name_hash, player in players.items():
-                    mappings.append({
-                        'name': player["name"],
-                        'name_hash': name_hash,
-                        'version_code': version_code,
-                        'matchup': matchup,
-                        'rating': player["rating"],
-                        'wins': player["wins"],
-                        'total': player["total"],
-                        'streak': player["streak"],
-                        'streak_max': player["streak_max"],
-                        'highest': player["highest"],
-                        'lowest': player["lowest"],
-                        'first_played': player["first_played"],
-                        'last_played': player["last_played"]
-                    })
-
-        self._session.bulk_insert_mappings(Rating, mappings)
-
-        # Commit the changes
+        mark = self._meta('mark')
+        dirty = self._session.get(RatingDirty, 1)
+        threshold = self._meta('threshold')
+        since_snapshot = self._meta('since_snapshot')
+
+        if dirty and dirty.game_time:
+            # Snapshots after a changed game are no longer valid
+            self._session.query(RatingSnapshot).filter(
+                RatingSnapshot.game_time >= dirty.game_time).delete(synchronize_session=False)
+
+        if full or mark is None or mark.game_time is None \
+                or threshold is None or threshold.value != str(duration_threshold) \
+                or not self._ranked():
+            self._session.query(RatingSnapshot).delete(synchronize_session=False)
+            logger.debug("Rating all games")
+            return None
+
+        if dirty and dirty.game_time and dirty.game_time <= mark.game_time:
+            snapshot = self._session.query(RatingSnapshot).filter(
+                RatingSnapshot.game_time < dirty.game_time
+            ).order_by(RatingSnapshot.game_time.desc(), RatingSnapshot.id.desc()).first()
+            if snapshot is None:
+                logger.debug(f"No snapshot before {dirty.game_time}, rating all games")
+                return None
+            self._load_state(snapshot.state)
+            logger.debug(f"Rating from snapshot {snapshot.game_time} {snapshot.game_guid}")
+            return snapshot.game_time, snapshot.game_guid
+
+        self._complete = False
+        self._since_snapshot = int(since_snapshot.value) if since_snapshot and since_snapshot.value else 0
+        return mark.game_time, mark.value
+
+    def _ranked(self) -> bool:
+        '''False if the ratings table is from a version without ranks.'''
+
+        return self._session.execute(text(
+            f"SELECT 1 FROM {RATING_SCHEMA}.sqlite_master WHERE type = 'index' AND tbl_name = 'ratings' "
+            "AND name LIKE 'idx\\_ratings\\_rank%' ESCAPE '\\'")).first() is not None
+
+    def _write_ratings(self) -> Table | None:
+        '''Write player states and ranks to the ratings table.
+
+        An incremental run updates the changed rows in place and ranks the
+        partitions it touched again. Otherwise all rows are written into a
+        new shadow table, which is committed but not visible until
+        `_publish_shadow()`. Sizes of the written partitions are kept in
+        `_sizes`.
+
+        Returns:
+            The shadow table, if any.
+        '''
+
+        if not self._complete:
+            mappings = []
+            updates = []
+            for (version_code, matchup), state in self._rating_cache.items():
+                for i in range(len(state)):
+                    if not state.player_id[i]:
+                        continue  # Loaded but not changed by this run
+                    mapping = state.mapping(i)
+                    mapping['version_code'] = version_code
+                    mapping['matchup'] = matchup
+                    if state.row_id[i]:
+                        mapping['id'] = state.row_id[i]
+                        updates.append(mapping)
+                    else:
+                        mappings.append(mapping)
+
+            self._session.bulk_update_mappings(Rating, updates)
+            self._session.bulk_insert_mappings(Rating, mappings)
+            for version_code, matchup in {(m['version_code'], m['matchup']) for m in updates + mappings}:
+                self._session.execute(_RANK_UPDATE, {'version_code': version_code, 'matchup': matchup})
+                self._sizes[(version_code, matchup)] = self._session.query(func.count(Rating.id)).filter(
+                    Rating.version_code == version_code, Rating.matchup == matchup).scalar()
+            return None
+
+        # Leftovers of an interrupted run
+        for (name,) in self._session.execute(text(
+                f"SELECT name FROM {RATING_SCHEMA}.sqlite_master "
+                "WHERE type = 'table' AND name LIKE 'ratings\\_g%' ESCAPE '\\'")).all():
+            self._session.execute(text(f'DROP TABLE {RATING_SCHEMA}."{name}"'))
+
+        # Index names are global in SQLite, tables and their indexes are named
+        # by generation so the shadow can coexist with the live table
+        generation = self._generation() + 1
+        shadow = Rating.__table__.to_metadata(MetaData(), name=f'ratings_g{generation}')
+        for index in shadow.indexes:
+            if shadow.name not in index.name:
+                index.name = f'{index.name}_g{generation}'
+        shadow.create(self._session.connection())
+        for (version_code, matchup), state in self._rating_cache.items():
+            if not len(state):
+                continue
+            order = state.rank_order()
+            for n in range(0, len(order), 10000):
+                self._session.execute(shadow.insert(), [
+                    dict(state.mapping(i), version_code=version_code, matchup=matchup, rank=rank)
+                    for rank, i in enumerate(order[n:n + 10000], n + 1)
+                ])
+            self._sizes[(version_code, matchup)] = len(state)
         self._session.commit()
+        return shadow
+
+    def _prune_history(self, duration_threshold: int, start: tuple[datetime, str] | None) -> None:
+        '''Delete history rows after `start` not rewritten by this run. Doesn't commit.
+
+        Rewritten rows are replaced in place, what's left belongs to deleted
+        or no longer eligible games.
+        '''
+
+        rated = select(RatingLedger.player_id).where(*self._eligible(duration_threshold, None))
+        stale = self._session.query(RatingHistory)
+        if start:
+            # Also games at the same time as `start`, they are kept if rated
+            rated = rated.where(RatingLedger.game_time >= start[0])
+            stale = stale.filter(RatingHistory.game_time >= start[0])
+        stale.filter(RatingHistory.player_id.not_in(rated)).delete(synchronize_session=False)
+
+    def _update_activity(self, start: tuple[datetime, str] | None) -> None:
+        '''Rebuild daily activity from the first day rated by this run. Doesn't commit.
+
+        Days before `activity_days` are deleted. All kept days are rebuilt
+        after a full run or if the table is empty.
+        '''
 
-        logger.debug("Ratings table updated")
+        if not self._activity_days:
+            return
+
+        first_day = date.today() - timedelta(days=self._activity_days - 1)
+        self._session.query(RatingActivity).filter(RatingActivity.day < first_day).delete(synchronize_session=False)
+        if not self._complete and not self._processed:
+            return
+
+        since = first_day
+        if start and self._session.query(RatingActivity.day).first() is not None:
+            since = max(first_day, start[0].date())
+        self._session.query(RatingActivity).filter(RatingActivity.day >= since).delete(synchronize_session=False)
+        self._session.execute(_ACTIVITY_REBUILD, {'since': since.isoformat()})
+
+    def _generation(self) -> int:
+        generation = self._meta('generation')
+        return int(generation.value) if generation and generation.value else 0
+
+    def _publish_shadow(self, shadow: Table) -> None:
+        '''Replace the ratings table by the shadow table. Doesn't commit.'''
+
+        self._session.execute(text(f'DROP TABLE IF EXISTS {RATING_SCHEMA}.ratings'))
+        self._session.execute(text(f'ALTER TABLE {RATING_SCHEMA}."{shadow.name}" RENAME TO ratings'))
+
+    def update_ratings(
+            self,
+            duration_threshold: int = 15 * 60 * 1000,
+            batch_size: int | None = None,
+            full: bool = False
+    ) -> int:
+        '''Update the ratings table.
+
+        Writes the rating database only, but for clearing the dirty marker
+        of the main database afterwards. The rating ledger must be filled,
+        see `backfill_tables()`.
+
+        Args:
+            duration_threshold: games not longer than this (ms) are not rated.
+            batch_size: rows fetched per query.
+            full: rate all games from scratch.
+
+        Returns:
+            Number of games rated.
+        '''
+
+        if rating_ledger_missing(self._session):
+            # Filling it is a full scan of the main database, done at startup
+            raise RuntimeError("Rating ledger is empty, fill it with backfill_tables() first")
+
+        # Read before the games, later changes keep the dirty mark for the next run
+        dirty = self._session.get(RatingDirty, 1)
+        dirty_seq = dirty.seq if dirty else None
+
+        start = self._plan(duration_threshold, full)
+        self._session.commit()
+        if not self._complete or not self._generate_in_pool(duration_threshold, batch_size, start):
+            self._generate_rating_cache(duration_threshold, batch_size, start)
+
+        shadow = None
+        if self._complete or self._processed:
+            shadow = self._write_ratings()
+
+        mark = self._last_key or start
+        if mark:
+            self._set_meta('mark', game_time=mark[0], value=mark[1])
+        else:
+            self._session.query(RatingMeta).filter(RatingMeta.key == 'mark').delete()
+
+        if not self._complete and self._snapshot_interval and self._since_snapshot >= self._snapshot_interval:
+            self._current_game_time, self._current_game_guid = mark
+            self._save_snapshot()
+        keep = self._session.query(RatingSnapshot.id).order_by(
+            RatingSnapshot.game_time.desc(), RatingSnapshot.id.desc()).limit(self._snapshot_keep)
+        self._session.query(RatingSnapshot).filter(
+            RatingSnapshot.id.not_in(keep.scalar_subquery())).delete(synchronize_session=False)
+
+        self._prune_history(duration_threshold, start)
+        self._update_activity(start)
+        self._set_meta('threshold', value=str(duration_threshold))
+        self._set_meta('since_snapshot', value=str(self._since_snapshot))
+
+        # Publish the new ratings and their generation in one short transaction
+        if shadow is not None:
+            self._publish_shadow(shadow)
+            self._session.query(RatingMeta).filter(RatingMeta.key.like('size:%')).delete(synchronize_session=False)
+        for (version_code, matchup), size in self._sizes.items():
+            self._set_meta(f'size:{version_code}:{matchup}', value=str(size))
+        if shadow is not None or self._processed:
+            self._set_meta('generation', value=str(self._generation() + 1))
+        self._session.commit()
+
+        # The only write of a run to the main database, a one-row delete
+        # after the ratings are committed
+        if dirty_seq is not None:
+            self._session.query(RatingDirty).filter(RatingDirty.id == 1, RatingDirty.seq == dirty_seq).delete()
+            self._session.commit()
+
+        logger.debug(f"Ratings table updated, {self._processed} games rated")
+        return self._processed
 
     def set_K(self, K: int):
         '''Set the maximum possible adjustment.'''
@@ -246,6 +832,9 @@ class EloCalculator:
 
     @property
     def ratings(self):
-        '''Return the ratings cache.'''
+        '''Return the player states, `(version_code, 1v1|team)` -> `PartitionState`.
+
+        After an incremental run it only holds players of the rated games.
+        '''
 
         return self._rating_cache
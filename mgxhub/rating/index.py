@@ -0,0 +1,121 @@
+'''In-memory ratings of the published generation, for predictions'''
+
+import threading
+import time
+from statistics import fmean
+
+from sqlalchemy.orm import Session
+
+from mgxhub.config import cfg
+from mgxhub.db.operation import get_rating_generation
+from mgxhub.model.orm import Rating
+from mgxhub.singleton import Singleton
+
+from .calculator import EloCalculator
+
+# Rating of players not in the ratings table, as for new players in a run
+INITIAL_RATING = 1600
+
+
+class RatingIndex(metaclass=Singleton):
+    '''`name_hash -> rating` of each `(version_code, 1v1|team)` partition.
+
+    Loaded from the ratings table and kept until another generation is
+    published. The scheduler invalidates the index after its runs. Runs of
+    other processes are noticed by checking the generation at most every
+    `rating.indexcheck` seconds. Lookups don't touch the database.
+
+    Example:
+    ```python
+    index = RatingIndex()
+    if index.stale():
+        index.refresh(session)
+    index.predict('AOC10', 'team', [['hash1', 'hash2'], ['hash3', 'hash4']])
+    ```
+    '''
+
+    def __init__(self, check_interval: float | None = None):
+        self._check_interval = cfg.getfloat('rating', 'indexcheck') if check_interval is None else check_interval
+        self._lock = threading.Lock()
+        self._partitions: dict[tuple[str, str], dict[str, int]] = {}
+        self._generation: int | None = None
+        self._checked = 0.0
+
+    @property
+    def generation(self) -> int | None:
+        '''Generation loaded, None if never loaded.'''
+
+        return self._generation
+
+    def stale(self) -> bool:
+        '''True if the published generation needs to be checked.'''
+
+        return self._generation is None or time.monotonic() - self._checked >= self._check_interval
+
+    def invalidate(self) -> None:
+        '''Check the published generation on the next `refresh()`.'''
+
+        self._checked = 0.0
+
+    def refresh(self, session: Session) -> None:
+        '''Load the ratings table if another generation was published.'''
+
+        with self._lock:
+            if not self.stale():
+                return  # Refreshed by another thread meanwhile
+            generation = get_rating_generation(session)
+            if generation != self._generation:
+                partitions: dict[tuple[str, str], dict[str, int]] = {}
+                rows = session.query(Rating.version_code, Rating.matchup, Rating.name_hash, Rating.rating)
+                for version_code, matchup, name_hash, rating in rows.yield_per(10000):
+                    partition = partitions.get((version_code, matchup))
+                    if partition is None:
+                        partition = partitions[(version_code, matchup)] = {}
+                    partition[name_hash] = rating
+                # Swapped in one assignment, lookups see either generation
+                self._partitions, self._generation = partitions, generation
+            self._checked = time.monotonic()
+
+    def ratings(self, version_code: str, matchup: str, name_hashes: list[str]) -> list[int | None]:
+        '''Ratings of players, None for players not rated in the partition.
+
+        The matchup is read as by `get_rating_table()`, '1v1' or else
+        'team'. The version code is matched as given.
+
+        Raises:
+            ValueError: no ratings are published for the partition.
+        '''
+
+        matchup_value = '1v1' if matchup.lower() == '1v1' else 'team'
+        partition = self._partitions.get((version_code, matchup_value))
+        if partition is None:
+            raise ValueError(f"No ratings of {version_code} {matchup_value}")
+        return [partition.get(name_hash) for name_hash in name_hashes]
+
+    def predict(self, version_code: str, matchup: str, teams: list[list[str]]) -> list[dict]:
+        '''Win probabilities of two teams, given by the name hashes of their players.
+
+        Team ratings are averages of their players, as in a rating run.
+        Players not rated start at the initial rating.
+
+        Returns:
+            One dict per team with `ratings` of its players (None if not
+            rated), team `rating` and `win_probability`.
+
+        Raises:
+            ValueError: not two teams, or an unknown partition.
+        '''
+
+        if len(teams) != 2 or not all(teams):
+            raise ValueError("Two teams of at least one player are needed")
+
+        result = []
+        for team in teams:
+            ratings = self.ratings(version_code, matchup, team)
+            result.append({
+                'ratings': ratings,
+                'rating': fmean([INITIAL_RATING if r is None else r for r in ratings])
+            })
+        for team, other in ((result[0], result[1]), (result[1], result[0])):
+            team['win_probability'] = EloCalculator.win_probability(team['rating'], other['rating'])
+        return result
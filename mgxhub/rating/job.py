@@ -0,0 +1,100 @@
+'''One rating run, as done by the scheduler and the command line.'''
+
+import fcntl
+import os
+import time
+
+from sqlalchemy.orm import Session
+
+from mgxhub.cacher import Cacher
+from mgxhub.config import cfg
+from mgxhub.db import create_sqlite_engine, prepare_rating_db
+from mgxhub.logger import logger
+
+from .calculator import EloCalculator
+
+
+def drop_rating_caches(session: Session) -> None:
+    '''Drop cached data built from ratings, in this process and the cache table.
+
+    Called by the process serving requests after runs rating any game,
+    runs don't write to the main database themselves.
+    '''
+
+    Cacher(session).invalidate('ratings')
+    session.commit()
+
+
+def run_rating(
+        db_path: str | None = None,
+        rating_db_path: str | None = None,
+        duration_threshold: int | None = None,
+        batch_size: int | None = None,
+        full: bool = False
+) -> int | None:
+    '''Update ratings.
+
+    A run writes to the rating database only, but for clearing the dirty
+    marker, not to contend with ingest for the main database. The ratings
+    generation it publishes there tells readers ratings changed, cached
+    rating data is dropped by the caller, see `drop_rating_caches()`. The
+    rating ledger is read, not filled: databases older than it need
+    `backfill_tables()` first, as done at startup.
+
+    Only one run at a time across processes, guarded by an advisory lock on
+    `rating.lockfile`. The lock goes away with the process holding it.
+
+    Args:
+        db_path: SQLite database, `database.sqlite` if None.
+        rating_db_path: database written by the engine, `database.ratingdb` if None.
+        duration_threshold: games not longer than this (ms) are not rated.
+        batch_size: rows fetched per query.
+        full: rate all games from scratch.
+
+    Returns:
+        Number of games rated, None if another run holds the lock.
+    '''
+
+    db_path = db_path or cfg.get('database', 'sqlite')
+    rating_db_path = rating_db_path or cfg.get('database', 'ratingdb')
+    duration_threshold = duration_threshold or cfg.getint('rating', 'durationthreshold')
+    batch_size = batch_size or cfg.getint('rating', 'batchsize')
+    if duration_threshold <= 0 or batch_size <= 50000:
+        duration_threshold, batch_size = 15 * 60 * 1000, 150000
+
+    with open(cfg.get('rating', 'lockfile'), 'a+', encoding='ASCII') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.debug("Another rating run holds the lock")
+            return None
+
+        # For humans, the lock itself is what matters
+        lock.truncate(0)
+        lock.write(f"{os.getpid()}\n{int(time.time())}\n")
+        lock.flush()
+
+        start_time = time.time()
+        logger.debug("Start calculating ELO ratings...")
+        prepare_rating_db(db_path, rating_db_path)
+        engine = create_sqlite_engine(db_path, rating_db_path, echo=False, connect_args={'timeout': 60})
+        db = Session(engine)
+        try:
+            elo = EloCalculator(
+                db,
+                snapshot_interval=cfg.getint('rating', 'snapshotinterval'),
+                snapshot_keep=cfg.getint('rating', 'snapshotkeep'),
+                workers=cfg.getint('rating', 'workers'),
+                partitions=cfg.getint('rating', 'partitions'),
+                activity_days=cfg.getint('rating', 'activitydays')
+            )
+            games = elo.update_ratings(duration_threshold, batch_size, full)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+            engine.dispose()
+
+    logger.debug(f"Rating calculated, duration: {round(time.time() - start_time, 2)}")
+    return games
@@ -0,0 +1,258 @@
+'''Debounced rating runs in a warm worker process'''
+
+import atexit
+import multiprocessing
+import threading
+import time
+from typing import Callable
+
+from mgxhub.cacher import LocalCache
+from mgxhub.config import cfg
+from mgxhub.db import db_raw
+from mgxhub.logger import logger
+from mgxhub.singleton import Singleton
+
+from .index import RatingIndex
+from .job import drop_rating_caches, run_rating
+
+
+def _serve(conn, job: Callable[..., int | None]) -> None:
+    '''Loop of the worker process, runs `job(**kwargs)` for every kwargs received.
+
+    Stops when None is received or the scheduler side of the pipe is closed.
+    '''
+
+    while True:
+        try:
+            kwargs = conn.recv()
+        except EOFError:
+            return
+        if kwargs is None:
+            return
+        try:
+            conn.send((job(**kwargs), None))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"Rating Error: {e}")
+            conn.send((None, str(e)))
+
+
+class RatingScheduler(metaclass=Singleton):
+    '''Run the rating engine in the background after games are added.
+
+    Triggers arriving within `rating.debounce` seconds of the first one are
+    coalesced into one run, and runs start at least `rating.mininterval`
+    seconds after the previous one finished. Triggers during a run queue one
+    more run.
+
+    Runs are done one at a time by a worker process started once and kept
+    for later runs, so the interpreter and imports are warm and the web
+    process is not blocked by rating.
+
+    Example:
+    ```python
+    RatingScheduler().trigger()               # after a game is added
+    RatingScheduler().trigger(immediate=True)  # rate now, or right after the current run
+    ```
+    '''
+
+    def __init__(
+            self,
+            job: Callable[..., int | None] = run_rating,
+            debounce: float | None = None,
+            min_interval: float | None = None
+    ):
+        self._job = job
+        self._debounce = cfg.getfloat('rating', 'debounce') if debounce is None else debounce
+        self._min_interval = cfg.getfloat('rating', 'mininterval') if min_interval is None else min_interval
+
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._process = None
+        self._conn = None
+        self._stopping = False
+
+        self._pending: dict | None = None
+        self._running: dict | None = None
+        self._last_run: dict | None = None
+
+        # Before the exit handler of multiprocessing, which joins the worker
+        atexit.register(self.shutdown)
+
+    def start(self) -> None:
+        '''Start the scheduler thread and the worker process if not started.'''
+
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._loop, name='mgxhub_rating', daemon=True)
+                self._thread.start()
+        self._ensure_worker()
+
+    def trigger(
+            self,
+            full: bool = False,
+            duration_threshold: int | None = None,
+            batch_size: int | None = None,
+            immediate: bool = False
+    ) -> None:
+        '''Request a rating run.
+
+        Args:
+            full: rate all games from scratch, kept if coalesced with others.
+            duration_threshold: passed to the run, config value if None.
+            batch_size: passed to the run, config value if None.
+            immediate: skip the debounce window and the minimum interval.
+        '''
+
+        now = time.time()
+        with self._cond:
+            if self._pending is None:
+                self._pending = {'queued': now, 'due': now + self._debounce, 'full': False,
+                                 'immediate': False, 'duration_threshold': None, 'batch_size': None}
+            self._pending['full'] = self._pending['full'] or full
+            self._pending['immediate'] = self._pending['immediate'] or immediate
+            self._pending['duration_threshold'] = duration_threshold or self._pending['duration_threshold']
+            self._pending['batch_size'] = batch_size or self._pending['batch_size']
+            self._cond.notify()
+        self.start()
+
+    def cancel(self, force: bool = False) -> bool:
+        '''Drop the queued run. If `force`, also kill the current run.
+
+        Returns:
+            True if a run was killed.
+        '''
+
+        with self._cond:
+            self._pending = None
+            process = self._process if force and self._running else None
+        if process is not None:
+            process.terminate()
+            process.join(10)
+            return True
+        return False
+
+    def shutdown(self) -> None:
+        '''Stop the scheduler thread and the worker process.'''
+
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            process, conn = self._process, self._conn
+            self._thread = None
+        if process is not None:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+
+    @property
+    def running(self) -> bool:
+        '''True if a run is going on.'''
+
+        return self._running is not None
+
+    def status(self) -> dict:
+        '''Queued run, current run and last run, times are unix timestamps.'''
+
+        with self._cond:
+            now = time.time()
+            queued = None
+            if self._pending:
+                queued = {'since': self._pending['queued'], 'due': now + max(self._wait_time(now), 0),
+                          'full': self._pending['full']}
+            return {
+                'running': self._running is not None,
+                'pid': self._process.pid if self._process is not None and self._process.is_alive() else None,
+                'started': self._running['started'] if self._running else None,
+                'elapsed': now - self._running['started'] if self._running else None,
+                'queued': queued,
+                'last_run': dict(self._last_run) if self._last_run else None
+            }
+
+    def _ensure_worker(self) -> None:
+        with self._cond:
+            if self._process is not None and self._process.is_alive():
+                return
+            context = multiprocessing.get_context('spawn')
+            self._conn, child_conn = context.Pipe()
+            # Not a daemon, the engine starts its own worker processes
+            self._process = context.Process(target=_serve, args=(child_conn, self._job), name='mgxhub_rating')
+            self._process.start()
+            child_conn.close()
+            logger.debug(f"Rating worker process started, pid {self._process.pid}")
+
+    def _wait_time(self, now: float) -> float | None:
+        '''Seconds until the queued run is due, None if nothing queued.'''
+
+        if self._pending is None:
+            return None
+        if self._pending['immediate']:
+            return 0
+        due = self._pending['due']
+        if self._last_run:
+            due = max(due, self._last_run['finished'] + self._min_interval)
+        return due - now
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    wait = self._wait_time(time.time())
+                    if wait is not None and wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._stopping:
+                    return
+                job, self._pending = self._pending, None
+                self._running = {'started': time.time(), 'full': job['full']}
+
+            games, error = self._execute(job)
+            # A run may have published another generation, runs leave the
+            # caches to this process
+            RatingIndex().invalidate()
+            LocalCache().invalidate('ratings')
+            if games:
+                self._drop_caches()
+
+            with self._cond:
+                finished = time.time()
+                self._last_run = {
+                    'started': self._running['started'],
+                    'finished': finished,
+                    'elapsed': finished - self._running['started'],
+                    'full': job['full'],
+                    'games': games,
+                    'error': error
+                }
+                self._running = None
+                if games is None and error is None:
+                    # Another process holds the lock, try again later
+                    self._pending = self._pending or dict(job, queued=finished, due=finished, immediate=False)
+                    self._pending['full'] = self._pending['full'] or job['full']
+
+    @staticmethod
+    def _drop_caches() -> None:
+        db = db_raw()
+        try:
+            drop_rating_caches(db)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"Rating cache drop error: {e}")
+        finally:
+            db.close()
+
+    def _execute(self, job: dict) -> tuple[int | None, str | None]:
+        '''Run a job in the worker process and wait for it.'''
+
+        self._ensure_worker()
+        try:
+            self._conn.send({'duration_threshold': job['duration_threshold'],
+                             'batch_size': job['batch_size'], 'full': job['full']})
+            return self._conn.recv()
+        except (EOFError, OSError):
+            logger.warning("Rating worker process stopped during a run")
+            self._process.join(10)
+            return None, 'Rating process terminated'
@@ -0,0 +1,143 @@
+'''Compact player states of a rating partition'''
+
+from array import array
+from datetime import datetime, timedelta
+
+# Order of player state values in snapshots
+STATE_KEYS = ('name', 'rating', 'total', 'wins', 'lowest', 'highest',
+              'streak', 'streak_max', 'first_played', 'last_played')
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NO_TIME = -(1 << 63)
+
+
+def to_us(t: datetime | str | None) -> int:
+    '''Naive datetime, or its ISO format, to microseconds since the epoch.'''
+
+    if t is None:
+        return _NO_TIME
+    if isinstance(t, str):
+        t = datetime.fromisoformat(t)
+    return (t - _EPOCH) // _MICROSECOND
+
+
+def from_us(us: int) -> datetime | None:
+    '''Reverse of `to_us()`.'''
+
+    return None if us == _NO_TIME else _EPOCH + us * _MICROSECOND
+
+
+class PartitionState:
+    '''Player states of one `(version_code, 1v1|team)` partition.
+
+    Players are interned to integer ids in order of appearance, their values
+    are kept in parallel arrays indexed by the id, instead of a dict per
+    player. Times are microseconds since the epoch.
+
+    `player_id` is the players row of the last game rated for the player in
+    this run, 0 if none. `row_id` is the ratings row, 0 if not stored yet.
+    '''
+
+    __slots__ = ('index', 'name_hash', 'name', 'rating', 'total', 'wins', 'lowest', 'highest',
+                 'streak', 'streak_max', 'first_played', 'last_played', 'player_id', 'row_id')
+
+    def __init__(self):
+        self.index: dict[str, int] = {}
+        self.name_hash: list[str] = []
+        self.name: list[str] = []
+        self.rating = array('i')
+        self.total = array('i')
+        self.wins = array('i')
+        self.lowest = array('i')
+        self.highest = array('i')
+        self.streak = array('i')
+        self.streak_max = array('i')
+        self.first_played = array('q')
+        self.last_played = array('q')
+        self.player_id = array('q')
+        self.row_id = array('q')
+
+    def __len__(self) -> int:
+        return len(self.name_hash)
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in self.__slots__ if key != 'index'}
+
+    def __setstate__(self, state: dict) -> None:
+        for key, value in state.items():
+            setattr(self, key, value)
+        self.index = {name_hash: i for i, name_hash in enumerate(self.name_hash)}
+
+    def add(self, name_hash: str, name: str, first_played: int, player_id: int = 0) -> int:
+        '''Add a new player at the initial rating, returns the id.'''
+
+        i = len(self.name_hash)
+        self.index[name_hash] = i
+        self.name_hash.append(name_hash)
+        self.name.append(name)
+        for column, value in ((self.rating, 1600), (self.total, 0), (self.wins, 0), (self.lowest, 1600),
+                              (self.highest, 1600), (self.streak, 0), (self.streak_max, 0),
+                              (self.first_played, first_played), (self.last_played, first_played),
+                              (self.player_id, player_id), (self.row_id, 0)):
+            column.append(value)
+        return i
+
+    def add_values(self, name_hash: str, values: list, row_id: int = 0) -> int:
+        '''Add a player with values in `STATE_KEYS` order, returns the id.
+
+        Times may be datetimes, ISO strings or None.
+        '''
+
+        i = self.add(name_hash, values[0], to_us(values[8]))
+        (self.rating[i], self.total[i], self.wins[i], self.lowest[i], self.highest[i],
+         self.streak[i], self.streak_max[i]) = values[1:8]
+        self.last_played[i] = to_us(values[9])
+        self.row_id[i] = row_id
+        return i
+
+    def values(self, i: int) -> list:
+        '''Values of a player in `STATE_KEYS` order, times as ISO strings.'''
+
+        first_played, last_played = from_us(self.first_played[i]), from_us(self.last_played[i])
+        return [self.name[i], self.rating[i], self.total[i], self.wins[i], self.lowest[i], self.highest[i],
+                self.streak[i], self.streak_max[i],
+                first_played.isoformat() if first_played else None,
+                last_played.isoformat() if last_played else None]
+
+    def snapshot(self) -> dict[str, list]:
+        '''All players, name_hash -> values in `STATE_KEYS` order.'''
+
+        return {name_hash: self.values(i) for i, name_hash in enumerate(self.name_hash)}
+
+    @classmethod
+    def from_snapshot(cls, players: dict[str, list]) -> 'PartitionState':
+        '''Reverse of `snapshot()`, no player has a players or ratings row.'''
+
+        state = cls()
+        for name_hash, values in players.items():
+            state.add_values(name_hash, values)
+        return state
+
+    def rank_order(self) -> list[int]:
+        '''Player ids by rank, rating then games played descending, then name_hash.'''
+
+        rating, total, name_hash = self.rating, self.total, self.name_hash
+        return sorted(range(len(name_hash)), key=lambda i: (-rating[i], -total[i], name_hash[i]))
+
+    def mapping(self, i: int) -> dict:
+        '''Columns of the ratings row of a player.'''
+
+        return {
+            'name': self.name[i],
+            'name_hash': self.name_hash[i],
+            'rating': self.rating[i],
+            'wins': self.wins[i],
+            'total': self.total[i],
+            'streak': self.streak[i],
+            'streak_max': self.streak_max[i],
+            'highest': self.highest[i],
+            'lowest': self.lowest[i],
+            'first_played': from_us(self.first_played[i]),
+            'last_played': from_us(self.last_played[i])
+        }
@@ -0,0 +1,171 @@
+'''Compare rating parameters by how well ratings predict the games.
+
+Many `(K, duration_threshold)` sets are rated in one pass over the ledger,
+nothing is written to the rating database. Run it as a module:
+```bash
+python -m mgxhub.rating --sweep --K 16 24 32 40 --duration_thresholds 600000 900000
+```
+'''
+
+import math
+from array import array
+from itertools import product
+from statistics import fmean
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from mgxhub.db.operation import rating_ledger_missing, rebuild_rating_ledger
+from mgxhub.logger import logger
+from mgxhub.model.orm import RatingLedger
+
+# Probabilities are clipped to this before taking the log
+_MIN_PROB = 1e-15
+
+
+class RatingSweep:
+    '''Rate all games once for many parameter sets.
+
+    Each set is rated like `EloCalculator` would with the same `K` and
+    duration threshold. Players of a partition are interned to ids, and the
+    ratings of player `i` for all sets are kept next to each other at
+    `i * len(params)` in one array, so a game is read once for all sets.
+
+    Before each game, the win probability of the winners is predicted from
+    the ratings of the set. Predictions are scored on the games rated by
+    every set, the ones longer than the largest threshold, so scores of
+    different thresholds are comparable.
+    '''
+
+    def __init__(self, session: Session, params: list[tuple[int, int]]):
+        '''Args:
+            session: session of the main database.
+            params: `(K, duration_threshold)` sets to compare.
+        '''
+
+        self._session = session
+        self._params = list(params)
+        self._scored_threshold = max(threshold for _, threshold in self._params)
+        self._index: dict[tuple[str, str], dict[str, int]] = {}
+        self._ratings: dict[tuple[str, str], array] = {}
+        self._games = 0
+        self._log_loss = [0.0] * len(self._params)
+        self._brier = [0.0] * len(self._params)
+
+    def _rate_game(self, partition: tuple[str, str], duration: int, rows: list) -> None:
+        index = self._index.setdefault(partition, {})
+        ratings = self._ratings.setdefault(partition, array('i'))
+        sets = len(self._params)
+        winners, losers = [], []
+        for *_, name_hash, _, is_winner in rows:
+            i = index.get(name_hash)
+            if i is None:
+                i = index[name_hash] = len(index)
+                ratings.extend([1600] * sets)
+            (winners if is_winner else losers).append(i * sets)
+
+        # Skipped like `EloCalculator._update_game_ratings()` does
+        if len(winners) != len(set(winners)) or len(losers) != len(set(losers)) or not winners or not losers:
+            return
+
+        scored = duration > self._scored_threshold
+        self._games += scored
+        for s, (K, threshold) in enumerate(self._params):
+            if duration <= threshold:
+                continue
+            rating_winner = fmean([ratings[i + s] for i in winners])
+            rating_loser = fmean([ratings[i + s] for i in losers])
+            # Both computed as the calculator does, deltas are rounded the same
+            prob = 1 / (1 + math.pow(10, (rating_loser - rating_winner) / 400))
+            prob_loser = 1 / (1 + math.pow(10, (rating_winner - rating_loser) / 400))
+            if scored:
+                self._log_loss[s] -= math.log(max(prob, _MIN_PROB))
+                self._brier[s] += (1 - prob) ** 2
+            delta_winner, delta_loser = round(K * (1 - prob)), round(K * (0 - prob_loser))
+            for i in winners:
+                ratings[i + s] += delta_winner
+            for i in losers:
+                ratings[i + s] += delta_loser
+
+    def run(self, batch_size: int | None = None) -> list[dict]:
+        '''Rate all games for every set.
+
+        Returns:
+            One dict per set, in the order of `params`, with `K`,
+            `duration_threshold`, `games` scored, mean `log_loss` and mean
+            `brier` score (None if no game was scored).
+        '''
+
+        if rating_ledger_missing(self._session):
+            logger.info(f"Rating ledger filled: {rebuild_rating_ledger(self._session)} rows")
+
+        query = select(
+            RatingLedger.game_time,
+            RatingLedger.game_guid,
+            RatingLedger.duration,
+            RatingLedger.version_code,
+            RatingLedger.matchup,
+            RatingLedger.name_hash,
+            RatingLedger.name,
+            RatingLedger.is_winner
+        ).where(
+            RatingLedger.duration > min(threshold for _, threshold in self._params)
+        ).order_by(
+            RatingLedger.game_time, RatingLedger.game_guid, RatingLedger.is_winner
+        )
+        result = self._session.execute(query, execution_options={'yield_per': batch_size or 10000})
+        game, key = [], None
+        for row in result:
+            if (row[0], row[1]) != key:
+                if game:
+                    self._rate_game((game[0][3], game[0][4]), game[0][2], game)
+                game, key = [], (row[0], row[1])
+            game.append(row)
+        if game:
+            self._rate_game((game[0][3], game[0][4]), game[0][2], game)
+
+        return [{
+            'K': K,
+            'duration_threshold': threshold,
+            'games': self._games,
+            'log_loss': self._log_loss[s] / self._games if self._games else None,
+            'brier': self._brier[s] / self._games if self._games else None
+        } for s, (K, threshold) in enumerate(self._params)]
+
+    def ratings(self, s: int) -> dict[tuple[str, str, str], int]:
+        '''Final ratings of set `s`, by `(version_code, 1v1|team, name_hash)`.
+
+        Players only seen in games the set doesn't rate are at 1600.
+        '''
+
+        sets = len(self._params)
+        return {
+            (*partition, name_hash): self._ratings[partition][i * sets + s]
+            for partition, index in self._index.items()
+            for name_hash, i in index.items()
+        }
+
+
+def run_sweep(
+        db_path: str,
+        K: list[int],
+        duration_thresholds: list[int],
+        batch_size: int | None = None
+) -> list[dict]:
+    '''Compare every combination of `K` and `duration_thresholds`.
+
+    Only the ledger in the main database is read, the rating database is
+    not attached.
+
+    Returns:
+        Results of `RatingSweep.run()`, best log-loss first.
+    '''
+
+    engine = create_engine(f"sqlite:///{db_path}", echo=False, connect_args={'timeout': 60})
+    try:
+        with Session(engine) as session:
+            results = RatingSweep(session, list(product(K, duration_thresholds))).run(batch_size)
+    finally:
+        engine.dispose()
+
+    return sorted(results, key=lambda r: (r['log_loss'] is None, r['log_loss']))
@@ -0,0 +1,3 @@
+'''Random sampling of database rows.'''
+
+from .pool import PoolCache, RandomPool
@@ -0,0 +1,116 @@
+'''Candidate pool for uniform random sampling.'''
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Sequence
+
+from mgxhub.logger import logger
+
+
+class RandomPool:
+    '''Candidate pool for uniform random sampling.
+
+    Sampling `ORDER BY random()` sorts the whole filtered table on every
+    call. A pool loads the candidates once with `loader`, then every sample
+    is drawn in memory. When the pool is older than `ttl` seconds, one
+    background thread reloads it while the old candidates keep being served.
+
+    Each process keeps its own pools, threads of a process share them.
+
+    Example:
+    ```python
+    from mgxhub.sampler import RandomPool
+
+    pool = RandomPool(lambda: load_ids_from_db(), ttl=300)
+    ids = pool.sample(50)
+    ```
+    '''
+
+    def __init__(self, loader: Callable[[], Sequence], ttl: int = 300):
+        self._loader = loader
+        self._ttl = ttl
+        self._candidates: Sequence = ()
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._candidates)
+
+    def _load(self) -> None:
+        try:
+            candidates = self._loader()
+            self._candidates = candidates
+            self._loaded_at = time.time()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f'Random pool load error: {e}')
+        finally:
+            self._lock.release()
+
+    def refresh(self, wait: bool = False) -> None:
+        '''Reload the candidates if the pool is empty or outdated.
+
+        Args:
+            wait: block until reloaded. The first load always blocks.
+        '''
+
+        if self._loaded_at is not None and time.time() - self._loaded_at < self._ttl:
+            return
+        blocking = wait or self._loaded_at is None
+        if not self._lock.acquire(blocking=blocking):
+            return  # Another thread is reloading
+        if self._loaded_at is not None and time.time() - self._loaded_at < self._ttl:
+            self._lock.release()  # Reloaded by another thread while waiting
+            return
+        if blocking:
+            self._load()
+        else:
+            threading.Thread(target=self._load, daemon=True).start()
+
+    def sample(self, k: int) -> list:
+        '''Draw up to `k` distinct candidates uniformly at random.'''
+
+        self.refresh()
+        candidates = self._candidates
+        return random.sample(candidates, min(k, len(candidates)))
+
+
+class PoolCache:
+    '''Random pools by key, at most `size` of them, shared by threads.
+
+    Keys usually come from user input, like a threshold of a filter. The
+    least recently used pool is dropped when a new key comes in full.
+
+    Example:
+    ```python
+    pools = PoolCache(load_ids_longer_than, size=8)
+    ids = pools.get(10).sample(50)
+    ```
+    '''
+
+    def __init__(self, loader: Callable[[Hashable], Sequence], size: int = 8, ttl: int = 300):
+        self._loader = loader
+        self._size = size
+        self._ttl = ttl
+        self._pools: OrderedDict[Hashable, RandomPool] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pools)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._pools
+
+    def get(self, key: Hashable) -> RandomPool:
+        '''Pool of `key`, created if missing. Candidates load on first sample.'''
+
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = RandomPool(lambda: self._loader(key), self._ttl)
+                while len(self._pools) > self._size:
+                    self._pools.popitem(last=False)
+            else:
+                self._pools.move_to_end(key)
+            return pool
@@ -0,0 +1,3 @@
+'''Translation catalogs loaded once per process.'''
+
+from .translator import LABEL_COLUMNS, Translator
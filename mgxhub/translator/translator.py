@@ -0,0 +1,142 @@
+'''Translation catalogs loaded once per process.'''
+
+import gettext
+import os
+import signal
+import threading
+
+from mgxhub.config import cfg
+from mgxhub.logger import logger
+from mgxhub.singleton import Singleton
+
+# Low-cardinality columns whose values are translated
+LABEL_COLUMNS = ('map_name', 'speed', 'victory_type', 'map_size', 'civ_name', 'type')
+
+
+class Translator(metaclass=Singleton):
+    '''Translation catalogs loaded once per process.
+
+    Every `.mo` file in `system.langdir` is parsed at first use. Values of
+    the columns in `LABEL_COLUMNS` are translated through per-language
+    label tables, a plain dict lookup per cell. Unknown languages and
+    values are returned untranslated.
+
+    Example:
+    ```python
+    from mgxhub.translator import Translator
+
+    t = Translator()
+    t.translate('zh', 'speed', 'Normal')
+    t.translate_column('zh', 'map_name', ['Arabia', 'Arena'])
+    labels = t.labels('zh', 'civ_name')  # {'Aztecs': '阿兹特克', ...}
+    t.reload()  # after translations are updated
+    ```
+    '''
+
+    def __init__(self):
+        self._catalogs: dict[str, dict[str, str]] = {}
+        self._labels: dict[tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        self.reload()
+
+    @property
+    def langs(self) -> list[str]:
+        '''Language codes with a catalog'''
+
+        return list(self._catalogs)
+
+    def reload(self) -> int:
+        '''Parse all catalogs again and drop the label tables.
+
+        Returns:
+            Number of catalogs loaded.
+        '''
+
+        langdir = cfg.get('system', 'langdir')
+        catalogs = {}
+        try:
+            files = sorted(f for f in os.listdir(langdir) if f.endswith('.mo'))
+        except OSError as e:
+            logger.error(f'[Translator] Can not list {langdir}: {e}')
+            files = []
+        for file in files:
+            try:
+                with open(os.path.join(langdir, file), 'rb') as f:
+                    t = gettext.GNUTranslations(f)
+            except (OSError, ValueError) as e:
+                logger.error(f'[Translator] Can not load {file}: {e}')
+                continue
+            catalogs[file[:-3]] = {k: v for k, v in t._catalog.items() if k and v}  # pylint: disable=protected-access
+
+        with self._lock:
+            self._catalogs = catalogs
+            self._labels = {}
+        logger.info(f'[Translator] {len(catalogs)} catalogs loaded')
+        return len(catalogs)
+
+    def has(self, lang: str) -> bool:
+        '''Whether a catalog of the language is loaded'''
+
+        return lang in self._catalogs
+
+    def gettext(self, lang: str, message: str | None) -> str | None:
+        '''Translate any message'''
+
+        return self._catalogs.get(lang, {}).get(message, message)
+
+    def labels(self, lang: str, column: str) -> dict:
+        '''Label table of a column, value -> translation.
+
+        Filled as values are seen. Unlike the catalog, it only holds values
+        of the column, so it stays as small as the column's cardinality.
+        Unknown languages get an empty table that is not kept.
+        '''
+
+        if lang not in self._catalogs:
+            return {}
+        key = (lang, column)
+        table = self._labels.get(key)
+        if table is None:
+            with self._lock:
+                table = self._labels.setdefault(key, {})
+        return table
+
+    def translate(self, lang: str, column: str, value: str | None) -> str | None:
+        '''Translate a value of a column in `LABEL_COLUMNS`'''
+
+        if lang not in self._catalogs:
+            return value
+        table = self.labels(lang, column)
+        try:
+            return table[value]
+        except KeyError:
+            result = table[value] = self.gettext(lang, value)
+            return result
+
+    def translate_column(self, lang: str, column: str, values: list) -> list:
+        '''Translate all values of a result column'''
+
+        if lang not in self._catalogs:
+            return list(values)
+        table = self.labels(lang, column)
+        missing = set(values).difference(table)
+        if missing:
+            catalog = self._catalogs[lang]
+            table.update({v: catalog.get(v, v) for v in missing})
+        return [table[v] for v in values]
+
+    def install_reload_signal(self) -> bool:
+        '''Reload catalogs when the process receives SIGUSR1.
+
+        Must be called from the main thread. Returns False if the handler
+        could not be installed, e.g. on Windows.
+        '''
+
+        signum = getattr(signal, 'SIGUSR1', None)
+        if signum is None:
+            return False
+        try:
+            signal.signal(signum, lambda *_: self.reload())
+        except (ValueError, OSError):
+            return False
+        return True
@@ -1,3 +1,4 @@
+from .lttb import lttb
 from .sanitize_playername import sanitize_playername
 from .tasks_in_loop import run_slow_tasks
 from .tmp_cleaner import TmpCleaner
@@ -0,0 +1,43 @@
+def lttb(points: list[tuple[float, float]], threshold: int) -> list[int]:
+    '''Downsample a curve with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and the last point, and from each bucket in between the
+    point forming the largest triangle with the point kept before and the
+    average of the next bucket. The shape of the curve, peaks included, is
+    preserved better than by averaging.
+
+    Args:
+        points: (x, y) pairs sorted by x.
+        threshold: number of points wanted, at least 2 are kept.
+
+    Returns:
+        Indexes of the points kept, in order.
+    '''
+
+    n = len(points)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1]
+
+    kept = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / (next_end - next_start)
+
+        ax, ay = points[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
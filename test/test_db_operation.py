@@ -0,0 +1,496 @@
+'''Tests for database operations in `mgxhub/db/operation/`.'''
+
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+import unittest
+from hashlib import md5
+from unittest import mock
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+
+from mgxhub.cacher import Cacher, LocalCache, cached_call
+from mgxhub.db import db_run
+from mgxhub.db.operation import (add_game, build_game_document,
+                                 bump_generation, coplay_edges_missing,
+                                 get_close_friends, get_coplay_path,
+                                 get_counters, get_game_document,
+                                 get_generations, get_player_recent_games,
+                                 get_total_stats_raw, invalidate_game_document,
+                                 purge_game_documents, rebuild_coplay_edges,
+                                 reconcile_counters, search_games)
+from mgxhub.graph import CoPlayGraph
+from mgxhub.model.orm import Base, CoPlay, GameDocument, RatingBase, RatingMeta
+from mgxhub.model.searchcriteria import SearchCriteria
+from mgxhub.sampler import PoolCache
+from mgxhub.singleton import Singleton
+from webapi.conditional import Generations, conditional
+from webapi.routers import game_random, player_random
+
+SAMPLE_FILE = os.path.join(os.path.dirname(__file__), 'samples', 'parsed_data.json')
+
+
+def sample_game(i: int) -> dict:
+    '''Make the i-th variant of the sample game with unique guid and md5.'''
+
+    with open(SAMPLE_FILE, 'r', encoding='utf-8') as f:
+        d = json.load(f)
+    d = copy.deepcopy(d)
+    d['guid'] = md5(f'game{i}'.encode()).hexdigest()
+    d['md5'] = md5(f'file{i}'.encode()).hexdigest()
+    d['gameTime'] = d['gameTime'] + i * 3600
+    return d
+
+
+class TestDBOperations(unittest.TestCase):
+    '''Run operations against an in-memory SQLite3 database.'''
+
+    GAMES = 30
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine(
+            'sqlite://',
+            connect_args={'check_same_thread': False},
+            poolclass=StaticPool
+        )
+        with cls.engine.connect() as conn:
+            conn.execute(text("ATTACH DATABASE ':memory:' AS rating"))
+        Base.metadata.create_all(cls.engine)
+        RatingBase.metadata.create_all(cls.engine)
+        cls.Session = sessionmaker(bind=cls.engine, autoflush=False)
+
+        session = cls.Session()
+        for i in range(cls.GAMES):
+            add_game(session, sample_game(i))
+        session.close()
+
+        cls.statements = []
+        event.listen(cls.engine, 'before_cursor_execute', cls._count_statement)
+
+    @classmethod
+    def tearDownClass(cls):
+        event.remove(cls.engine, 'before_cursor_execute', cls._count_statement)
+        cls.engine.dispose()
+
+    @classmethod
+    def _count_statement(cls, conn, cursor, statement, *args):  # pylint: disable=unused-argument
+        cls.statements.append(statement)
+
+    def setUp(self):
+        self.session = self.Session()
+        self.statements.clear()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_search_games_query_count(self):
+        '''Players are batch loaded, query count does not grow with page size.'''
+
+        counts = []
+        for page_size in [1, 10, self.GAMES]:
+            self.statements.clear()
+            result = search_games(self.session, SearchCriteria(page_size=page_size))
+            self.assertEqual(len(result['games']), page_size)
+            self.assertTrue(all(len(g['players']) == 8 for g in result['games']))
+            counts.append(len(self.statements))
+            self.session.expunge_all()
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_recent_games_query_count(self):
+        '''Players of recent games are batch loaded.'''
+
+        name_hash = md5(sample_game(0)['players'][0]['name'].encode()).hexdigest()
+
+        counts = []
+        for limit in [1, 10, self.GAMES]:
+            self.statements.clear()
+            games = get_player_recent_games(self.session, name_hash, limit)
+            self.assertEqual(len(games), limit)
+            self.assertTrue(all(len(g[7]) == 8 for g in games))
+            counts.append(len(self.statements))
+            self.session.expunge_all()
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_close_friends(self):
+        '''Partners come from the co-play edges maintained by add_game.'''
+
+        players = sample_game(0)['players']
+        name_hash = md5(players[0]['name'].encode()).hexdigest()
+
+        CoPlayGraph().refresh(self.session, force=True)
+        friends = get_close_friends(self.session, name_hash, 3)
+        self.assertEqual(len(friends), 3)
+        self.assertTrue(all(games == self.GAMES for _, games in friends))
+
+    def test_coplay_edges_rebuild(self):
+        '''Rebuilding from players gives the same edges as incremental updates.'''
+
+        def edges():
+            return sorted(tuple(row) for row in self.session.query(
+                CoPlay.name_hash_a, CoPlay.name_hash_b, CoPlay.games, CoPlay.wins_together).all())
+
+        incremental = edges()
+        self.assertEqual(len(incremental), 8 * 7)
+        self.assertFalse(coplay_edges_missing(self.session))
+        self.session.query(CoPlay).delete()
+        self.assertTrue(coplay_edges_missing(self.session))
+        rebuild_coplay_edges(self.session)
+        self.assertEqual(edges(), incremental)
+
+    def test_coplay_reparse(self):
+        '''Re-parsed games move their edges, other processes catch up by seq.'''
+
+        def edges():
+            return sorted(tuple(row) for row in self.session.query(
+                CoPlay.name_hash_a, CoPlay.name_hash_b, CoPlay.games, CoPlay.wins_together).filter(CoPlay.games > 0))
+
+        Singleton._instances.pop(CoPlayGraph, None)
+        other = CoPlayGraph()  # As loaded by another process
+        other.refresh(self.session)
+        Singleton._instances.pop(CoPlayGraph, None)
+        self.addCleanup(Singleton._instances.pop, CoPlayGraph, None)
+
+        d = sample_game(0)
+        renamed = md5(b'renamed').hexdigest()
+        original = md5(d['players'][0]['name'].encode()).hexdigest()
+        d['players'][0]['name'] = 'renamed'
+        d['md5'] = 'reparsed'
+        self.assertEqual(add_game(self.session, d)[0], 'updated')
+
+        other.refresh(self.session, force=True)
+        self.assertEqual(len(other.partners(renamed)), 7)
+        self.assertTrue(all(games == 1 for _, games in other.partners(renamed)))
+        self.assertTrue(all(games == self.GAMES - 1 for _, games in other.partners(original)))
+        incremental = edges()
+        rebuild_coplay_edges(self.session)
+        self.assertEqual(edges(), incremental)
+
+        d = sample_game(0)
+        d['md5'] = 'reparsed back'
+        self.assertEqual(add_game(self.session, d)[0], 'updated')
+        other.refresh(self.session, force=True)
+        self.assertEqual(other.partners(renamed), [])
+        self.assertTrue(all(games == self.GAMES for _, games in other.partners(original)))
+
+    def test_coplay_path(self):
+        '''Shortest co-play path between two players.'''
+
+        players = sample_game(0)['players']
+        hash_a = md5(players[0]['name'].encode()).hexdigest()
+        hash_b = md5(players[1]['name'].encode()).hexdigest()
+
+        CoPlayGraph().refresh(self.session, force=True)
+        path = get_coplay_path(self.session, hash_a, hash_b)
+        self.assertEqual([h for _, h in path], [hash_a, hash_b])
+        self.assertEqual(get_coplay_path(self.session, hash_a, 'not exists'), [])
+
+    def test_live_counters(self):
+        '''Counters maintained by add_game match a full recount.'''
+
+        stats = get_total_stats_raw(self.session)
+        self.assertEqual(stats['unique_games'], self.GAMES)
+        self.assertEqual(stats['unique_players'], 8)
+        self.assertEqual(stats['monthly_games'], self.GAMES)
+        self.assertEqual(get_counters(self.session, 'matchup'), {'1v1v1v1v1v1v1v1': self.GAMES})
+        self.statements.clear()
+        self.assertEqual(reconcile_counters(self.session), 0)
+        # Ingest can't slip in between the counts and the write
+        self.assertEqual(self.statements[0], 'BEGIN IMMEDIATE')
+
+    def test_game_document(self):
+        '''Detail documents are stored once and dropped when the game changes.'''
+
+        d = sample_game(1)
+        body = get_game_document(self.session, d['guid'])
+        self.assertEqual(json.loads(body)['guid'], d['guid'])
+
+        self.statements.clear()
+        self.assertEqual(get_game_document(self.session, d['guid']), body)
+        self.assertEqual(len(self.statements), 1)
+
+        d['duration'] += 1000
+        self.assertEqual(add_game(self.session, d)[0], 'updated')
+        self.assertEqual(self.session.query(GameDocument).filter(GameDocument.game_guid == d['guid']).count(), 0)
+        self.assertEqual(json.loads(get_game_document(self.session, d['guid']))['duration'], d['duration'])
+
+        self.assertIsNone(get_game_document(self.session, 'not exists'))
+
+        # Changed while built, in the same second and without touching the game row
+        def build_then_change(session, guid, lang):
+            built = build_game_document(session, guid, lang)
+            invalidate_game_document(session, guid)
+            session.commit()
+            return built
+
+        purge_game_documents(self.session)
+        with mock.patch('mgxhub.db.operation.game_document.build_game_document', build_then_change):
+            self.assertIsNotNone(get_game_document(self.session, d['guid']))
+        self.assertEqual(self.session.query(GameDocument).filter(GameDocument.game_guid == d['guid']).count(), 0)
+
+    def test_cacher(self):
+        '''Hits of the process cache run no statement, tags invalidate both tiers.'''
+
+        Singleton._instances.pop(LocalCache, None)
+        self.addCleanup(Singleton._instances.pop, LocalCache, None)
+        cacher = Cacher(self.session)
+        cacher.set('homepage', '{"a": 1}', tags=['games', 'players'])
+        cacher.set('rating_stats', {'b': 2}, tags=['ratings'])
+
+        self.statements.clear()
+        self.assertEqual(cacher.get('homepage'), '{"a": 1}')
+        self.assertEqual(self.statements, [])
+
+        # As seen by another process, then cached in this one
+        LocalCache().clear()
+        self.assertEqual(cacher.get('rating_stats'), '{"b": 2}')
+        self.assertEqual(cacher.get('homepage'), '{"a": 1}')
+        self.assertEqual(len(self.statements), 2)
+
+        d = sample_game(2)
+        d['duration'] += 1000
+        self.assertEqual(add_game(self.session, d)[0], 'updated')
+        self.assertIsNone(cacher.get('homepage'))
+        LocalCache().clear()
+        self.assertIsNone(cacher.get('homepage'))
+        self.assertEqual(cacher.get('rating_stats'), '{"b": 2}')
+
+        cacher.invalidate('ratings')
+        self.session.commit()
+        self.assertIsNone(cacher.get('rating_stats'))
+
+    def test_cached_call(self):
+        '''Concurrent misses compute once, stale values are served while refreshed.'''
+
+        Singleton._instances.pop(LocalCache, None)
+        self.addCleanup(Singleton._instances.pop, LocalCache, None)
+        calls = []
+
+        async def compute():
+            calls.append(None)
+            await asyncio.sleep(0.05)
+            return f'v{len(calls)}'
+
+        async def run_here(func, *args):
+            return func(self.session, *args)
+
+        def invalidate():
+            Cacher(self.session).invalidate('games')
+            self.session.commit()
+
+        def call(**kwargs):
+            return cached_call('flight', compute, tags=['games'], **kwargs)
+
+        async def scenario():
+            results = await asyncio.gather(*[call() for _ in range(5)])
+            self.assertEqual(results, [('v1', False)] * 5)
+            self.assertEqual(await call(), ('v1', True))
+
+            invalidate()
+            self.assertEqual(await call(max_stale=60), ('v1', True))
+            self.assertEqual(await call(max_stale=60), ('v1', True))
+            await asyncio.sleep(0.1)
+            self.assertEqual(await call(), ('v2', True))
+            self.assertEqual(len(calls), 2)
+
+            invalidate()
+            self.assertEqual(await call(max_stale=0), ('v3', False))
+
+        with mock.patch('mgxhub.cacher.flight.db_run', run_here):
+            asyncio.run(scenario())
+
+    def test_cached_call_invalidated(self):
+        '''A value whose tags are invalidated while it is computed is not stored.'''
+
+        Singleton._instances.pop(LocalCache, None)
+        self.addCleanup(Singleton._instances.pop, LocalCache, None)
+        calls = []
+
+        async def compute():
+            calls.append(None)
+            if len(calls) == 1:
+                # Ingest commits meanwhile, in another session
+                session = self.Session()
+                Cacher(session).invalidate('players')
+                session.commit()
+                session.close()
+            return f'v{len(calls)}'
+
+        async def run_here(func, *args):
+            return func(self.session, *args)
+
+        async def scenario():
+            self.assertEqual(await cached_call('raced', compute, tags=['games', 'players']), ('v1', False))
+            self.assertIsNone(Cacher(self.session).get('raced'))
+            self.assertEqual(await cached_call('raced', compute, tags=['games', 'players']), ('v2', False))
+            self.assertEqual(await cached_call('raced', compute, tags=['games', 'players']), ('v2', True))
+
+        with mock.patch('mgxhub.cacher.flight.db_run', run_here):
+            asyncio.run(scenario())
+
+        Cacher(self.session).purge()
+        self.assertTrue(Cacher(self.session).versions(['players']))
+
+    def test_conditional(self):
+        '''Changes of the data change the ETag, a matching If-None-Match gets a 304.'''
+
+        Singleton._instances.pop(Generations, None)
+        self.addCleanup(Singleton._instances.pop, Generations, None)
+        Generations(check_interval=60)
+
+        async def run_here(func, *args):
+            return func(self.session, *args)
+
+        def request(etag=None):
+            headers = [(b'if-none-match', etag.encode())] if etag else []
+            return Request({'type': 'http', 'method': 'GET', 'headers': headers})
+
+        async def scenario():
+            headers, not_modified = await conditional(request(), 'games', 'players')
+            self.assertIsNone(not_modified)
+            self.assertIn('Last-Modified', headers)
+            etag = headers['ETag']
+
+            self.statements.clear()
+            headers, not_modified = await conditional(request(f'"x", {etag}'), 'games', 'players')
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(headers['ETag'], etag)
+            self.assertEqual(self.statements, [])
+
+            # Tags of responses also built from request parameters differ by them
+            headers, _ = await conditional(request(), 'games', 'players', extra='guid1')
+            self.assertNotEqual(headers['ETag'], etag)
+            headers, not_modified = await conditional(request(headers['ETag']), 'games', 'players', extra='guid2')
+            self.assertIsNone(not_modified)
+
+            # Another game changes both generations, ratings are kept
+            ratings = get_generations(self.session)['ratings']
+            d = sample_game(3)
+            d['duration'] += 1000
+            self.assertEqual(add_game(self.session, d)[0], 'updated')
+            self.assertEqual(get_generations(self.session)['ratings'], ratings)
+            # Committed by this process, read again without waiting for the next check
+            headers, not_modified = await conditional(request(etag), 'games', 'players')
+            self.assertIsNone(not_modified)
+            self.assertNotEqual(headers['ETag'], etag)
+
+        with mock.patch('webapi.conditional.db_run', run_here):
+            asyncio.run(scenario())
+
+    def test_generations(self):
+        '''Generations are bumped by changes and survive reconciling.'''
+
+        before = get_generations(self.session)
+        self.assertGreaterEqual(before['games'][0], self.GAMES)
+        bump_generation(self.session, 'players')
+        self.session.commit()
+        reconcile_counters(self.session)
+        after = get_generations(self.session)
+        self.assertEqual(after['games'], before['games'])
+        self.assertEqual(after['players'][0], before['players'][0] + 1)
+
+        # Ratings are published by the rating engine in its database
+        self.session.merge(RatingMeta(key='generation', value='7'))
+        self.session.commit()
+        self.assertEqual(get_generations(self.session)['ratings'][0], 7)
+        self.session.query(RatingMeta).delete()
+        self.session.commit()
+
+        # Purged documents may be served with other translations
+        purge_game_documents(self.session)
+        self.assertEqual(get_generations(self.session)['games'][0], before['games'][0] + 1)
+
+    def test_random_samples(self):
+        '''Samples are distinct and only drawn from candidates passing the filter.'''
+        # pylint: disable=protected-access
+
+        session = self.Session()
+        self.addCleanup(session.close)
+        # Threshold of the game filter, as compared to the duration column
+        minutes = sample_game(0)['duration'] // 60
+        with mock.patch.object(game_random, 'db_raw', self.Session), \
+                mock.patch.object(player_random, 'db_raw', self.Session):
+            games = game_random._sample_games(session, minutes - 1, self.GAMES + 10)
+            self.assertEqual(len({g[0] for g in games}), self.GAMES)
+            self.assertEqual(game_random._sample_games(session, minutes + 100, 10), [])
+
+            players = player_random._sample_players(self.GAMES - 1, 100)
+            self.assertEqual(len({p[1] for p in players}), 8)
+            self.assertTrue(all(p[2] >= self.GAMES for p in players))
+            self.assertEqual(player_random._sample_players(self.GAMES, 100), [])
+
+    def test_pool_cache(self):
+        '''Pools are shared by key, the least recently used is evicted.'''
+
+        loaded = []
+
+        def loader(key):
+            loaded.append(key)
+            return list(range(key))
+
+        pools = PoolCache(loader, size=2)
+        self.assertIs(pools.get(5), pools.get(5))
+        pools.get(6)
+        pools.get(5)
+        pools.get(7)
+        self.assertEqual([k in pools for k in (5, 6, 7)], [True, False, True])
+        self.assertEqual(sorted(pools.get(5).sample(10)), list(range(5)))
+        self.assertEqual(loaded, [5])
+
+    def test_local_cache(self):
+        '''The process cache evicts the least recently used and expired entries.'''
+
+        Singleton._instances.pop(LocalCache, None)
+        self.addCleanup(Singleton._instances.pop, LocalCache, None)
+        local = LocalCache(size=2, ttl=60)
+        local.set('a', '1')
+        local.set('b', '2')
+        local.get('a')
+        local.set('c', '3')
+        self.assertEqual([local.get(k) for k in 'abc'], ['1', None, '3'])
+
+        local.set('d', '4', ttl=0)
+        self.assertIsNone(local.get('d'))
+
+        # Staleness counts from expiry or invalidation, not from storing
+        with mock.patch('mgxhub.cacher.local.time.monotonic', return_value=1000.0):
+            local.set('e', '5', tags=frozenset(['games']))
+        with mock.patch('mgxhub.cacher.local.time.monotonic', return_value=1050.0):
+            self.assertEqual(local.peek('e'), ('5', 0.0))
+            local.invalidate('games')
+        with mock.patch('mgxhub.cacher.local.time.monotonic', return_value=1055.0):
+            self.assertIsNone(local.get('e'))
+            self.assertEqual(local.peek('e'), ('5', 5.0))
+        with mock.patch('mgxhub.cacher.local.time.monotonic', return_value=1200.0):
+            local.invalidate('games')
+            self.assertEqual(local.peek('e'), ('5', 150.0))
+
+
+class TestDBExecutor(unittest.TestCase):
+    '''Blocking database work runs in the thread pool.'''
+
+    def test_tasks_overlap(self):
+        '''Each task has its own session and thread, slow tasks overlap.'''
+
+        def slow(session, seconds):
+            time.sleep(seconds)
+            return id(session), threading.get_ident()
+
+        async def run_all():
+            return await asyncio.gather(*[db_run(slow, 0.2) for _ in range(4)])
+
+        start = time.time()
+        results = asyncio.run(run_all())
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(len({session for session, _ in results}), 4)
+        self.assertNotIn(threading.get_ident(), {thread for _, thread in results})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,549 @@
+'''Tests for the Elo rating engine in `mgxhub/rating/`.'''
+
+import copy
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from hashlib import md5
+from unittest import mock
+
+from sqlalchemy import func, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from mgxhub.db import create_sqlite_engine, prepare_rating_db
+from mgxhub.db.operation import (add_game, backfill_tables,
+                                 get_player_rating_table,
+                                 get_rating_generation, get_rating_history,
+                                 get_rating_table, mark_rating_dirty,
+                                 rebuild_rating_ledger, update_rating_ledger)
+from mgxhub.model.orm import (Base, Game, Player, Rating, RatingActivity,
+                              RatingDirty, RatingHistory, RatingLedger,
+                              RatingSnapshot)
+from mgxhub.rating import (EloCalculator, RatingIndex, RatingScheduler,
+                           RatingSweep)
+from mgxhub.singleton import Singleton
+
+SAMPLE_FILE = os.path.join(os.path.dirname(__file__), 'samples', 'parsed_data.json')
+NAMES = [f'player{i}' for i in range(12)]
+
+
+def rated_game(i: int, hours: int | None = None, seed: int = 0) -> dict:
+    '''Make a rating-eligible 1v1 or 2v2 game from the sample game.'''
+
+    rnd = random.Random(i * 1000 + seed)
+    with open(SAMPLE_FILE, 'r', encoding='utf-8') as f:
+        d = copy.deepcopy(json.load(f))
+    d['guid'] = md5(f'rated{i}-{seed}'.encode()).hexdigest()
+    d['md5'] = md5(f'ratedfile{i}-{seed}'.encode()).hexdigest()
+    d['gameTime'] = 1600000000 + (i if hours is None else hours) * 3600
+    d['includeAI'] = False
+    d['isMultiplayer'] = True
+    size = rnd.choice([1, 2])
+    d['matchup'] = '1v1' if size == 1 else '2v2'
+    names = rnd.sample(NAMES, size * 2)
+    d['players'] = d['players'][:size * 2]
+    for n, p in enumerate(d['players']):
+        p['name'] = names[n]
+        p['isWinner'] = n < size
+        p['mainOp'] = True
+    return d
+
+
+def logged_job(duration_threshold: int | None, batch_size: int | None, full: bool) -> int:
+    '''Stand-in for a rating run, logs the run to `RATING_JOB_LOG`.'''
+
+    with open(os.environ['RATING_JOB_LOG'], 'a', encoding='utf-8') as f:
+        f.write(json.dumps([os.getpid(), time.time(), full]) + '\n')
+    time.sleep(0.2)
+    return 1
+
+
+class TestEloCalculator(unittest.TestCase):
+    '''Incremental runs give the same ratings as rating all games.'''
+
+    def setUp(self):
+        # A file database, worker processes can't see an in-memory one
+        self.tmpdir = tempfile.mkdtemp()
+        db_path, rating_db_path = os.path.join(self.tmpdir, 'test.db'), os.path.join(self.tmpdir, 'rating.db')
+        prepare_rating_db(db_path, rating_db_path)
+        self.engine = create_sqlite_engine(db_path, rating_db_path)
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine, autoflush=False)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def run_elo(self, full: bool = False, workers: int = 1, duration_threshold: int = 15 * 60 * 1000) -> int:
+        elo = EloCalculator(self.session, snapshot_interval=5, workers=workers)
+        elo.PARALLEL_MIN_ROWS = 0
+        return elo.update_ratings(duration_threshold, full=full)
+
+    def snapshot(self) -> tuple[list, list]:
+        ratings = sorted(tuple(r) for r in self.session.query(
+            Rating.name_hash, Rating.version_code, Rating.matchup, Rating.rating, Rating.wins,
+            Rating.total, Rating.streak, Rating.streak_max, Rating.highest, Rating.lowest,
+            Rating.first_played, Rating.last_played, Rating.rank))
+        history = sorted(tuple(r) for r in self.session.query(
+            RatingHistory.player_id, RatingHistory.name_hash, RatingHistory.version_code,
+            RatingHistory.matchup, RatingHistory.game_time, RatingHistory.rating, RatingHistory.rating_change))
+        return ratings, history
+
+    def assert_same_as_full(self, workers: int = 1):
+        incremental = self.snapshot()
+        self.assertTrue(incremental[0])
+        self.run_elo(full=True, workers=workers)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_incremental(self):
+        '''Only new games are rated after the first run.'''
+
+        for i in range(30):
+            add_game(self.session, rated_game(i))
+        self.assertEqual(self.run_elo(), 30)
+
+        for i in range(30, 40):
+            add_game(self.session, rated_game(i))
+        self.assertEqual(self.run_elo(), 10)
+        self.assertEqual(self.run_elo(), 0)
+        self.assertGreater(self.session.query(RatingSnapshot).count(), 0)
+        self.assert_same_as_full()
+
+    def test_publish(self):
+        '''Ratings are published by swapping in a shadow table.'''
+
+        for i in range(10):
+            add_game(self.session, rated_game(i))
+        self.run_elo()
+        self.run_elo(full=True)
+        self.assertEqual(get_rating_generation(self.session), 2)
+        tables = self.session.execute(text(
+            "SELECT name FROM rating.sqlite_master WHERE tbl_name LIKE 'ratings%'")).scalars().all()
+        self.assertEqual(sorted(tables), ['idx_ratings_rank_g2', 'ix_rating_ratings_g2_name_hash', 'ratings'])
+
+        self.run_elo()
+        self.assertEqual(get_rating_generation(self.session), 2)
+        add_game(self.session, rated_game(10))
+        self.run_elo()
+        self.assertEqual(get_rating_generation(self.session), 3)
+        self.assert_same_as_full()
+
+    def test_rating_database(self):
+        '''Ratings are written to their own database, read-only for others.'''
+
+        for i in range(20):
+            add_game(self.session, rated_game(i))
+        self.run_elo()
+        for i in range(20, 30):
+            add_game(self.session, rated_game(i))
+        self.session.query(RatingDirty).delete()
+        self.session.commit()
+
+        # Ingest holding the write lock of the main database doesn't block a run
+        ingest = sqlite3.connect(os.path.join(self.tmpdir, 'test.db'), isolation_level=None)
+        ingest.execute('BEGIN IMMEDIATE')
+        try:
+            self.assertEqual(self.run_elo(), 10)
+        finally:
+            ingest.execute('ROLLBACK')
+            ingest.close()
+        tables = self.session.execute(text("SELECT name FROM main.sqlite_master WHERE type = 'table'")).scalars()
+        self.assertFalse({'ratings', 'rating_history', 'rating_meta'} & set(tables))
+
+        engine = create_sqlite_engine(os.path.join(self.tmpdir, 'test.db'), os.path.join(self.tmpdir, 'rating.db'),
+                                      readonly_rating=True)
+        try:
+            with engine.connect() as conn:
+                self.assertEqual(conn.execute(text('SELECT sum(total) FROM rating.ratings')).scalar(),
+                                 self.session.query(func.sum(Rating.total)).scalar())
+                with self.assertRaises(OperationalError):
+                    conn.execute(text('DELETE FROM rating.ratings'))
+        finally:
+            engine.dispose()
+
+    def test_main_ratings_moved(self):
+        '''Ratings older versions kept in the main database are moved once.'''
+
+        main = sqlite3.connect(os.path.join(self.tmpdir, 'test.db'))
+        main.execute('''CREATE TABLE ratings (
+            id INTEGER PRIMARY KEY, name TEXT, name_hash TEXT, version_code TEXT, matchup TEXT, rating INTEGER,
+            wins INTEGER, total INTEGER, streak INTEGER, streak_max INTEGER, highest INTEGER, lowest INTEGER,
+            first_played DATETIME, last_played DATETIME)''')
+        main.executemany(
+            'INSERT INTO ratings (name, name_hash, version_code, matchup, rating, wins, total) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [('a', 'ha', 'AOC10', '1v1', 1700, 3, 4), ('b', 'hb', 'AOC10', '1v1', 1700, 5, 9),
+             ('c', 'hc', 'AOC10', '1v1', 1500, 1, 4), ('d', 'hd', 'AOC10', 'team', 1600, 2, 2)])
+        main.commit()
+        main.close()
+
+        prepare_rating_db(os.path.join(self.tmpdir, 'test.db'), os.path.join(self.tmpdir, 'rating.db'))
+        ranks = self.session.query(Rating.name_hash, Rating.matchup, Rating.rank).order_by(Rating.name_hash).all()
+        self.assertEqual([tuple(r) for r in ranks],
+                         [('ha', '1v1', 2), ('hb', '1v1', 1), ('hc', '1v1', 3), ('hd', 'team', 1)])
+        tables = self.session.execute(text("SELECT name FROM main.sqlite_master WHERE type = 'table'")).scalars()
+        self.assertNotIn('ratings', set(tables))
+
+        # Done once, ratings of the rating database are kept
+        prepare_rating_db(os.path.join(self.tmpdir, 'test.db'), os.path.join(self.tmpdir, 'rating.db'))
+        self.assertEqual(self.session.query(Rating).count(), 4)
+
+    def test_ledger(self):
+        '''The ledger follows ingest, it is read in index order.'''
+
+        for i in range(20):
+            add_game(self.session, rated_game(i))
+        with_ai = rated_game(20)
+        with_ai['includeAI'] = True
+        add_game(self.session, with_ai)
+        longer = rated_game(5)
+        longer['duration'] += 1000
+        longer['md5'] = 'longer'
+        self.assertEqual(add_game(self.session, longer)[0], 'updated')
+
+        rows = self.ledger()
+        self.assertEqual(len(rows), self.session.query(Player).join(Game).filter(Game.include_ai == 0).count())
+        self.assertEqual(len({r[2] for r in rows}), 20)
+        self.assertIn(longer['duration'], {r[3] for r in rows})
+        self.assertEqual(self.run_elo(), 20)
+
+        # Runs don't fill it, startup does for databases older than the ledger
+        self.session.query(RatingLedger).delete()
+        self.session.commit()
+        with self.assertRaises(RuntimeError):
+            self.run_elo(full=True)
+        backfill_tables(self.session)
+        self.assertEqual(self.ledger(), rows)
+        self.assertEqual(self.run_elo(full=True), 20)
+        rebuild_rating_ledger(self.session)
+        self.assertEqual(self.ledger(), rows)
+
+        elo = EloCalculator(self.session)
+        for partition in [None, (rows[0][4], rows[0][5])]:
+            query = elo._rating_query(0, (rows[0][1], rows[0][2]), partition)  # pylint: disable=protected-access
+            sql = query.compile(compile_kwargs={"literal_binds": True})
+            plan = self.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'))
+            self.assertNotIn('TEMP B-TREE', ' '.join(row[-1] for row in plan))
+
+    def ledger(self) -> list:
+        return sorted(tuple(r) for r in self.session.query(
+            RatingLedger.player_id, RatingLedger.game_time, RatingLedger.game_guid, RatingLedger.duration,
+            RatingLedger.version_code, RatingLedger.matchup, RatingLedger.name_hash, RatingLedger.name,
+            RatingLedger.is_winner))
+
+    def test_rank(self):
+        '''Pages follow the ranks stored when publishing.'''
+
+        for i in range(30):
+            add_game(self.session, rated_game(i))
+        self.run_elo()
+        for i in range(30, 35):
+            add_game(self.session, rated_game(i))
+        self.run_elo()
+
+        version_code = self.session.query(Rating.version_code).limit(1).scalar()
+        players = self.session.query(Rating).filter(Rating.version_code == version_code, Rating.matchup == 'team').all()
+        players.sort(key=lambda r: (-r.rating, -r.total, r.name_hash))
+        self.assertGreater(len(players), 7)
+        self.assertEqual([r.rank for r in players], list(range(1, len(players) + 1)))
+
+        rows, total = get_rating_table(self.session, version_code, 'team', 'desc', 1, 5)
+        self.assertEqual(total, len(players))
+        self.assertEqual([row[0] for row in rows], list(range(6, min(10, total) + 1)))
+        self.assertEqual([row[2] for row in rows], [r.name_hash for r in players[5:10]])
+
+        rows, _ = get_rating_table(self.session, version_code, 'team', 'asc', 0, 5)
+        self.assertEqual([row[2] for row in rows], [r.name_hash for r in players[::-1][:5]])
+
+        rows, _ = get_player_rating_table(self.session, players[6].name_hash, version_code, 'team', 'desc', 5)
+        self.assertEqual(rows[0][0], 6)
+        self.assertIn(players[6].name_hash, [row[2] for row in rows])
+        self.assertEqual(get_player_rating_table(self.session, 'not exists', version_code, 'team')[0], [])
+        self.assert_same_as_full()
+
+    def test_backdated_game(self):
+        '''A back-dated game is rated again from the snapshot before it.'''
+
+        for i in range(40):
+            add_game(self.session, rated_game(i))
+        self.run_elo()
+
+        add_game(self.session, rated_game(100, hours=31))
+        processed = self.run_elo()
+        self.assertGreater(processed, 9)
+        self.assertLess(processed, 41)
+        self.assert_same_as_full()
+
+    def test_backdated_short_game(self):
+        '''Back-dated games shorter than the configured threshold count for runs with a lower one.'''
+
+        for i in range(40):
+            add_game(self.session, rated_game(i))
+        self.run_elo(duration_threshold=1000)
+
+        d = rated_game(100, hours=31)
+        d['duration'] = 60 * 1000
+        add_game(self.session, d)
+        self.assertGreater(self.run_elo(duration_threshold=1000), 9)
+        incremental = self.snapshot()
+        self.run_elo(full=True, duration_threshold=1000)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_history(self):
+        '''The history ends at the current rating and follows deleted games.'''
+
+        for i in range(30):
+            add_game(self.session, rated_game(i, hours=i * 24))
+        self.run_elo()
+        self.assertEqual(self.session.query(RatingHistory).count(),
+                         self.session.query(func.sum(Rating.total)).scalar())
+
+        rating = self.session.query(Rating).filter(Rating.matchup == 'team').first()
+        curve = get_rating_history(self.session, rating.name_hash, rating.version_code, 'team')
+        self.assertEqual(curve[-1][1], rating.rating)
+        self.assertEqual(len(curve), rating.total)
+        self.assertEqual(len(get_rating_history(self.session, rating.name_hash, rating.version_code,
+                                                'team', points=3)), min(3, rating.total))
+
+        # Deleted like /game/delete does
+        guid = rated_game(3)['guid']
+        game_time = self.session.query(Game.game_time).filter(Game.game_guid == guid).scalar()
+        self.session.query(Player).filter(Player.game_guid == guid).delete()
+        self.session.query(Game).filter(Game.game_guid == guid).delete()
+        update_rating_ledger(self.session, guid)
+        mark_rating_dirty(self.session, game_time)
+        self.session.commit()
+        self.run_elo()
+        self.assertEqual(self.session.query(RatingHistory).count(),
+                         self.session.query(func.sum(Rating.total)).scalar())
+        self.assert_same_as_full()
+
+    def test_parallel(self):
+        '''Partitions rated in worker processes give the same ratings.'''
+
+        for i in range(40):
+            add_game(self.session, rated_game(i))
+        self.assertEqual(self.run_elo(), 40)
+        self.assert_same_as_full(workers=2)
+
+        # Snapshots taken by the workers are usable
+        self.assertGreater(self.session.query(RatingSnapshot).count(), 0)
+        add_game(self.session, rated_game(100, hours=31))
+        self.assertLess(self.run_elo(), 41)
+        self.assert_same_as_full()
+
+    def test_sweep(self):
+        '''A sweep rates like the engine for each set and writes nothing.'''
+
+        for i in range(30):
+            add_game(self.session, rated_game(i))
+        self.run_elo()
+        before = self.snapshot()
+        threshold = 15 * 60 * 1000
+
+        sweep = RatingSweep(self.session, [(32, threshold), (16, threshold), (32, 10 ** 12)])
+        results = sweep.run(batch_size=4)
+        self.assertEqual(before, self.snapshot())
+        ratings = {(r.version_code, r.matchup, r.name_hash): r.rating for r in self.session.query(Rating)}
+        self.assertEqual(sweep.ratings(0), ratings)
+        self.assertNotEqual(sweep.ratings(1), ratings)
+
+        # Scored on games rated by every set, none here
+        self.assertEqual([r['games'] for r in results], [0, 0, 0])
+        sweep = RatingSweep(self.session, [(32, threshold), (16, threshold)])
+        results = sweep.run()
+        self.assertEqual([r['games'] for r in results], [30, 30])
+        for r in results:
+            self.assertGreater(r['log_loss'], 0)
+            self.assertLess(r['brier'], 1)
+
+    def test_index(self):
+        '''Predictions use the published generation, reloaded when invalidated.'''
+
+        for i in range(20):
+            add_game(self.session, rated_game(i))
+        self.run_elo()
+        Singleton._instances.pop(RatingIndex, None)
+        self.addCleanup(Singleton._instances.pop, RatingIndex, None)
+        index = RatingIndex(check_interval=3600)
+        self.assertTrue(index.stale())
+        index.refresh(self.session)
+        self.assertFalse(index.stale())
+        self.assertEqual(index.generation, get_rating_generation(self.session))
+
+        rows = self.session.query(Rating).filter(Rating.matchup == '1v1').order_by(Rating.rating).all()
+        weak, strong = rows[0], rows[-1]
+        self.assertEqual(index.ratings(weak.version_code, '1v1', [weak.name_hash, 'unknown']), [weak.rating, None])
+        teams = index.predict(weak.version_code, '1v1', [[strong.name_hash], [weak.name_hash]])
+        self.assertAlmostEqual(teams[0]['win_probability'] + teams[1]['win_probability'], 1)
+        self.assertAlmostEqual(teams[0]['win_probability'], 1 / (1 + 10 ** ((weak.rating - strong.rating) / 400)))
+        teams = index.predict(weak.version_code, '1v1', [['unknown'], [weak.name_hash]])
+        self.assertEqual(teams[0]['rating'], 1600)
+        with self.assertRaises(ValueError):
+            index.predict(weak.version_code, '1v1', [[strong.name_hash]])
+        # Read as by the rating table
+        self.assertEqual(index.ratings(weak.version_code, '1V1', [weak.name_hash]), [weak.rating])
+        self.assertEqual(len(index.predict(weak.version_code, '2v2', [[strong.name_hash], [weak.name_hash]])), 2)
+        with self.assertRaises(ValueError):
+            index.ratings('UNKNOWN', '1v1', [weak.name_hash])
+
+        # Kept until invalidated or checked again
+        generation = index.generation
+        for i in range(20, 30):
+            add_game(self.session, rated_game(i))
+        self.run_elo()
+        self.assertFalse(index.stale())
+        index.invalidate()
+        index.refresh(self.session)
+        self.assertGreater(index.generation, generation)
+        ratings = {(r.version_code, r.matchup, r.name_hash): r.rating for r in self.session.query(Rating)}
+        for (version_code, matchup, name_hash), rating in ratings.items():
+            self.assertEqual(index.ratings(version_code, matchup, [name_hash]), [rating])
+
+    def test_activity(self):
+        '''Daily activity matches the history and serves windowed tables.'''
+
+        now = int((time.time() - 1600000000) // 3600)
+        for i in range(20):
+            add_game(self.session, rated_game(i, hours=now - 12 * i - 1))
+        for i in range(20, 25):
+            add_game(self.session, rated_game(i, hours=now - 24 * 200 - i))
+        self.run_elo()
+
+        winners = dict(self.session.query(RatingLedger.player_id, RatingLedger.is_winner))
+        recent = [h for h in self.session.query(RatingHistory) if (datetime.now() - h.game_time).days < 90]
+        self.assertEqual(len(recent), self.session.query(func.sum(RatingActivity.games)).scalar())
+        self.assertEqual(sum(winners[h.player_id] for h in recent),
+                         self.session.query(func.sum(RatingActivity.wins)).scalar())
+
+        # Incremental runs give the same days as rebuilding them all
+        add_game(self.session, rated_game(30, hours=now - 2))
+        self.run_elo()
+        activity = self.activity()
+        self.run_elo(full=True)
+        self.assertEqual(activity, self.activity())
+
+        winners = dict(self.session.query(RatingLedger.player_id, RatingLedger.is_winner))
+        version_code = self.session.query(Rating.version_code).limit(1).scalar()
+        rows, size = get_rating_table(self.session, version_code, '1v1', window=3)
+        since = datetime.combine(date.today() - timedelta(days=2), datetime.min.time())
+        expected = {}
+        for h in self.session.query(RatingHistory).filter(RatingHistory.matchup == '1v1',
+                                                           RatingHistory.game_time >= since):
+            games, wins = expected.get(h.name_hash, (0, 0))
+            expected[h.name_hash] = (games + 1, wins + winners[h.player_id])
+        self.assertTrue(rows)
+        self.assertEqual(size, len(expected))
+        self.assertEqual({row[2]: (row[-2], row[-1]) for row in rows}, expected)
+        self.assertEqual([row[0] for row in rows], list(range(1, size + 1)))
+        self.assertEqual([row[3] for row in rows], sorted((row[3] for row in rows), reverse=True))
+
+        with self.assertRaises(ValueError):
+            get_rating_table(self.session, version_code, '1v1', window=91)
+
+    def activity(self) -> list:
+        return sorted(tuple(r) for r in self.session.query(
+            RatingActivity.version_code, RatingActivity.matchup, RatingActivity.day,
+            RatingActivity.name_hash, RatingActivity.games, RatingActivity.wins))
+
+    def test_scan_resumed(self):
+        '''An interrupted scan is resumed after the last complete game.'''
+
+        for i in range(30):
+            add_game(self.session, rated_game(i))
+
+        execute = self.session.execute
+        interrupted = []
+
+        def flaky_execute(statement, *args, **kwargs):
+            result = execute(statement, *args, **kwargs)
+            if kwargs.get('execution_options', {}).get('yield_per') and not interrupted:
+                interrupted.append(True)
+                return self.interrupt(result, 25)
+            return result
+
+        with mock.patch.object(self.session, 'execute', side_effect=flaky_execute):
+            elo = EloCalculator(self.session, snapshot_interval=5)
+            self.assertEqual(elo.update_ratings(batch_size=4), 30)
+        self.assertTrue(interrupted)
+        self.assert_same_as_full()
+
+    @staticmethod
+    def interrupt(rows, n: int):
+        for i, row in enumerate(rows):
+            if i == n:
+                raise OperationalError('SELECT', {}, Exception('interrupted'))
+            yield row
+
+
+class TestRatingScheduler(unittest.TestCase):
+    '''Triggers are coalesced and run in one warm process.'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.environ['RATING_JOB_LOG'] = os.path.join(self.tmpdir, 'runs.log')
+        Singleton._instances.pop(RatingScheduler, None)
+        self.scheduler = RatingScheduler(job=logged_job, debounce=0.3, min_interval=0.5)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+        Singleton._instances.pop(RatingScheduler, None)
+        shutil.rmtree(self.tmpdir)
+
+    def runs(self) -> list:
+        if not os.path.exists(os.environ['RATING_JOB_LOG']):
+            return []
+        with open(os.environ['RATING_JOB_LOG'], 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def wait_idle(self, timeout: float = 30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = self.scheduler.status()
+            if not status['running'] and not status['queued']:
+                return status
+            time.sleep(0.05)
+        self.fail('Scheduler still busy')
+
+    def test_debounce(self):
+        '''Triggers within the window make one run, later ones wait for the interval.'''
+
+        for full in [False, True, False]:
+            self.scheduler.trigger(full=full)
+        self.assertIsNotNone(self.scheduler.status()['queued'])
+        status = self.wait_idle()
+        self.assertEqual(status['last_run']['games'], 1)
+        self.assertEqual([r[2] for r in self.runs()], [True])
+
+        self.scheduler.trigger()
+        self.scheduler.trigger()
+        self.wait_idle()
+        (pid1, _, _), (pid2, started, _) = self.runs()
+        self.assertEqual(pid1, pid2)
+        self.assertGreaterEqual(started, status['last_run']['finished'] + 0.5)
+
+    def test_immediate(self):
+        '''An immediate run skips the window, a forced cancel stops a run.'''
+
+        self.scheduler.trigger(immediate=True)
+        self.wait_idle()
+        self.assertEqual(len(self.runs()), 1)
+
+        self.scheduler.trigger(immediate=True)
+        while not self.scheduler.running:
+            time.sleep(0.01)
+        self.assertTrue(self.scheduler.cancel(force=True))
+        status = self.wait_idle()
+        self.assertIsNotNone(status['last_run']['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
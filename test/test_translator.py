@@ -0,0 +1,40 @@
+'''Tests for `mgxhub/translator/`.'''
+
+import gettext
+import unittest
+
+from mgxhub import cfg
+from mgxhub.translator import Translator
+
+
+class TestTranslator(unittest.TestCase):
+    '''Preloaded catalogs translate like gettext.'''
+
+    def setUp(self):
+        self.t = Translator()
+
+    def test_same_as_gettext(self):
+        '''Label tables give the same results as a gettext catalog.'''
+
+        self.assertIn('zh', self.t.langs)
+        with open(f"{cfg.get('system', 'langdir')}/zh.mo", 'rb') as f:
+            g = gettext.GNUTranslations(f)
+        values = ['Normal', 'Arabia', 'Conquest', 'Not a label', None, 'Normal']
+        self.assertEqual(
+            self.t.translate_column('zh', 'speed', values),
+            [g.gettext(v) if v else v for v in values]
+        )
+        self.assertEqual(self.t.translate('zh', 'map_name', 'Arabia'), g.gettext('Arabia'))
+        self.assertNotEqual(g.gettext('Normal'), 'Normal')
+
+    def test_unknown_language(self):
+        '''Unknown languages are returned untranslated and not cached.'''
+
+        self.assertEqual(self.t.translate_column('xx', 'speed', ['Normal']), ['Normal'])
+        self.assertEqual(self.t.translate('xx', 'speed', 'Normal'), 'Normal')
+        self.assertEqual(self.t.labels('xx', 'speed'), {})
+        self.assertFalse(self.t.has('xx'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,267 @@
+'''Benchmark the rating engine on synthetic databases.
+
+For each size, a synthetic database is generated once and kept in
+`--data_dir`, the benchmarks run on a copy of it, with ratings in a new
+rating database next to the copy:
+
+- `full`: rate all games from scratch;
+- `writeback`: write the rating change and history of every rated row;
+- `publish`: write all ratings into a shadow table and swap it in;
+- `incremental`: rate 1% new games added after the last rated one;
+- `state`: load all ratings into the in-memory player states, the size of
+  the states is reported as `state_mb`.
+
+Every benchmark runs in a fresh process, wall time and peak RSS (worker
+processes included) are reported. Results are saved as a JSON run in
+`--baseline_dir` and compared with the latest earlier run of the same size
+on this machine, or with the reference `rating_<size>_reference.json` if
+none. Runs are machine-specific and not committed. Timings only compare
+on similar hardware, see `cpu` and `cpus` in the files. The 100k reference
+was measured on a VM with one 2.1 GHz Xeon vCPU and 6 GB of memory.
+
+```bash
+python tools/bench_rating.py --sizes 100k 1m
+```
+'''
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position,protected-access
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from mgxhub.config import cfg
+from mgxhub.db import create_sqlite_engine, prepare_rating_db
+from mgxhub.model.orm import Base, Rating, RatingHistory
+from mgxhub.rating import EloCalculator
+from mgxhub.rating.state import STATE_KEYS
+from tools.gen_synthetic_db import append, generate
+
+SIZES = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+SCENARIOS = ('full', 'writeback', 'publish', 'incremental', 'state')
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baselines')
+
+# Slower or bigger than the baseline by more than this is reported
+TOLERANCE = 1.1
+
+
+def _peak_rss_mb() -> float:
+    '''Peak RSS of this process or any of its waited-for children, in MiB.'''
+
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+
+
+def _writeback(elo: EloCalculator, session: Session) -> tuple[int, float]:
+    '''Write back the changes of all rated rows, like the engine does.'''
+
+    rows = session.execute(select(RatingHistory.player_id, RatingHistory.rating_change, RatingHistory.rating)).all()
+    count = len(rows)
+    start = time.perf_counter()
+    if rows:
+        elo._changes = tuple(array('q', (row[k] for row in rows)) for k in range(3))
+    del rows
+    elo._update_rating_change()
+    return count, time.perf_counter() - start
+
+
+def _publish(elo: EloCalculator, session: Session) -> tuple[int, float]:
+    '''Write all ratings into a shadow table and swap it in.'''
+
+    for r in session.query(Rating):
+        elo._partition(r.version_code, r.matchup).add_values(r.name_hash, [getattr(r, key) for key in STATE_KEYS])
+    rows = session.query(Rating).count()
+    session.commit()
+
+    start = time.perf_counter()
+    shadow = elo._write_ratings()
+    elo._publish_shadow(shadow)
+    elo._set_meta('generation', value=str(elo._generation() + 1))
+    session.commit()
+    return rows, time.perf_counter() - start
+
+
+def _state(elo: EloCalculator, session: Session) -> tuple[int, float, float]:
+    '''Load all ratings into player states, returns rows, seconds and MiB held by the states.'''
+
+    rows = session.execute(select(Rating.version_code, Rating.matchup, Rating.name_hash,
+                                  *[getattr(Rating, key) for key in STATE_KEYS])).all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for version_code, matchup, name_hash, *values in rows:
+        elo._partition(version_code, matchup).add_values(name_hash, values)
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(rows), seconds, size / 1024 / 1024
+
+
+def run_scenario(scenario: str, db_path: str, games: int, workers: int) -> dict:
+    '''Run one benchmark, in a fresh process.'''
+
+    if scenario == 'incremental':
+        append(db_path, max(games // 100, 100))
+
+    rating_db_path = os.path.join(os.path.dirname(db_path), 'rating.sqlite3')
+    prepare_rating_db(db_path, rating_db_path)
+    engine = create_sqlite_engine(db_path, rating_db_path, echo=False, connect_args={'timeout': 60})
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    try:
+        elo = EloCalculator(
+            session,
+            snapshot_interval=cfg.getint('rating', 'snapshotinterval'),
+            snapshot_keep=cfg.getint('rating', 'snapshotkeep'),
+            workers=workers,
+            partitions=cfg.getint('rating', 'partitions'),
+            activity_days=cfg.getint('rating', 'activitydays')
+        )
+        duration_threshold = cfg.getint('rating', 'durationthreshold')
+        batch_size = cfg.getint('rating', 'batchsize')
+        if scenario in ('full', 'incremental'):
+            start = time.perf_counter()
+            rows = elo.update_ratings(duration_threshold, batch_size, full=scenario == 'full')
+            seconds = time.perf_counter() - start
+        elif scenario == 'writeback':
+            rows, seconds = _writeback(elo, session)
+        elif scenario == 'publish':
+            rows, seconds = _publish(elo, session)
+        else:
+            rows, seconds, state_mb = _state(elo, session)
+    finally:
+        session.close()
+        engine.dispose()
+
+    result = {'scenario': scenario, 'rows': rows, 'seconds': round(seconds, 3), 'peak_rss_mb': round(_peak_rss_mb(), 1)}
+    if scenario == 'state':
+        result['state_mb'] = round(state_mb, 1)
+    return result
+
+
+def bench_size(size: str, data_dir: str, workers: int, scenarios: list[str]) -> list[dict]:
+    '''Run the benchmarks on a copy of the synthetic database of a size.'''
+
+    games = SIZES[size]
+    base = os.path.join(data_dir, f'synthetic_{size}.sqlite3')
+    if not os.path.exists(base):
+        print(f"Generating {games} games into {base}")
+        generate(base, games)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'bench.sqlite3')
+        shutil.copyfile(base, db_path)
+        context = multiprocessing.get_context('spawn')
+        # Later benchmarks need the ratings of a full run
+        for scenario in [s for s in SCENARIOS if s in scenarios or s == 'full']:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_scenario, scenario, db_path, games, workers).result()
+            if scenario in scenarios:
+                results.append(result)
+                print(f"{size:<5} {scenario:<12} rows={result['rows']:<10} "
+                      f"{result['seconds']:9.2f}s  peak RSS {result['peak_rss_mb']:8.1f} MiB"
+                      + (f"  state {result['state_mb']:.1f} MiB" if 'state_mb' in result else ''))
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(BASELINE_DIR)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _cpu_model() -> str:
+    try:
+        with open('/proc/cpuinfo', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def compare(baseline_dir: str, size: str, results: list[dict]) -> None:
+    '''Print the change from the latest saved run of the same size, or the reference.'''
+
+    previous = sorted(glob.glob(os.path.join(baseline_dir, f'rating_{size}_[0-9]*.json')))
+    if not previous:
+        previous = glob.glob(os.path.join(baseline_dir, f'rating_{size}_reference.json'))
+    if not previous:
+        return
+    with open(previous[-1], 'r', encoding='utf-8') as f:
+        baseline = {r['scenario']: r for r in json.load(f)['results']}
+    print(f"Compared with {os.path.basename(previous[-1])}:")
+    for r in results:
+        old = baseline.get(r['scenario'])
+        if not old:
+            continue
+        time_ratio = r['seconds'] / old['seconds'] if old['seconds'] else 1
+        rss_ratio = r['peak_rss_mb'] / old['peak_rss_mb'] if old['peak_rss_mb'] else 1
+        ratios = [time_ratio, rss_ratio]
+        line = f"  {r['scenario']:<12} time x{time_ratio:.2f}  peak RSS x{rss_ratio:.2f}"
+        if old.get('state_mb') and 'state_mb' in r:
+            ratios.append(r['state_mb'] / old['state_mb'])
+            line += f"  state x{ratios[-1]:.2f}"
+        print(line + ('  REGRESSION' if max(ratios) > TOLERANCE else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the rating engine on synthetic databases.')
+    parser.add_argument('--sizes', nargs='+', choices=SIZES.keys(), default=['100k'])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--workers', type=int, default=cfg.getint('rating', 'workers'))
+    parser.add_argument('--data_dir', default=os.path.join(cfg.get('system', 'workdir'), 'bench'),
+                        help='Where synthetic databases are kept')
+    parser.add_argument('--baseline_dir', default=BASELINE_DIR)
+    parser.add_argument('--no_save', action='store_true', help="Don't save the results as a run")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.makedirs(args.baseline_dir, exist_ok=True)
+    print(f"CPUs: {os.cpu_count()}, workers: {args.workers or os.cpu_count()}")
+    for size in args.sizes:
+        results = bench_size(size, args.data_dir, args.workers, args.scenarios)
+        compare(args.baseline_dir, size, results)
+        if args.no_save:
+            continue
+
+        created = datetime.now()
+        path = os.path.join(args.baseline_dir, f"rating_{size}_{created.strftime('%Y%m%d%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': created.isoformat(timespec='seconds'),
+                'commit': _git_commit(),
+                'games': SIZES[size],
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu': _cpu_model(),
+                'cpus': os.cpu_count(),
+                'workers': args.workers,
+                'results': results
+            }, f, indent=2)
+            f.write('\n')
+        print(f"Saved {path}")
+
+
+if __name__ == '__main__':
+    main()
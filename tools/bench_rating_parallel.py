@@ -0,0 +1,81 @@
+'''Benchmark rating all games with different numbers of worker processes.
+
+The database is copied to a temporary file first, the original one is not
+touched. Ratings are written to a new rating database next to the copy.
+
+```bash
+python tools/bench_rating_parallel.py --db_path __workdir/db.sqlite3 --workers 1 2 4 8
+```
+
+The pool is off by default, `rating.workers = 1`. Each worker is a spawned
+interpreter that imports the engine and streams its partitions on its own
+connection, which costs a few seconds per run. On one core that is pure
+overhead: 20k synthetic games took 5.3s with 1 worker and 9.0s with 2. Turn
+it on only if this benchmark shows a speedup on the production machine:
+- several cores, and
+- full runs or rewinds rating more than `EloCalculator.PARALLEL_MIN_ROWS`
+  rows, and
+- rows spread over several large partitions, since the biggest partition
+  bounds the time.
+'''
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from sqlalchemy.orm import Session
+
+from mgxhub.config import cfg
+from mgxhub.db import create_sqlite_engine, prepare_rating_db
+from mgxhub.model.orm import Base
+from mgxhub.rating import EloCalculator
+
+
+def bench(db_path: str, workers: int, partitions: int, duration_threshold: int, batch_size: int) -> tuple[float, int]:
+    '''Rate all games, returns seconds used and number of games rated.'''
+
+    rating_db_path = os.path.join(os.path.dirname(db_path), 'rating.sqlite3')
+    prepare_rating_db(db_path, rating_db_path)
+    engine = create_sqlite_engine(db_path, rating_db_path, echo=False, connect_args={'timeout': 60})
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    try:
+        elo = EloCalculator(session, workers=workers, partitions=partitions)
+        elo.PARALLEL_MIN_ROWS = 0
+        start = time.perf_counter()
+        games = elo.update_ratings(duration_threshold, batch_size, full=True)
+        return time.perf_counter() - start, games
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel rating.')
+    parser.add_argument('--db_path', default=cfg.get('database', 'sqlite'), help='Path to SQLite database')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--partitions', type=int, default=0, help='Max tasks, 0 for one per partition')
+    parser.add_argument('--duration_threshold', type=int, default=cfg.getint('rating', 'durationthreshold'))
+    parser.add_argument('--batch_size', type=int, default=cfg.getint('rating', 'batchsize'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_copy = os.path.join(tmpdir, 'bench.sqlite3')
+        shutil.copyfile(args.db_path, db_copy)
+
+        baseline = None
+        print(f"CPUs: {os.cpu_count()}")
+        for workers in args.workers:
+            seconds, games = bench(db_copy, workers, args.partitions, args.duration_threshold, args.batch_size)
+            baseline = baseline or seconds
+            print(f"workers={workers:<3} games={games:<10} {seconds:8.2f}s  speedup x{baseline / seconds:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+'''Write a synthetic database of rated games, for benchmarks.
+
+Only `games`, `players` and the rating ledger are filled, with the columns
+the rating engine and the rating pages read. Distributions are rough but
+shaped like the real data:
+
+- player activity follows a power law, a few players play thousands of games
+  and most only a handful;
+- 1v1 and team games of 2v2 to 4v4, in a handful of versions;
+- some games are too short, single player or with AI, and are not rated;
+- games are spread over the years, more of them in later years.
+
+```bash
+python tools/gen_synthetic_db.py --db_path /tmp/synthetic.sqlite3 --games 1000000
+```
+'''
+
+import argparse
+import itertools
+import math
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from hashlib import md5
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from mgxhub.db.operation import rebuild_rating_ledger, update_rating_ledger
+from mgxhub.model.orm import Base, Game
+
+MATCHUPS = [('1v1', 1, 45), ('2v2', 2, 25), ('3v3', 3, 15), ('4v4', 4, 15)]
+VERSIONS = [('AOC10C', 55), ('AOFE', 15), ('AOC10', 10), ('UP15', 10), ('AOK', 5), ('DE', 5)]
+START = datetime(2015, 1, 1)
+YEARS = 9
+
+# Same text format as SQLAlchemy's DateTime on SQLite, compared as strings
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+GAME_COLUMNS = ('game_guid', 'created', 'modified', 'duration', 'include_ai', 'is_multiplayer', 'population',
+                'speed', 'matchup', 'map_name', 'map_size', 'version_code', 'victory_type', 'game_time', 'visibility')
+PLAYER_COLUMNS = ('game_guid', 'created', 'modified', 'slot', 'index_player', 'name', 'name_hash', 'type',
+                  'team', 'is_winner', 'is_main_operator', 'civ_id')
+
+
+class SyntheticHistory:
+    '''Random games with a fixed player pool, reproducible by `seed`.'''
+
+    def __init__(self, players: int, seed: int = 0, alpha: float = 1.0, offset: int = 20):
+        self._rnd = random.Random(seed)
+        self._seed = seed
+        self._players = players
+        # Zipf-Mandelbrot, the offset keeps the top players from playing most games
+        self._cum_weights = list(itertools.accumulate(1 / (i + offset) ** alpha for i in range(players)))
+        self._matchups = [m[:2] for m in MATCHUPS]
+        self._matchup_weights = [m[2] for m in MATCHUPS]
+        self._versions = [v[0] for v in VERSIONS]
+        self._version_weights = [v[1] for v in VERSIONS]
+        self._names = {}
+
+    def _player(self, i: int) -> tuple[str, str]:
+        if i not in self._names:
+            name = f'player{i}'
+            self._names[i] = (name, md5(name.encode()).hexdigest())
+        return self._names[i]
+
+    def _pick_players(self, n: int) -> list[int]:
+        picked = []
+        while len(picked) < n:
+            for i in self._rnd.choices(range(self._players), cum_weights=self._cum_weights, k=n - len(picked)):
+                if i not in picked:
+                    picked.append(i)
+        return picked
+
+    def rows(self, n: int, first: int, start: datetime, end: datetime):
+        '''Yield `(game_row, player_rows)` of `n` games between `start` and `end`.
+
+        Games are numbered from `first`, guids are unique per seed and number.
+        '''
+
+        span = (end - start).total_seconds()
+        rnd = self._rnd
+        for k in range(n):
+            # More games in later years, sqrt of uniform leans to the end
+            game_time = start + timedelta(seconds=span * math.sqrt((k + rnd.random()) / n))
+            created = game_time.strftime(TIME_FORMAT)
+            guid = md5(f'synthetic-{self._seed}-{first + k}'.encode()).hexdigest()
+            matchup, size = rnd.choices(self._matchups, weights=self._matchup_weights)[0]
+            duration = int(rnd.lognormvariate(math.log(35 * 60 * 1000), 0.5))
+            yield (
+                guid, created, created, duration, int(rnd.random() < 0.03), int(rnd.random() < 0.97), 200,
+                'Normal', matchup, 'Arabia', 'Medium',
+                rnd.choices(self._versions, weights=self._version_weights)[0],
+                'Conquest', created, 0
+            ), [
+                (guid, created, created, slot + 1, slot, *self._player(p), 'human',
+                 1 if slot < size else 2, int((slot < size) == winner_first), 1, rnd.randint(1, 18))
+                for winner_first in [rnd.random() < 0.5]
+                for slot, p in enumerate(self._pick_players(size * 2))
+            ]
+
+
+def _insert(conn: sqlite3.Connection, history: SyntheticHistory, games: int, first: int,
+            start: datetime, end: datetime, batch: int = 20000) -> None:
+    insert_game = f"INSERT INTO games ({', '.join(GAME_COLUMNS)}) VALUES ({', '.join('?' * len(GAME_COLUMNS))})"
+    insert_player = f"INSERT INTO players ({', '.join(PLAYER_COLUMNS)}) VALUES ({', '.join('?' * len(PLAYER_COLUMNS))})"
+    rows = history.rows(games, first, start, end)
+    while True:
+        chunk = list(itertools.islice(rows, batch))
+        if not chunk:
+            break
+        conn.executemany(insert_game, [g for g, _ in chunk])
+        conn.executemany(insert_player, [p for _, players in chunk for p in players])
+        conn.commit()
+
+
+def _fill_ledger(db_path: str, since: datetime | None = None) -> None:
+    '''Rows are inserted without `add_game()`, fill the rating ledger as it would.
+
+    Only games played at or after `since` are written if given, like ingest
+    does for new games.
+    '''
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        with Session(engine) as session:
+            if since is None:
+                rebuild_rating_ledger(session)
+                return
+            guids = session.execute(
+                select(Game.game_guid).where(Game.game_time >= since)
+            ).scalars().all()
+            for guid in guids:
+                update_rating_ledger(session, guid)
+            session.commit()
+    finally:
+        engine.dispose()
+
+
+def generate(db_path: str, games: int, players: int | None = None, seed: int = 0) -> None:
+    '''Create a new database with `games` synthetic games.
+
+    Args:
+        players: size of the player pool, a quarter of the games if None.
+    '''
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    try:
+        history = SyntheticHistory(players or max(games // 4, 100), seed)
+        _insert(conn, history, games, 0, START, START + timedelta(days=365 * YEARS))
+    finally:
+        conn.close()
+    _fill_ledger(db_path)
+
+
+def append(db_path: str, games: int, players: int | None = None, seed: int = 1) -> None:
+    '''Add `games` games after the last game of the database, like new uploads.'''
+
+    conn = sqlite3.connect(db_path)
+    try:
+        total, last = conn.execute('SELECT count(*), max(game_time) FROM games').fetchone()
+        start = datetime.strptime(last, TIME_FORMAT) + timedelta(seconds=1) if last else START
+        history = SyntheticHistory(players or max((total + games) // 4, 100), seed)
+        _insert(conn, history, games, total, start, start + timedelta(days=7))
+    finally:
+        conn.close()
+    _fill_ledger(db_path, start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic database of rated games.')
+    parser.add_argument('--db_path', required=True, help='Database to create, replaced if exists')
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--players', type=int, default=None, help='Player pool, a quarter of the games by default')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.db_path, args.games, args.players, args.seed)
+    print(f"{args.games} games written to {args.db_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+from webapi.lifespan import lifespan
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS
 app.add_middleware(
@@ -0,0 +1,116 @@
+'''Conditional requests, validated by generations of the data.'''
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from hashlib import md5
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from mgxhub.config import cfg
+from mgxhub.db import db_run
+from mgxhub.db.operation import get_generations
+from mgxhub.singleton import Singleton
+
+
+class Generations(metaclass=Singleton):
+    '''Generations of the data, see `get_generations()`.
+
+    Read at most every `database.generationcheck` seconds, changes of
+    other processes are noticed that late. Changes committed by this
+    process are read on the next request, see `bump_generation()`.
+    Validating a request between reads doesn't touch the database.
+    '''
+
+    def __init__(self, check_interval: float | None = None):
+        self._check_interval = cfg.getfloat('database', 'generationcheck') if check_interval is None else check_interval
+        self._lock = threading.Lock()
+        self._generations: dict[str, tuple[int, datetime | None]] = {}
+        self._checked: float | None = None
+
+    def stale(self) -> bool:
+        '''True if the generations need to be read again.'''
+
+        return self._checked is None or time.monotonic() - self._checked >= self._check_interval
+
+    def invalidate(self) -> None:
+        '''Read the generations again on the next `refresh()`.'''
+
+        self._checked = None
+
+    def refresh(self, session: Session) -> None:
+        '''Read the generations if stale.'''
+
+        with self._lock:
+            if not self.stale():
+                return  # Refreshed by another thread meanwhile
+            self._generations = get_generations(session)
+            self._checked = time.monotonic()
+
+    def validators(self, names: tuple[str, ...], extra: str = '') -> tuple[str, datetime | None]:
+        '''Weak ETag of data built from `names`, and the time it last changed.
+
+        A digest of `extra` goes into the ETag too, for responses also
+        changing with something else than the data, e.g. a request parameter.
+        '''
+
+        generations = [self._generations.get(name, (0, None)) for name in names]
+        changed = max((updated for _, updated in generations if updated), default=None)
+        tag = '.'.join(f"{name[0]}{value}" for name, (value, _) in zip(names, generations))
+        # The time tells apart generations of a recreated database
+        tag += f"-{int(changed.replace(tzinfo=timezone.utc).timestamp()) if changed else 0}"
+        if extra:
+            tag += f"-{md5(extra.encode('utf-8')).hexdigest()[:16]}"
+        return f'W/"{tag}"', changed
+
+
+@event.listens_for(Session, 'after_commit')
+def _generation_committed(session: Session) -> None:
+    if session.info.pop('generation_bumped', False):
+        Generations().invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _generation_rolled_back(session: Session) -> None:
+    session.info.pop('generation_bumped', None)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison, as for GET requests
+    tags = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+
+async def conditional(request: Request, *names: str, extra: str = '') -> tuple[dict, Response | None]:
+    '''Validate a request for data built from `names`, see `GENERATIONS`.
+
+    Example:
+    ```python
+    headers, not_modified = await conditional(request, 'games', 'players')
+    if not_modified:
+        return not_modified
+    ```
+
+    Returns:
+        Headers to send with the response (`ETag`, `Last-Modified`,
+        `Cache-Control`), and a 304 response if the client already has the
+        current one, else None.
+    '''
+
+    generations = Generations()
+    if generations.stale():
+        await db_run(generations.refresh)
+    etag, changed = generations.validators(names, extra)
+
+    # Caches may store responses but must revalidate them
+    headers = {'ETag': etag, 'Cache-Control': 'public, no-cache'}
+    if changed:
+        headers['Last-Modified'] = format_datetime(changed.replace(tzinfo=timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and _matches(if_none_match, etag):
+        return headers, Response(status_code=304, headers=headers)
+    return headers, None
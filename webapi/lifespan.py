@@ -0,0 +1,61 @@
+'''Background tasks of the web app, run by one worker process only.'''
+
+import fcntl
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from mgxhub import cfg, logger
+from mgxhub.db import db_raw, db_run
+from mgxhub.db.operation import backfill_tables, reconcile_counters_if_due
+from mgxhub.rating import RatingScheduler
+
+
+def reconcile_counters_daily() -> None:
+    '''Recount live counters once a day, apart from ingest and rating runs.'''
+
+    while True:
+        db = db_raw()
+        try:
+            reconcile_counters_if_due(db)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"Counters reconciliation error: {e}")
+        finally:
+            db.close()
+        time.sleep(3600)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    '''Start background tasks in the worker holding `system.startuplock`.
+
+    Other workers only serve requests. The lock goes away with the process
+    holding it, the next worker started takes over. Nothing is started on
+    import, nor by test clients not entering the lifespan.
+    '''
+
+    lock = open(cfg.get('system', 'startuplock'), 'a', encoding='ascii')  # pylint: disable=consider-using-with
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        yield
+        return
+
+    logger.info("[Startup] Running background tasks in this worker")
+    try:
+        # Derived tables of databases older than them, before ratings are run
+        await db_run(backfill_tables)
+
+        # Reconcile counters when due, checked hourly
+        threading.Thread(target=reconcile_counters_daily, name='mgxhub_counters', daemon=True).start()
+
+        # Start the rating worker process now, so the first run after an upload is warm
+        RatingScheduler().start()
+        yield
+    finally:
+        RatingScheduler().shutdown()
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
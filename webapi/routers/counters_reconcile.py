@@ -0,0 +1,29 @@
+'''Recount live counters from the games and players tables'''
+
+from fastapi import BackgroundTasks
+from fastapi.responses import JSONResponse
+
+from mgxhub.db import db_raw
+from mgxhub.db.operation import reconcile_counters
+from webapi.admin_api import admin_api
+
+
+def _reconcile() -> None:
+    db = db_raw()
+    try:
+        reconcile_counters(db)
+    finally:
+        db.close()
+
+
+@admin_api.get("/system/counters/reconcile", tags=['system'])
+async def reconcile_live_counters(background_tasks: BackgroundTasks) -> dict:
+    '''Recount live counters of games, players and option values.
+
+    Fixes drift of the counters. Also done daily by the web app, see `main.py`.
+
+    Defined in: `webapi/routers/counters_reconcile.py`
+    '''
+
+    background_tasks.add_task(_reconcile)
+    return JSONResponse(status_code=202, content="Counters reconciliation started")
@@ -5,7 +5,15 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from mgxhub import logger
+from mgxhub.cacher import Cacher
 from mgxhub.db import db_dep
+from mgxhub.db.operation import (FACETS, bump_generation, count_game_facets,
+                                 count_game_total, coplay_members,
+                                 invalidate_game_document,
+                                 mark_rating_dirty, rating_eligible,
+                                 remove_coplay_edges, uncount_gone_players,
+                                 update_rating_ledger)
+from mgxhub.graph import CoPlayGraph
 from mgxhub.model.orm import Chat, File, Game, LegacyInfo, Player
 from webapi.admin_api import admin_api
 
@@ -21,12 +29,27 @@ async def delete_game(guid: str, db: Session = Depends(db_dep)) -> dict:
 
     game = db.query(Game).filter(Game.game_guid == guid).first()
     if game:
+        members = coplay_members(db.query(Player).filter(Player.game_guid == guid).all())
+        remove_coplay_edges(db, members)
+        count_game_facets(db, {column: getattr(game, column) for column in FACETS}, -1)
+        if game.created:
+            count_game_total(db, game.created, -1)
         db.query(Player).filter(Player.game_guid == guid).delete()
+        uncount_gone_players(db, {h for h, _, _ in members})
         db.query(Chat).filter(Chat.game_guid == guid).delete()
         db.query(File).filter(File.game_guid == guid).delete()
         db.query(LegacyInfo).filter(LegacyInfo.game_guid == guid).delete()
+        invalidate_game_document(db, guid)
+        if rating_eligible(game) and game.game_time:
+            mark_rating_dirty(db, game.game_time)
         db.delete(game)
+        update_rating_ledger(db, guid)
+        Cacher(db).invalidate('games', 'players')
+        bump_generation(db, 'games', 'players')
         db.commit()
+        graph = CoPlayGraph()
+        if graph.loaded:
+            graph.refresh(db, force=True)
         logger.info(f"[DB] Delete: {guid}")
         return JSONResponse(status_code=200, content={"detail": f"Game [{guid}] deleted"})
 
@@ -1,43 +1,37 @@
 '''Get details for a game by its GUID.'''
 
-from fastapi import Depends, HTTPException
-from sqlalchemy import asc
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, Request, Response
 
-from mgxhub import logger
-from mgxhub.db import db_dep
-from mgxhub.model.orm import Chat, File, Game, Player
+from mgxhub.db import db_run
+from mgxhub.db.operation import get_game_document
 from mgxhub.model.webapi import GameDetail
 from webapi import app
+from webapi.conditional import conditional
 
 
-@app.get("/game/detail", tags=['game'])
-async def get_game(guid: str, lang: str = 'en', db: Session = Depends(db_dep)) -> GameDetail | None:
+@app.get("/game/detail", tags=['game'], response_model=GameDetail)
+async def get_game(guid: str, request: Request, lang: str = 'en') -> Response:
     '''Get details for a game by its GUID
 
+    The document is built once per game and language, then served as
+    stored until the game is updated, deleted or its visibility changes.
+    Answers 304 to clients having the document of the current games
+    generation, see `conditional()`. The ETag names the game, a matching
+    one was served for it, and it can't be gone without a new generation.
+    ETags aren't sent with 404s.
+
     - **guid**: GUID of the game.
     - **lang**: Language code. Default is 'en'.
 
     Defined in: `webapi/routers/game_detail.py`
     '''
 
-    game_basic = db.query(Game).filter(Game.game_guid == guid).first()
-    if game_basic is None:
-        raise HTTPException(status_code=404, detail=f"Game profile [{guid}] not found")
-
-    player_data = db.query(Player).filter(Player.game_guid == guid).all()
-    file_data = db.query(File).filter(File.game_guid == guid).limit(20).all()
-    chat_data = db.query(Chat.chat_time, Chat.chat_content)\
-        .filter(Chat.game_guid == guid)\
-        .group_by(Chat.chat_time, Chat.chat_content)\
-        .order_by(asc(Chat.chat_time))\
-        .all()
+    headers, not_modified = await conditional(request, 'games', extra=f"{guid}.{lang}")
+    if not_modified:
+        return not_modified
 
-    details = GameDetail(game_basic, player_data, file_data, chat_data, lang)
-
-    if details:
-        return details
+    body = await db_run(get_game_document, guid, lang)
+    if body is None:
+        raise HTTPException(status_code=404, detail=f"Game profile [{guid}] not found")
 
-    error_msg = f"Failed to fetch game profile: {guid}"
-    logger.error(error_msg)
-    raise HTTPException(status_code=500, detail=error_msg)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,43 +1,63 @@
 '''Fetch random games'''
 
+import random
+from array import array
 from datetime import datetime
 
-from fastapi import Depends, Query
-from sqlalchemy import func
+from fastapi import Query
 from sqlalchemy.orm import Session
 
-from mgxhub.db import db_dep
+from mgxhub.db import db_raw, db_run
 from mgxhub.model.orm import Game
+from mgxhub.sampler import PoolCache
 from webapi import app
 
-# pylint: disable=E1102
+
+def _load_game_ids(threshold: int) -> array:
+    '''Ids of games longer than `threshold` minutes.'''
+
+    db = db_raw()
+    try:
+        result = db.query(Game.id).filter(Game.duration > threshold * 60).yield_per(100000)
+        return array('q', (row[0] for row in result))
+    finally:
+        db.close()
+
+
+# Candidate game ids, keyed by duration threshold in minutes
+GAME_POOLS = PoolCache(_load_game_ids, size=8)
+
+
+def _sample_games(db: Session, threshold: int, limit: int) -> list:
+    ids = GAME_POOLS.get(threshold).sample(limit)
+
+    result = db.query(
+        Game.game_guid, Game.version_code,
+        Game.created, Game.map_name, Game.matchup,
+        Game.duration, Game.speed
+    ).filter(
+        Game.id.in_(ids)
+    ).all()
+
+    games = [list(row) for row in result]
+    random.shuffle(games)
+    return games
 
 
 @app.get("/game/random", tags=['game'])
 async def fetch_rand_games(
     threshold: int = Query(10, gt=0),
-    limit: int = Query(50, gt=0),
-    db: Session = Depends(db_dep)
+    limit: int = Query(50, ge=1, le=1000)
 ) -> dict:
     '''Fetch random games
 
     - **threshold**: Minimum duration of the game, in minutes. Default is 10.
-    - **limit**: Maximum number of games to fetch. Default is 50.
+    - **limit**: Maximum number of games to fetch. Default is 50, max is 1000.
 
     Defined in: `webapi/routers/game_random.py`
     '''
 
-    result = db.query(
-        Game.game_guid, Game.version_code,
-        Game.created, Game.map_name, Game.matchup,
-        Game.duration, Game.speed
-    ).filter(
-        Game.duration > threshold * 60
-    ).order_by(
-        func.random()
-    ).limit(limit).all()
-
-    games = [list(row) for row in result]
+    games = await db_run(_sample_games, threshold, limit)
     current_time = datetime.now().isoformat()
 
     return {'games': games, 'generated_at': current_time}
@@ -1,11 +1,10 @@
 '''Search games by some criteria'''
 
 
-from fastapi import Body, Depends
-from sqlalchemy.orm import Session
+from fastapi import Body
 
 from mgxhub import logger
-from mgxhub.db import db_dep
+from mgxhub.db import db_run
 from mgxhub.db.operation import search_games as search_games_in_db
 from mgxhub.model.searchcriteria import SearchCriteria
 from webapi import app
@@ -14,7 +13,6 @@ from webapi import app
 @app.post("/game/search", tags=['game'])
 async def search_games(
     criteria: SearchCriteria = Body(...),
-    session: Session = Depends(db_dep),
     lang: str = 'en'
 ) -> dict:
     '''Search games by some criteria
@@ -30,6 +28,6 @@ async def search_games(
 
     logger.info(criteria.model_dump())
 
-    result = search_games_in_db(session, criteria, lang)
+    result = await db_run(search_games_in_db, criteria, lang)
 
     return result
@@ -5,6 +5,7 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from mgxhub.db import db_dep
+from mgxhub.db.operation import bump_generation, invalidate_game_document
 from mgxhub.model.orm import Game
 from webapi.admin_api import admin_api
 
@@ -25,6 +26,8 @@ async def set_game_visibility(guid: str, lv: int = 0, db: Session = Depends(db_d
     game = db.query(Game).filter(Game.game_guid == guid).first()
     if game:
         game.visibility = lv
+        invalidate_game_document(db, guid)
+        bump_generation(db, 'games')
         db.commit()
         return JSONResponse(status_code=200, content={"detail": f"Game [{guid}] visibility set to {lv}"})
 
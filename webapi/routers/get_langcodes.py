@@ -1,8 +1,6 @@
 '''Get available language codes'''
 
-import os
-
-from mgxhub import cfg
+from mgxhub.translator import Translator
 from webapi import app
 
 
@@ -13,10 +11,4 @@ async def get_langcodes() -> dict[str, list]:
     Defined in: `webapi/routers/get_langcodes.py`
     '''
 
-    # Scan `translations/en/LC_MESSAGES/` directory for .mo files to get available language codes
-    lang_codes = []
-    for file in os.listdir(cfg.get('system', 'langdir')):
-        if file.endswith('.mo'):
-            lang_codes.append(file[:-3])
-
-    return {"lang_codes": lang_codes}
+    return {"lang_codes": Translator().langs}
@@ -1,10 +1,8 @@
 '''Fetch active players. The simple version.'''
 
 
-from fastapi import Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import Query
 
-from mgxhub.db import db_dep
 from mgxhub.db.operation import get_active_players_async
 from webapi import app
 
@@ -12,8 +10,7 @@ from webapi import app
 @app.get("/player/active", tags=['player'])
 async def get_active_players(
     limit: int = Query(20, ge=1),
-    days: int = Query(30, ge=0),
-    db: Session = Depends(db_dep)
+    days: int = Query(30, ge=0)
 ) -> dict:
     '''Fetch active players.
 
@@ -26,6 +23,6 @@ async def get_active_players(
     Defined in: `webapi/routers/player_active.py`
     '''
 
-    result = await get_active_players_async(db, limit, days)
+    result = await get_active_players_async(limit, days)
 
     return result
@@ -2,10 +2,9 @@
 
 from datetime import datetime
 
-from fastapi import Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import Query
 
-from mgxhub.db import db_dep
+from mgxhub.db import db_run
 from mgxhub.db.operation import get_close_friends as get_close_friends_in_db
 from webapi import app
 
@@ -13,8 +12,7 @@ from webapi import app
 @app.get("/player/friends", tags=['player'])
 async def get_close_friends(
     player_hash: str,
-    limit: int = Query(100, gt=0),
-    db: Session = Depends(db_dep)
+    limit: int = Query(100, gt=0)
 ) -> dict:
     '''Players who played with the given player most.
 
@@ -25,7 +23,7 @@ async def get_close_friends(
     Defined in: `webapi/routers/player_friends.py`
     '''
 
-    players = get_close_friends_in_db(db, player_hash, limit)
+    players = await db_run(get_close_friends_in_db, player_hash, limit)
     current_time = datetime.now().isoformat()
 
     return {'players': players, 'generated_at': current_time}
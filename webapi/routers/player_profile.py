@@ -2,19 +2,20 @@
 
 import asyncio
 
-from fastapi import Depends, Query
+from fastapi import Query, Request, Response
 from sqlalchemy.orm import Session
 
-from mgxhub.db import db_dep
+from mgxhub.db import db_run
 from mgxhub.db.operation import (async_get_close_friends,
                                  async_get_player_rating_stats,
                                  async_get_player_recent_games,
                                  async_get_player_totals)
 from mgxhub.model.orm import Player
 from webapi import app
+from webapi.conditional import conditional
 
 
-async def hash2name(db: Session, player_hash: str) -> str:
+def hash2name(db: Session, player_hash: str) -> str:
     '''Convert player hash to name'''
     found = db.query(Player.name).filter(Player.name_hash == player_hash).first()
     return found[0] if found else None
@@ -23,27 +24,39 @@ async def hash2name(db: Session, player_hash: str) -> str:
 @app.get("/player/profile", tags=['player'])
 async def get_player_comprehensive(
     player_hash: str,
+    request: Request,
+    response: Response,
     recent_limit: int = Query(50, gt=0),
     friend_limit: int = Query(50, gt=0),
-    lang: str = 'en',
-    db: Session = Depends(db_dep)
+    lang: str = 'en'
 ) -> dict:
     '''Fetch comprehensive information of a player
 
+    The queries run concurrently, each with its own session. Answers 304
+    to clients having the profile of the current generations, see
+    `conditional()`.
+
     Args:
         player_hash: MD5 hash of the player's name.
         recent_limit: Maximum number of recent games to be included.
         friend_limit: Maximum number of close friends to be included.
+        lang: Language of map names in recent games.
 
     Defined in: `webapi/routers/player_profile.py`
     '''
 
+    headers, not_modified = await conditional(
+        request, 'games', 'players', 'ratings', extra=f"{player_hash}.{recent_limit}.{friend_limit}.{lang}")
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+
     result = await asyncio.gather(
-        async_get_player_totals(db, player_hash),
-        async_get_player_rating_stats(db, player_hash),
-        async_get_player_recent_games(db, player_hash, recent_limit, 0, lang),
-        async_get_close_friends(db, player_hash, friend_limit),
-        hash2name(db, player_hash)
+        async_get_player_totals(player_hash),
+        async_get_player_rating_stats(player_hash),
+        async_get_player_recent_games(player_hash, recent_limit, 0, lang),
+        async_get_close_friends(player_hash, friend_limit),
+        db_run(hash2name, player_hash)
     )
 
     return {
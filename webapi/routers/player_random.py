@@ -3,74 +3,61 @@
 from datetime import datetime
 from hashlib import md5
 
-from fastapi import BackgroundTasks, Query
-from sqlalchemy import func, select, text
+from fastapi import Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
 
 from mgxhub.db import db_raw
 from mgxhub.model.orm import Player
+from mgxhub.sampler import PoolCache
 from webapi import app
 
 # pylint: disable=not-callable
 
-RANDOM_CACHE = {"cached": None, "lock": False}
 
-
-def _get_rand_players(threshold: int, limit: int) -> None:
-    '''Fetch random players and their game counts
-
-    Including total games of each player. Used mainly in player cloud.
+def _load_players(threshold: int) -> list:
+    '''Players with more than `threshold` games and their game counts.
 
     Args:
         threshold: minimum games of a player to be included.
-        limit: maximum number of players to be included. Max is 1000.
 
     Returns:
-        A list of players and their game counts.
+        A list of [name, name_hash, game_count].
 
     Defined in: `webapi/routers/player_random.py`
     '''
 
-    if RANDOM_CACHE['lock']:
-        return
-
-    RANDOM_CACHE['lock'] = True
-
-    subquery = select(
-        Player.name,
-        func.count(Player.game_guid).label('game_count')
-    ).group_by(
-        Player.name
-    ).having(
-        text("game_count > :threshold")
-    ).params(
-        threshold=threshold
-    ).subquery()
-
     session = db_raw()
-    query = session.query(
-        subquery.c.name,
-        subquery.c.game_count
-    ).order_by(
-        func.random()
-    ).limit(limit)
-
-    result = query.all()
-
-    players = [[
+    try:
+        result = session.query(
+            Player.name,
+            func.count(Player.game_guid).label('game_count')
+        ).group_by(
+            Player.name
+        ).having(
+            func.count(Player.game_guid) > threshold
+        ).all()
+    finally:
+        session.close()
+
+    return [[
         row.name,
         md5(str(row.name).encode('utf-8')).hexdigest(),
         row.game_count
     ] for row in result]
 
-    session.close()
 
-    RANDOM_CACHE['cached'] = players
-    RANDOM_CACHE['lock'] = False
+# Candidate players, keyed by the minimum games threshold
+PLAYER_POOLS = PoolCache(_load_players, size=8)
+
+
+def _sample_players(threshold: int, limit: int) -> list:
+    # Run in a thread, the first load of a pool groups all players
+    return PLAYER_POOLS.get(threshold).sample(limit)
 
 
 @app.get("/player/random", tags=['player'])
 async def get_rand_players(
-    background_tasks: BackgroundTasks,
     threshold: int = Query(10, gt=0),
     limit: int = Query(300, gt=0)
 ) -> dict:
@@ -88,16 +75,9 @@ async def get_rand_players(
     Defined in: `webapi/routers/player_random.py`
     '''
 
-    current_time = datetime.now().isoformat()
-    if RANDOM_CACHE['cached']:
-        background_tasks.add_task(_get_rand_players, threshold, limit)
-        return {
-            'players': RANDOM_CACHE['cached'],
-            'generated_at': current_time
-        }
+    players = await run_in_threadpool(_sample_players, threshold, min(limit, 1000))
 
-    _get_rand_players(threshold, limit)
     return {
-        'players': RANDOM_CACHE['cached'],
-        'generated_at': current_time
+        'players': players,
+        'generated_at': datetime.now().isoformat()
     }
@@ -2,10 +2,9 @@
 
 from datetime import datetime
 
-from fastapi import Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import Query
 
-from mgxhub.db import db_dep
+from mgxhub.db import db_run
 from mgxhub.db.operation import get_player_recent_games
 from webapi import app
 
@@ -15,8 +14,7 @@ async def get_player_games(
     player_hash: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1),
-    lang: str = 'en',
-    db: Session = Depends(db_dep)
+    lang: str = 'en'
 ) -> dict:
     '''Get recent games of a player
 
@@ -28,7 +26,7 @@ async def get_player_games(
     Defined in: `webapi/routers/player_recent_game.py`
     '''
 
-    games = get_player_recent_games(db, player_hash, page_size, (page - 1) * page_size, lang)
+    games = await db_run(get_player_recent_games, player_hash, page_size, (page - 1) * page_size, lang)
 
     current_time = datetime.now().isoformat()
 
@@ -2,10 +2,9 @@
 
 from datetime import datetime
 
-from fastapi import Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import Query
 
-from mgxhub.db import db_dep
+from mgxhub.db import db_run
 from mgxhub.db.operation import search_players_by_name
 from webapi import app
 
@@ -16,8 +15,7 @@ async def search_player_by_name(
     stype: str = 'std',
     orderby: str = 'nad',
     page: int = Query(1, ge=1),
-    page_size: int = Query(100, ge=1),
-    db: Session = Depends(db_dep)
+    page_size: int = Query(100, ge=1)
 ) -> dict:
     '''Search player by name
 
@@ -31,7 +29,7 @@ async def search_player_by_name(
     Defined in: `webapi/routers/player_searchname.py`
     '''
 
-    result = search_players_by_name(db, player_name, stype, orderby, page, page_size)
+    result = await db_run(search_players_by_name, player_name, stype, orderby, page, page_size)
     current_time = datetime.now().isoformat()
 
     return {'players': result, 'generated_at': current_time}
@@ -0,0 +1,38 @@
+'''Find the shortest co-play path between two players'''
+
+from datetime import datetime
+
+from fastapi import Query
+
+from mgxhub.db import db_run
+from mgxhub.db.operation import get_coplay_path
+from webapi import app
+
+
+@app.get("/player/separation", tags=['player'])
+async def get_degrees_of_separation(
+    player_hash: str,
+    target_hash: str,
+    max_depth: int = Query(6, ge=1, le=10)
+) -> dict:
+    '''Degrees of separation between two players.
+
+    Two players are connected if they played in a same game.
+
+    Args:
+        player_hash: MD5 hash of the first player's name.
+        target_hash: MD5 hash of the second player's name.
+        max_depth: maximum degrees of separation to search.
+
+    Returns:
+        - **path**: [[name, name_hash], ...] from the first player to the
+          second one. Empty if they are not connected within `max_depth`.
+        - **degrees**: length of the path, -1 if not connected.
+
+    Defined in: `webapi/routers/player_separation.py`
+    '''
+
+    path = await db_run(get_coplay_path, player_hash.lower(), target_hash.lower(), max_depth)
+    current_time = datetime.now().isoformat()
+
+    return {'path': path, 'degrees': len(path) - 1 if path else -1, 'generated_at': current_time}
@@ -0,0 +1,31 @@
+'''Get the rating curve of a player'''
+
+from datetime import datetime
+
+from fastapi import Query
+
+from mgxhub.db import db_run
+from mgxhub.db.operation import get_rating_history
+from webapi import app
+
+
+@app.get("/rating/history", tags=['rating'])
+async def player_rating_history(
+    player_hash: str,
+    version_code: str = 'AOC10',
+    matchup: str = 'team',
+    points: int = Query(300, ge=2, le=5000)
+) -> dict:
+    '''Fetch the rating curve of a player
+
+    The curve has at most `points` points, one per day at most, each a pair
+    of date and the rating after the last game of that day. At least 2 and
+    at most 5000 points can be asked for.
+
+    Defined in: `webapi/routers/rating_history.py`
+    '''
+
+    history = await db_run(get_rating_history, player_hash.lower(), version_code, matchup, points)
+    current_time = datetime.now().isoformat()
+
+    return {'history': history, 'generated_at': current_time}
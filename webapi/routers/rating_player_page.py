@@ -2,10 +2,7 @@
 
 from datetime import datetime
 
-from fastapi import Depends
-from sqlalchemy.orm import Session
-
-from mgxhub.db import db_dep
+from mgxhub.db import db_run
 from mgxhub.db.operation import get_player_rating_table
 from webapi import app
 
@@ -16,8 +13,7 @@ async def player_rating_page(
     version_code: str = 'AOC10',
     matchup: str = 'team',
     order: str = 'desc',
-    page_size: int = 100,
-    db: Session = Depends(db_dep)
+    page_size: int = 100
 ) -> dict:
     '''Fetch rating of a player
 
@@ -37,7 +33,7 @@ async def player_rating_page(
     Defined in: `webapi/routers/rating_player_page.py`
     '''
 
-    ratingpage = get_player_rating_table(db, player_hash, version_code, matchup, order, page_size)
+    ratingpage = await db_run(get_player_rating_table, player_hash, version_code, matchup, order, page_size)
     current_time = datetime.now().isoformat()
 
     return {'ratings': ratingpage[0], 'total': ratingpage[1], 'generated_at': current_time}
@@ -0,0 +1,40 @@
+'''Predict the winner of a game from the published ratings'''
+
+from fastapi import HTTPException, Query
+
+from mgxhub.db import db_run
+from mgxhub.rating import RatingIndex
+from webapi import app
+
+
+@app.get("/rating/predict", tags=['rating'])
+async def predict_game(
+        team1: list[str] = Query(..., description="Name hashes of the players of team 1"),
+        team2: list[str] = Query(..., description="Name hashes of the players of team 2"),
+        version_code: str = 'AOC10',
+        matchup: str = 'team'
+) -> dict:
+    '''Win probabilities of two teams, with the formula of the rating engine.
+
+    Ratings are looked up in memory, see `RatingIndex`. Players not rated
+    in the partition count with the initial rating. Matchups other than
+    `1v1` are team games, as in the rating table. Unknown partitions are a
+    400 error.
+
+    Keys:
+        - **teams**: one per team, `ratings` of its players (null if not
+          rated), team `rating` and `win_probability`.
+        - **generation**: generation of the ratings used.
+
+    Defined in: `webapi/routers/rating_predict.py`
+    '''
+
+    index = RatingIndex()
+    if index.stale():
+        await db_run(index.refresh)
+    try:
+        teams = index.predict(version_code, matchup, [team1, team2])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    return {'teams': teams, 'generation': index.generation}
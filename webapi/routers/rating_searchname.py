@@ -1,24 +1,39 @@
 '''Search player names by keyword in ratings table'''
 
-from fastapi import Depends, Query
+from fastapi import Query
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from mgxhub.db import db_dep
+from mgxhub.db import db_run
 from mgxhub.model.orm import Rating
 from webapi import app
 
 # pylint: disable=not-callable
 
 
+def _search_names(session: Session, keyword: str, version_code: str, matchup: str, page: int, page_size: int) -> list:
+    names = session.query(
+        Rating.name,
+        Rating.name_hash,
+        Rating.rating
+    ).filter(
+        Rating.version_code == version_code.upper(),
+        Rating.matchup == matchup.lower(),
+        Rating.name.like(f"%{keyword}%")
+    ).distinct().order_by(
+        func.length(Rating.name)
+    ).offset((page-1)*page_size).limit(page_size).all()
+
+    return [(name[0], name[1], name[2]) for name in names]
+
+
 @app.get("/rating/searchname", tags=['rating'])
 async def get_player_name_by_hash(
         keyword: str,
         version_code: str = 'AOC10',
         matchup: str = 'team',
         page: int = Query(1, ge=1),
-        page_size: int = Query(1, ge=1),
-        session: Session = Depends(db_dep)
+        page_size: int = Query(1, ge=1)
 ) -> dict:
     '''Search player names by keyword in ratings table.
 
@@ -31,16 +46,6 @@ async def get_player_name_by_hash(
     Defined in: `webapi/routers/rating_searchname.py`
     '''
 
-    names = session.query(
-        Rating.name,
-        Rating.name_hash,
-        Rating.rating
-    ).filter(
-        Rating.version_code == version_code.upper(),
-        Rating.matchup == matchup.lower(),
-        Rating.name.like(f"%{keyword}%")
-    ).distinct().order_by(
-        func.length(Rating.name)
-    ).offset((page-1)*page_size).limit(page_size).all()
+    names = await db_run(_search_names, keyword, version_code, matchup, page, page_size)
 
-    return {'names': [(name[0], name[1], name[2]) for name in names]}
+    return {'names': names}
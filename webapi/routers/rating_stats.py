@@ -3,32 +3,32 @@
 import json
 from datetime import datetime
 
-from fastapi import Depends, Response
+from fastapi import Response
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
 
-from mgxhub.cacher import Cacher
-from mgxhub.db import db_dep
+from mgxhub.cacher import cached_call
+from mgxhub.db import db_run
 from mgxhub.db.operation import get_rating_stats
 from webapi import app
 
 
+async def _rating_stats() -> str:
+    current_time = datetime.now().isoformat()
+    return json.dumps(jsonable_encoder({'stats': await db_run(get_rating_stats), 'generated_at': current_time}))
+
+
 @app.get("/rating/stats", tags=['rating'])
-async def get_rating_meta(db: Session = Depends(db_dep)) -> str:
+async def get_rating_meta() -> str:
     '''Get rating statistics of different versions.
 
     Used in ratings page to show the number of rating records for each version.
+    Computed once for concurrent requests, see `cached_call()`.
 
     Defined in: `webapi/routers/rating_stats.py`
     '''
 
-    cacher = Cacher(db)
-    cached = cacher.get('rating_stats')
+    result, cached = await cached_call('rating_stats', _rating_stats, tags=['ratings'])
     if cached:
-        return Response(content=cached, media_type="application/json", headers={"X-From-Cache": "true"})
-
-    current_time = datetime.now().isoformat()
-    result = json.dumps(jsonable_encoder({'stats': get_rating_stats(db), 'generated_at': current_time}))
-    cacher.set('rating_stats', result)
+        return Response(content=result, media_type="application/json", headers={"X-From-Cache": "true"})
 
     return Response(content=result, media_type="application/json")
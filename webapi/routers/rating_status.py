@@ -1,6 +1,8 @@
 '''Get status of the rating calculation process'''
 
-from mgxhub.rating import RatingLock
+from mgxhub.db import db_run
+from mgxhub.db.operation import get_rating_generation
+from mgxhub.rating import RatingScheduler
 from webapi import app
 
 
@@ -8,14 +10,15 @@ from webapi import app
 async def get_rating_status() -> dict:
     '''Get status of the rating calculation process
 
+    - **running**, **pid**, **started**, **elapsed**: the current run and the
+      worker process.
+    - **queued**: the next run, when it's due and if it rates all games.
+    - **last_run**: start, finish, games rated and error of the last run.
+    - **generation**: generation of the published ratings.
+
     Defined in: `webapi/routers/rating_status.py`
     '''
 
-    lock = RatingLock()
-
-    return {
-        "running": lock.rating_running(),
-        "pid": lock.pid,
-        "started": lock.started_time,
-        "elapsed": lock.time_elapsed
-    }
+    status = RatingScheduler().status()
+    status['generation'] = await db_run(get_rating_generation)
+    return status
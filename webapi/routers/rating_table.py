@@ -1,35 +1,54 @@
 '''Rating table router'''
 
-from datetime import datetime
+from datetime import date, datetime
 
-from fastapi import Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, Query, Request, Response
 
-from mgxhub.db import db_dep
+from mgxhub.db import db_run
 from mgxhub.db.operation import get_rating_table as get_ratings
 from webapi import app
+from webapi.conditional import conditional
 
 
 @app.get("/rating/table", tags=['rating'])
 async def get_rating_table(
+    request: Request,
+    response: Response,
     version_code: str = 'AOC10',
     matchup: str = 'team',
     order: str = 'desc',
     page: int = Query(0, ge=0),
     page_size: int = Query(100, ge=1),
-    db: Session = Depends(db_dep)
+    window: int | None = Query(None, ge=1)
 ) -> dict:
     '''Fetch rating table
 
+    With `window`, only players who played rated games in the last `window`
+    days, up to `rating.activitydays`, with their games and wins of these
+    days appended to each row.
+
+    Answers 304 to clients having the table of the current ratings
+    generation (and day, with `window`), see `conditional()`.
+
     Keys:
         - **ratings**: [index, name, name_hash, rating, total, wins, streak,
-                        streak_max, highest, lowest, first_played, last_played]
+                        streak_max, highest, lowest, first_played, last_played
+                        (, window_games, window_wins)]
         - **total**: Total number of ratings.
 
     Defined in: `mgxhub/db/operation/get_rating_table.py`
     '''
 
-    result = get_ratings(db, version_code, matchup, order, page, page_size)
+    # Windows move with the day
+    headers, not_modified = await conditional(request, 'ratings', extra=date.today().isoformat() if window else '')
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+
+    try:
+        result = await db_run(get_ratings, version_code, matchup, order, page, page_size, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
     current_time = datetime.now().isoformat()
 
     return {'ratings': result[0], 'total': result[1], 'generated_at': current_time}
@@ -1,21 +1,22 @@
-'''Unlock rating lock or stop rating calculation by force'''
+'''Cancel the queued rating calculation or stop the running one by force'''
 
 from fastapi.responses import JSONResponse
 
-from mgxhub.rating import RatingLock
+from mgxhub.rating import RatingScheduler
 from webapi.admin_api import admin_api
 
 
 @admin_api.get("/rating/unlock", tags=['rating'])
 async def unlock_rating(force: bool = False) -> dict:
-    '''Unlock rating lock or stop rating calculation by force
+    '''Cancel the queued rating calculation, and the running one if `force`
 
     Defined in: `webapi/routers/rating_unlock.py`
     '''
 
-    lock = RatingLock()
-    lock.unlock(force)
-    if lock.lock_file_exists():
-        return JSONResponse(status_code=409, content="Failed to unlock")
+    scheduler = RatingScheduler()
+    if scheduler.cancel(force):
+        return JSONResponse(status_code=202, content="Rating calculation stopped")
+    if scheduler.running:
+        return JSONResponse(status_code=409, content="Rating calculation is running, use force to stop it")
 
     return JSONResponse(status_code=202, content="Unlocked")
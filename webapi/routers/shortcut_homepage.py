@@ -3,25 +3,27 @@
 import asyncio
 import json
 
-from fastapi import Depends, Query, Response
+from fastapi import Query, Request, Response
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
 
-from mgxhub.cacher import Cacher
-from mgxhub.db import db_dep
+from mgxhub.cacher import cached_call
 from mgxhub.db.operation import (fetch_latest_games_async,
                                  get_active_players_async,
                                  get_total_stats_raw_async)
 from webapi import app
+from webapi.conditional import conditional
 
 
-async def gen_homepage_data(db: Session, glimit: int = 5, plimit: int = 30, pdays: int = 30) -> str:
-    '''Generate homepage data of aocrec.com'''
+async def gen_homepage_data(glimit: int = 5, plimit: int = 30, pdays: int = 30) -> str:
+    '''Generate homepage data of aocrec.com
+
+    The queries run concurrently, each with its own session.
+    '''
 
     results = await asyncio.gather(
-        fetch_latest_games_async(db, glimit),
-        get_active_players_async(db, plimit, pdays),
-        get_total_stats_raw_async(db)
+        fetch_latest_games_async(glimit),
+        get_active_players_async(plimit, pdays),
+        get_total_stats_raw_async()
     )
 
     return json.dumps(jsonable_encoder({
@@ -33,24 +35,30 @@ async def gen_homepage_data(db: Session, glimit: int = 5, plimit: int = 30, pday
 
 @app.get("/shortcut/homepage", tags=['stats'])
 async def fetch_homepage_data(
+    request: Request,
     glimit: int = Query(5, ge=1),
     plimit: int = Query(30, ge=1),
-    pdays: int = Query(30, ge=1),
-    db: Session = Depends(db_dep)
+    pdays: int = Query(30, ge=1)
 ) -> str:
     '''Shortcut for homepage data of aocrec.com
 
+    Computed once for concurrent requests, see `cached_call()`. Answers
+    304 to clients having the data of the current generations, see
+    `conditional()`.
+
     Defined in: `webapi/routers/shortcut_homepage.py`
     '''
 
-    cache_key = f"homepage_data_{glimit}_{plimit}_{pdays}"
-    cacher = Cacher(db)
-    cached = cacher.get(cache_key)
-    if cached:
-        return Response(content=cached, media_type="application/json", headers={"X-From-Cache": "true"})
+    headers, not_modified = await conditional(request, 'games', 'players')
+    if not_modified:
+        return not_modified
 
-    result = await gen_homepage_data(db, glimit, plimit, pdays)
-
-    cacher.set(cache_key, result)
+    result, cached = await cached_call(
+        f"homepage_data_{glimit}_{plimit}_{pdays}",
+        lambda: gen_homepage_data(glimit, plimit, pdays),
+        tags=['games', 'players']
+    )
+    if cached:
+        headers["X-From-Cache"] = "true"
 
-    return Response(content=result, media_type="application/json")
+    return Response(content=result, media_type="application/json", headers=headers)
@@ -1,36 +1,19 @@
 '''Get unique games/players count, new games this month'''
 
-import json
-
-from fastapi import Depends, Response
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
-
-from mgxhub.cacher import Cacher
-from mgxhub.db import db_dep
-from mgxhub.db.operation import get_total_stats_raw
+from mgxhub.db.operation import get_total_stats_raw_async
 from webapi import app
 
 
 @app.get("/stats/total", tags=['stats'])
-async def get_total_stats(db: Session = Depends(db_dep)) -> str:
+async def get_total_stats() -> dict:
     '''Get unique games/players count, new games this month
 
+    Read from live counters, always up to date.
+
     Returns:
         A dictionary containing the stats.
 
-    Defined in: `mgxhub/db/operation/stats_index.py`
+    Defined in: `webapi/routers/stats_total.py`
     '''
 
-    cacher = Cacher(db)
-
-    cached = cacher.get('total_stats')
-    if cached:
-        return Response(content=cached, media_type="application/json", headers={"X-From-Cache": "true"})
-
-    stats = get_total_stats_raw(db)
-    result = json.dumps(jsonable_encoder(stats))
-
-    cacher.set('total_stats', result)
-
-    return Response(content=result, media_type="application/json")
+    return await get_total_stats_raw_async()
@@ -0,0 +1,22 @@
+'''Reload translation catalogs'''
+
+from mgxhub.db import db_run
+from mgxhub.db.operation import purge_game_documents
+from mgxhub.translator import Translator
+from webapi.admin_api import admin_api
+
+
+@admin_api.get("/system/langreload", tags=['system'])
+async def reload_translations() -> dict:
+    '''Reload translation catalogs after the `.mo` files are updated.
+
+    Stored game detail documents are dropped, as they hold translated labels.
+    Only the worker serving this request is reloaded, send SIGUSR1 to the
+    other workers to reload them.
+
+    Defined in: `webapi/routers/translations_reload.py`
+    '''
+
+    catalogs = Translator().reload()
+    documents = await db_run(purge_game_documents)
+    return {"catalogs": catalogs, "documents_purged": documents}